@@ -0,0 +1,313 @@
+"""Microbenchmarks of the game hot paths, with stored baselines.
+
+Every benchmark is run for a grid of song list lengths and/or player counts, and
+reports the time per operation (best of several batches) and the memory allocated
+per operation, measured with tracemalloc:
+
+- ``peak_bytes``: peak of the memory allocated while a single operation runs,
+- ``retained_bytes``: memory that is still allocated after an operation, averaged
+  over a batch.
+
+Usage::
+
+    python benchmarks/hot_paths.py             # print the results
+    python benchmarks/hot_paths.py --save      # store them as the new baseline
+    python benchmarks/hot_paths.py --compare   # fail on regressions to the baseline
+"""
+
+import argparse
+import asyncio
+import gc
+import itertools
+import json
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from game.game_logic import GameLogic
+from game.song import Song
+from game.strategies.factory import GameStrategyEnum
+from game.user import User
+from music_service.mock import DummyMusicService, synthetic_playlist
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+
+SONG_COUNTS = (10, 100, 1000)
+PLAYER_COUNTS = (2, 8, 32)
+# Smaller absolute changes are noise, however large they are relative to the baseline.
+NOISE_FLOOR = {"ns_per_op": 50, "peak_bytes": 256, "retained_bytes": 64}
+
+Operation = Callable[[], object]
+
+
+@dataclass
+class Benchmark:
+    """An operation to measure, set up once per batch for every parameter set."""
+
+    name: str
+    setup: Callable[..., Operation]
+    params: list[dict[str, int]]
+
+    def cases(self) -> Iterator[tuple[str, Operation]]:
+        """Yield the name of every parameter set and a function to set it up."""
+        for params in self.params:
+            suffix = ",".join(f"{key}={value}" for key, value in params.items())
+            name = f"{self.name}[{suffix}]" if suffix else self.name
+            yield name, lambda params=params: self.setup(**params)
+
+
+def sorted_songs(song_count: int) -> list[Song]:
+    """Return synthetic songs sorted by release year."""
+    return sorted(
+        synthetic_playlist(song_count, seed=song_count), key=lambda s: s.release_year
+    )
+
+
+def user_with_songs(name: str, song_count: int) -> User:
+    """Return a user whose song list holds song_count songs."""
+    user = User(name)
+    for song in sorted_songs(song_count):
+        user.add_song(len(user.song_list), song)
+    return user
+
+
+def started_game(
+    songs: int, players: int, strategy: GameStrategyEnum
+) -> tuple[GameLogic, list[User]]:
+    """Return a running game, whose players already collected songs."""
+    game = GameLogic(
+        target_song_count=10**9,
+        music_service=DummyMusicService(song_count=500),
+        game_strategy_enum=strategy,
+    )
+    users = [user_with_songs(f"player{i}", songs) for i in range(players)]
+    asyncio.run(game.start_game_async(users))
+    return game, users
+
+
+def setup_handle_player_turn(songs: int, players: int) -> Operation:
+    """Guess right in a simultaneous game, in turn for every player.
+
+    The turns run on an event loop, so the time includes the music service calls in
+    the thread pool, which are made once per round.
+    """
+    game, users = started_game(songs, players, GameStrategyEnum.SIMULTANEOUS)
+    turns = itertools.cycle(users)
+    loop = asyncio.new_event_loop()
+
+    async def turn() -> object:
+        user = next(turns)
+        song = await game.current_round_song_async()
+        index = user.valid_insertion_range(song.release_year).start
+        return await game.handle_player_turn_async(user.name, index)
+
+    return lambda: loop.run_until_complete(turn())
+
+
+def setup_turn_progression(players: int, strategy: GameStrategyEnum) -> Operation:
+    """Advance the turn of a game with the strategy."""
+    game, users = started_game(0, players, strategy)
+    names = itertools.cycle([user.name for user in users])
+    return lambda: game.strategy.handle_turn_progression(next(names))
+
+
+def setup_verify_choice(songs: int) -> Operation:
+    """Verify a correct guess in the middle of a song list."""
+    song_list = sorted_songs(songs)
+    selected = song_list[len(song_list) // 2]
+    return lambda: GameLogic.verify_choice(song_list, len(song_list) // 2, selected)
+
+
+def setup_valid_insertion_range(songs: int) -> Operation:
+    """Find the indices at which a guessed song fits into a song list."""
+    user = user_with_songs("player", songs)
+    song = user.song_list[len(user.song_list) // 2]
+    return lambda: GameLogic.valid_insertion_range(user, song)
+
+
+def setup_song_serialize() -> Operation:
+    """Serialize one song."""
+    song = sorted_songs(1)[0]
+    return song.serialize
+
+
+def setup_user_serialize(songs: int) -> Operation:
+    """Serialize a user and their song list."""
+    return user_with_songs("player", songs).serialize
+
+
+def setup_user_to_json(songs: int) -> Operation:
+    """Encode a user, whose JSON is cached between changes."""
+    return user_with_songs("player", songs).to_json
+
+
+BENCHMARKS = [
+    Benchmark(
+        "handle_player_turn_async",
+        setup_handle_player_turn,
+        [
+            {"songs": songs, "players": players}
+            for songs in SONG_COUNTS
+            for players in PLAYER_COUNTS
+        ],
+    ),
+    Benchmark(
+        "sequential.handle_turn_progression",
+        lambda players: setup_turn_progression(players, GameStrategyEnum.SEQUENTIAL),
+        [{"players": players} for players in PLAYER_COUNTS],
+    ),
+    Benchmark(
+        "simultaneous.handle_turn_progression",
+        lambda players: setup_turn_progression(players, GameStrategyEnum.SIMULTANEOUS),
+        [{"players": players} for players in PLAYER_COUNTS],
+    ),
+    Benchmark(
+        "verify_choice",
+        setup_verify_choice,
+        [{"songs": songs} for songs in SONG_COUNTS],
+    ),
+    Benchmark(
+        "valid_insertion_range",
+        setup_valid_insertion_range,
+        [{"songs": songs} for songs in SONG_COUNTS],
+    ),
+    Benchmark("Song.serialize", setup_song_serialize, [{}]),
+    Benchmark(
+        "User.serialize",
+        setup_user_serialize,
+        [{"songs": songs} for songs in SONG_COUNTS],
+    ),
+    Benchmark(
+        "User.to_json",
+        setup_user_to_json,
+        [{"songs": songs} for songs in SONG_COUNTS],
+    ),
+]
+
+
+def measure(
+    setup: Callable[[], Operation], batch_size: int, batches: int
+) -> dict[str, float]:
+    """Return the time and memory per operation."""
+    timings = []
+    gc.disable()
+    try:
+        for _ in range(batches):
+            operation = setup()
+            operation()  # warm up caches, like a running game would
+            start = time.perf_counter_ns()
+            for _ in range(batch_size):
+                operation()
+            timings.append((time.perf_counter_ns() - start) / batch_size)
+    finally:
+        gc.enable()
+
+    operation = setup()
+    operation()
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = operation()
+        _, peak = tracemalloc.get_traced_memory()
+        del result
+        for _ in range(batch_size - 1):
+            operation()
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "ns_per_op": round(min(timings), 1),
+        "peak_bytes": peak - baseline,
+        "retained_bytes": round((current - baseline) / batch_size, 1),
+    }
+
+
+def run(name_filter: str, batch_size: int, batches: int) -> dict[str, dict]:
+    """Run all benchmarks whose name contains the filter."""
+    results = {}
+    for benchmark in BENCHMARKS:
+        for name, setup in benchmark.cases():
+            if name_filter in name:
+                results[name] = measure(setup, batch_size, batches)
+                print(f"{name:60} {format_result(results[name])}")
+    return results
+
+
+def format_result(result: dict[str, float]) -> str:
+    """Format a result as one line of the report."""
+    return (
+        f"{result['ns_per_op']:>12,.0f} ns/op {result['peak_bytes']:>10,} B peak "
+        f"{result['retained_bytes']:>10,.1f} B retained"
+    )
+
+
+def compare(
+    results: dict[str, dict], baseline: dict[str, dict], threshold: float
+) -> list[str]:
+    """Print the change to the baseline and return the regressed benchmarks."""
+    regressions = []
+    print(f"\n{'benchmark':60} {'time':>10} {'peak':>10} {'retained':>10}")
+    for name, result in results.items():
+        if name not in baseline:
+            print(f"{name:60} {'new':>10}")
+            continue
+        changes = {
+            metric: relative_change(result[metric], baseline[name][metric], floor)
+            for metric, floor in NOISE_FLOOR.items()
+        }
+        print(f"{name:60} " + " ".join(f"{c:>+10.1%}" for c in changes.values()))
+        if any(change > threshold for change in changes.values()):
+            regressions.append(name)
+    return regressions
+
+
+def relative_change(value: float, baseline: float, floor: float) -> float:
+    """Return the change relative to the baseline, or 0 if it is below the floor."""
+    if abs(value - baseline) < floor:
+        return 0.0
+    return (value - baseline) / max(baseline, floor)
+
+
+def main() -> None:
+    """Run the benchmarks and save or compare the results."""
+    parser = argparse.ArgumentParser(description="Benchmark the game hot paths.")
+    parser.add_argument("--filter", default="", help="Run matching benchmarks only.")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--batches", type=int, default=7)
+    parser.add_argument("--save", action="store_true", help="Store as baseline.")
+    parser.add_argument(
+        "--compare", action="store_true", help="Compare to the stored baseline."
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="Relative slowdown that counts as regression (default: 0.25).",
+    )
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    args = parser.parse_args()
+
+    results = run(args.filter, args.batch_size, args.batches)
+
+    if args.compare:
+        baseline: dict[str, Any] = json.loads(args.baseline.read_text())
+        if regressions := compare(results, baseline, args.threshold):
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+        print("\nNo regressions.")
+
+    if args.save:
+        stored = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+        stored.update(results)
+        args.baseline.write_text(json.dumps(stored, indent=2, sort_keys=True) + "\n")
+        print(f"\nSaved the baseline to {args.baseline}.")
+
+
+if __name__ == "__main__":
+    main()
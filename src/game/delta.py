@@ -0,0 +1,91 @@
+"""Contains the DeltaLog class, which backs the delta-encoded game protocol."""
+
+from enum import IntEnum
+from typing import Any
+
+from game.song import Song
+
+
+class ProtocolVersion(IntEnum):
+    """Enum containing the versions of the game protocol."""
+
+    # Every message carries the full song lists.
+    FULL = 1
+    # Songs are sent once per client via a song table, afterwards only the
+    # insertions ("events") since the client's last update are sent.
+    DELTA = 2
+
+
+class DeltaLog:
+    """Records the song insertions of a session and what each client has seen."""
+
+    def __init__(self) -> None:
+        self.songs: list[Song] = []
+        self.song_ids: dict[Song, int] = {}
+        # (player name, song ID, insert index) in the order they happened.
+        self.events: list[tuple[str, int, int]] = []
+
+        self._cursors: dict[str, int] = {}
+        self._known_song_ids: dict[str, set[int]] = {}
+
+    def song_id(self, song: Song) -> int:
+        """Return the ID of the song in the session's song table."""
+        song_id = self.song_ids.get(song)
+        if song_id is None:
+            song_id = self.song_ids[song] = len(self.songs)
+            self.songs.append(song)
+        return song_id
+
+    def record_insertion(self, username: str, song: Song, index: int) -> None:
+        """Record that a song was inserted into the song list of a player."""
+        self.events.append((username, self.song_id(song), index))
+
+    def delta_for(self, username: str, last_song: Song) -> dict[str, Any]:
+        """Return the events since the last update of the client, and new songs."""
+        last_song_id = self.song_id(last_song)
+        cursor = self._cursors.get(username, 0)
+        events = self.events[cursor:]
+        self._cursors[username] = len(self.events)
+
+        song_ids = {last_song_id}
+        song_ids.update(song_id for _, song_id, _ in events)
+
+        return {
+            "protocol": int(ProtocolVersion.DELTA),
+            "last_song_id": last_song_id,
+            "events": events,
+            "songs": self._unknown_songs(username, song_ids),
+        }
+
+    def sync_for(self, username: str, player_names: list[str]) -> dict[str, Any]:
+        """Return the full song table and song lists as seen by the client.
+
+        The song lists of other players reflect the state of the client's last
+        update, so a resync never reveals more than the regular deltas do.
+        """
+        cursor = self._cursors.get(username, 0)
+        song_lists: dict[str, list[int]] = {name: [] for name in player_names}
+        for position, (player, song_id, index) in enumerate(self.events):
+            if position < cursor or player == username:
+                song_lists.setdefault(player, []).insert(index, song_id)
+
+        self._known_song_ids[username] = set()
+        song_ids = {
+            song_id for song_list in song_lists.values() for song_id in song_list
+        }
+
+        return {
+            "type": "sync",
+            "protocol": int(ProtocolVersion.DELTA),
+            "songs": self._unknown_songs(username, song_ids),
+            "players": song_lists,
+        }
+
+    def _unknown_songs(self, username: str, song_ids: set[int]) -> dict[str, Any]:
+        known_song_ids = self._known_song_ids.setdefault(username, set())
+        new_song_ids = song_ids - known_song_ids
+        known_song_ids.update(new_song_ids)
+        return {
+            str(song_id): self.songs[song_id].to_json()
+            for song_id in sorted(new_song_ids)
+        }
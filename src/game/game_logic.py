@@ -1,15 +1,22 @@
 """Contains the TrackBackGame class that implements the game logic."""
 
-from itertools import pairwise
+import asyncio
+import logging
+import time
 from typing import Any
 
 from fastapi import HTTPException
 
+from game.delta import DeltaLog, ProtocolVersion
+from game.player_ring import PlayerRing
 from game.song import Song
+from game.song_catalog import song_catalog
 from game.strategies.factory import GameStrategyEnum, GameStrategyFactory
 from game.user import User
 from music_service.abstract_adapter import AbstractMusicServiceAdapter
+from music_service.async_adapter import as_async_adapter
 from music_service.error import MusicServiceError
+from music_service.prefetch import TrackPrefetcher
 
 
 class GameLogic:
@@ -22,60 +29,206 @@ class GameLogic:
         game_strategy_enum: GameStrategyEnum = GameStrategyEnum.SIMULTANEOUS,
     ) -> None:
         self.target_song_count = target_song_count
+        self.game_strategy_enum = game_strategy_enum
         self.strategy = GameStrategyFactory.create_game_strategy(
             game_strategy_enum, self
         )
         self.users: list[User] = []
+        self.player_ring = PlayerRing(self.users)
+        self._users_by_name: dict[str, User] = {}
 
         self.music_service = music_service
+        # Used by the server, so blocking service calls don't stall the event loop.
+        self.async_music_service = as_async_adapter(music_service)
 
         self.running = False
         self.winner: User | None = None
 
-    def start_game(self, users: list[User]) -> None:
-        """Start the game with the given users."""
+        self.delta_log = DeltaLog()
+
+        # Song of the current round, fetched once and shared by all guesses.
+        self._round_song: Song | None = None
+        self._round_song_predicted = False
+        self._round_over = False
+        self.round_number = 0
+        self._round_started_at = time.monotonic()
+        self.prefetcher: TrackPrefetcher | None = None
+
+    async def start_game_async(self, users: list[User]) -> None:
+        """Start the game with the given users, without blocking the event loop."""
         try:
-            self.music_service.start_playback()
+            await self.async_music_service.start_playback()
         except MusicServiceError as e:
-            raise HTTPException(
-                status_code=500,
-                detail="Failed to play music. Please check if music service "
-                f"{self.music_service.service_name} is running!",
-            ) from e
+            raise self._playback_error() from e
+        self._start(users)
+
+    def _playback_error(self) -> HTTPException:
+        return HTTPException(
+            status_code=500,
+            detail="Failed to play music. Please check if music service "
+            f"{self.music_service.service_name} is running!",
+        )
+
+    def _start(self, users: list[User]) -> None:
+        self._round_song = None
+        self._round_over = False
+        self._round_song_predicted = False
+        self.round_number += 1
+        self._round_started_at = time.monotonic()
         self.users = users
+        self.player_ring = PlayerRing(users)
+        self._users_by_name = {user.name: user for user in users}
         self.running = True
+        self.strategy.on_game_started()
 
-    def handle_player_turn(self, username: str, insert_index: int) -> dict[str, Any]:
-        """Handle a player's turn."""
-        payload: dict[str, Any] = {}
+    def snapshot(self) -> dict[str, Any]:
+        """Return the state of the game as JSON, to restore it after a restart.
+
+        Songs are stored once in the song table of the delta log and referred to by
+        their index.
+        """
+        song_id = self.delta_log.song_id
+        users = [
+            {
+                "name": user.name,
+                "song_ids": [song_id(song) for song in user.song_list],
+            }
+            for user in self.users
+        ]
+        return {
+            "target_song_count": self.target_song_count,
+            "strategy": self.game_strategy_enum.value,
+            "strategy_state": self.strategy.export_state(),
+            "running": self.running,
+            "round_number": self.round_number,
+            "winner": self.winner.name if self.winner else None,
+            "users": users,
+            "songs": [
+                [
+                    song.title,
+                    song.artist,
+                    song.release_year,
+                    song.album_cover_url,
+                    song.track_id,
+                ]
+                for song in self.delta_log.songs
+            ],
+            "events": list(self.delta_log.events),
+        }
+
+    @classmethod
+    def from_snapshot(
+        cls, state: dict[str, Any], music_service: AbstractMusicServiceAdapter
+    ) -> "GameLogic":
+        """Restore a game from its snapshot.
+
+        All players are inactive, until they re-join. The song of the current round
+        is asked from the music service again.
+        """
+        game = cls(
+            target_song_count=state["target_song_count"],
+            music_service=music_service,
+            game_strategy_enum=GameStrategyEnum(state["strategy"]),
+        )
+        songs = [song_catalog.intern(Song(*fields)) for fields in state["songs"]]
+        game.delta_log.songs = songs
+        game.delta_log.song_ids = {song: song_id for song_id, song in enumerate(songs)}
+        game.delta_log.events = [tuple(event) for event in state["events"]]
+
+        for data in state["users"]:
+            user = User(data["name"])
+            user.is_active = False
+            for index, song_id in enumerate(data["song_ids"]):
+                user.add_song(index, songs[song_id])
+            game.users.append(user)
+        game.player_ring = PlayerRing(game.users)
+        game._users_by_name = {user.name: user for user in game.users}
+
+        game.running = state["running"]
+        game.round_number = state["round_number"]
+        game.winner = game.get_user(state["winner"] or "")
+        game.strategy.import_state(state["strategy_state"])
+        return game
+
+    async def handle_player_turn_async(
+        self,
+        username: str,
+        insert_index: int,
+        protocol: ProtocolVersion = ProtocolVersion.FULL,
+    ) -> dict[str, Any]:
+        """Handle a player's turn, without blocking the event loop.
+
+        With the delta protocol, the payload contains only the song insertions since
+        the player's last guess instead of the full song lists.
+        """
+        if error := self._validate_turn(username):
+            return error
+
+        try:
+            current_song = await self.current_round_song_async()
+        except MusicServiceError as e:
+            return self._music_service_error(e)
+        # Validate again, the game may have moved on while the song was fetched.
+        if error := self._validate_turn(username):
+            return error
+
+        payload = self._apply_turn(username, insert_index, current_song, protocol)
+        if self._round_over:
+            await self.next_track_async()
+        return payload
+
+    def _validate_turn(self, username: str) -> dict[str, Any] | None:
         if not self.running:
-            payload["type"] = "error"
-            payload["message"] = "Game not running."
-            return payload
+            return {"type": "error", "message": "Game not running."}
 
         validation = self.strategy.validate_turn(username)
         if validation:
             return validation
 
-        player = next(user for user in self.users if user.name == username)
-        current_song = self.music_service.current_song()
+        if username not in self._users_by_name:
+            return {
+                "type": "error",
+                "message": f"{username} is not a player of this game.",
+            }
+        return None
+
+    def _music_service_error(self, error: MusicServiceError) -> dict[str, Any]:
+        logging.warning("Fetching the song of the round failed: %s", error)
+        return {
+            "type": "error",
+            "message": f"{self.music_service.service_name} did not answer. "
+            "Please guess again!",
+        }
 
+    def _apply_turn(
+        self,
+        username: str,
+        insert_index: int,
+        current_song: Song,
+        protocol: ProtocolVersion,
+    ) -> dict[str, Any]:
+        player = self._users_by_name[username]
+        payload: dict[str, Any] = {}
         payload["type"] = "guess_result"
         payload["player"] = username
 
-        if self.verify_choice(player.song_list, insert_index, current_song):
+        if insert_index in self.valid_insertion_range(player, current_song):
             player.add_song(insert_index, current_song)
+            self.delta_log.record_insertion(username, current_song, insert_index)
             payload["result"] = "correct"
         else:
             payload["result"] = "wrong"
         payload["message"] = f"Song was {current_song}."
-
-        payload["other_players"] = [
-            user.serialize() for user in self.users if user != player
-        ]
         payload["last_index"] = str(insert_index)
-        payload["last_song"] = current_song.serialize()
-        payload["song_list"] = [song.serialize() for song in player.song_list]
+
+        if protocol == ProtocolVersion.DELTA:
+            payload.update(self.delta_log.delta_for(username, current_song))
+        else:
+            payload["other_players"] = [
+                user.to_json() for user in self.users if user != player
+            ]
+            payload["last_song"] = current_song.to_json()
+            payload["song_list"] = player.song_list_json()
 
         if len(player.song_list) >= self.target_song_count:
             self.running = False
@@ -93,28 +246,125 @@ class GameLogic:
 
         return payload
 
-    @staticmethod
-    def verify_choice(song_list: list[Song], index: int, selected_song: Song) -> bool:
-        """Return True if the new song list would be sorted by release year."""
-        potential_list = song_list.copy()
-        potential_list.insert(index, selected_song)
+    async def current_round_song_async(self) -> Song:
+        """Return the song of the current round, without blocking the event loop.
+
+        The music service is asked only once per round, so every player of a round is
+        judged against the same song. A predicted song is confirmed before the first
+        guess is judged against it.
+        """
+        while self._round_song is None or self._round_song_predicted:
+            while delay := self.settle_delay():
+                await asyncio.sleep(delay)
+            round_number = self.round_number
+            song = await self.async_music_service.current_song()
+            self.observe_current_song(song, round_number)
+        return self._round_song
+
+    def end_round(self) -> None:
+        """Mark the current round as over, the track is skipped after the turn."""
+        self._round_over = True
+
+    async def next_track_async(self) -> None:
+        """Skip to the next track, which starts a new round.
+
+        If the music service fails to skip, the next round starts anyway and is
+        played with the song that the service reports next.
+        """
+        try:
+            await self.async_music_service.next_track()
+        except MusicServiceError as e:
+            logging.warning("Skipping to the next track failed: %s", e)
+            self._start_next_round(predicted=False)
+            return
+        self._start_next_round()
+
+    def _start_next_round(self, predicted: bool = True) -> None:
+        self._round_over = False
+        self.round_number += 1
+        self._round_started_at = time.monotonic()
+        # Keep the prefetched metadata of the new round until a poll or the first
+        # guess confirms it.
+        self._round_song = (
+            self.prefetcher.take_next() if self.prefetcher and predicted else None
+        )
+        self._round_song_predicted = self._round_song is not None
+
+    def settle_delay(self) -> float:
+        """Return the seconds until the music service reports the track of the round.
+
+        Right after a skip, some services still report the previous track.
+        """
+        settled_at = self._round_started_at + self.music_service.skip_settle_time
+        return max(0.0, settled_at - time.monotonic())
+
+    def observe_current_song(self, song: Song, round_number: int) -> bool:
+        """Update the song of the round from a poll of the music service.
 
-        return GameLogic._is_sorted_by_release_year(potential_list)
+        Polls that started before the game skipped to the next track are ignored.
+        Return True if the song differs from the one the round was played with so far,
+        i.e. the track was changed outside of the game. A wrong prediction is replaced
+        silently, no guess was judged against it yet. So is a song whose release year
+        became known meanwhile.
+        """
+        if round_number != self.round_number:
+            return False
+        if self._round_song_predicted and self._round_song is not None:
+            if self.prefetcher:
+                self.prefetcher.record(self._round_song, song)
+            self._round_song = song
+            self._round_song_predicted = False
+            return False
+        round_song = self._round_song
+        changed = (
+            round_song is not None
+            and round_song != song
+            and not (
+                round_song.release_year == 0 and round_song.track_id == song.track_id
+            )
+        )
+        self._round_song = song
+        return changed
+
+    @staticmethod
+    def valid_insertion_range(player: User, song: Song) -> range:
+        """Return all indices at which the song fits into the player's song list."""
+        return player.valid_insertion_range(song.release_year)
 
     @staticmethod
-    def _is_sorted_by_release_year(song_list: list[Song]) -> bool:
-        return all(
-            earlier.release_year <= later.release_year
-            for earlier, later in pairwise(song_list)
+    def verify_choice(song_list: list[Song], index: int, selected_song: Song) -> bool:
+        """Return True if the new song list would be sorted by release year.
+
+        Only the neighbours of the insertion index are compared, the song list is
+        assumed to be sorted already.
+        """
+        if not 0 <= index <= len(song_list):
+            return False
+        release_year = selected_song.release_year
+        return (index == 0 or song_list[index - 1].release_year <= release_year) and (
+            index == len(song_list) or release_year <= song_list[index].release_year
         )
 
+    def sync_payload(self, username: str) -> dict[str, Any]:
+        """Return the full state of the delta protocol for a (re)connecting client."""
+        return self.delta_log.sync_for(username, [user.name for user in self.users])
+
     def is_game_over(self) -> bool:
         """Return True if the game is over."""
         return not self.running
 
     def get_user(self, username: str) -> User | None:
         """Return the user with the given username."""
-        for user in self.users:
-            if user.name == username:
-                return user
-        return None
+        return self._users_by_name.get(username)
+
+    def activate_user(self, username: str) -> None:
+        """Mark a (re-joined) user as active again."""
+        if (user := self.get_user(username)) and not user.is_active:
+            self.player_ring.activate(user)
+            self.strategy.on_user_activated(user)
+
+    def deactivate_user(self, username: str) -> None:
+        """Mark a (disconnected) user as inactive."""
+        if (user := self.get_user(username)) and user.is_active:
+            self.player_ring.deactivate(user)
+            self.strategy.on_user_deactivated(user)
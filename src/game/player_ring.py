@@ -0,0 +1,69 @@
+"""Contains the PlayerRing class, which tracks the active players in seat order."""
+
+from game.user import User
+
+
+class PlayerRing:
+    """Doubly linked ring of the active players' seats.
+
+    Finding the next active player and deactivating a player are O(1). Activating a
+    player again has to find its predecessor in the ring, which is only done when a
+    player rejoins and not on every turn.
+    """
+
+    def __init__(self, users: list[User]) -> None:
+        self.users = users
+        self.seats = {user.name: seat for seat, user in enumerate(users)}
+        self._next = list(range(len(users)))
+        self._prev = list(range(len(users)))
+
+        active_seats = [seat for seat, user in enumerate(users) if user.is_active]
+        for position, seat in enumerate(active_seats):
+            self._next[seat] = active_seats[(position + 1) % len(active_seats)]
+            self._prev[seat] = active_seats[position - 1]
+        self.active_count = len(active_seats)
+
+    def next_active_seat(self, seat: int) -> int | None:
+        """Return the seat of the next active player after the given seat."""
+        if self.active_count == 0:
+            return None
+        if not self.users[seat].is_active:
+            # Links of inactive seats are stale, fall back to walking the seats.
+            return next(
+                following % len(self.users)
+                for following in range(seat + 1, seat + len(self.users) + 1)
+                if self.users[following % len(self.users)].is_active
+            )
+        return self._next[seat]
+
+    def active_users(self) -> list[User]:
+        """Return the active players in seat order."""
+        return [user for user in self.users if user.is_active]
+
+    def activate(self, user: User) -> None:
+        """Mark a player as active and add it to the ring."""
+        if user.is_active:
+            return
+        seat = self.seats[user.name]
+        if self.active_count == 0:
+            self._next[seat] = self._prev[seat] = seat
+        else:
+            previous = (seat - 1) % len(self.users)
+            while not self.users[previous].is_active:
+                previous = (previous - 1) % len(self.users)
+            following = self._next[previous]
+            self._next[seat], self._prev[seat] = following, previous
+            self._next[previous] = self._prev[following] = seat
+        user.is_active = True
+        self.active_count += 1
+
+    def deactivate(self, user: User) -> None:
+        """Mark a player as inactive and remove it from the ring."""
+        if not user.is_active:
+            return
+        seat = self.seats[user.name]
+        user.is_active = False
+        previous, following = self._prev[seat], self._next[seat]
+        self._next[previous] = following
+        self._prev[following] = previous
+        self.active_count -= 1
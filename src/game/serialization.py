@@ -0,0 +1,149 @@
+"""Helpers to build JSON payloads from pre-encoded fragments.
+
+Values are encoded by a pluggable codec: orjson if it is installed, the standard
+library otherwise. Set the environment variable ``JSON_CODEC`` to ``json`` or
+``orjson`` to choose one.
+"""
+
+import json
+import os
+from typing import Any, Protocol
+
+SEPARATORS = (",", ":")
+
+
+class JSONCodec(Protocol):
+    """Encodes and decodes JSON."""
+
+    name: str
+
+    def dumps(self, obj: Any) -> str:  # noqa: ANN401
+        """Encode a plain JSON-compatible object compactly."""
+
+    def loads(self, data: str | bytes) -> Any:  # noqa: ANN401
+        """Decode JSON."""
+
+
+class StdlibCodec:
+    """JSON codec of the standard library."""
+
+    name = "json"
+
+    def dumps(self, obj: Any) -> str:  # noqa: ANN401
+        """Encode a plain JSON-compatible object compactly."""
+        return json.dumps(obj, separators=SEPARATORS)
+
+    def loads(self, data: str | bytes) -> Any:  # noqa: ANN401
+        """Decode JSON."""
+        return json.loads(data)
+
+
+class OrjsonCodec:
+    """JSON codec of orjson, which is several times faster than the standard one."""
+
+    name = "orjson"
+
+    def __init__(self) -> None:
+        import orjson  # noqa: PLC0415
+
+        self._orjson = orjson
+
+    def dumps(self, obj: Any) -> str:  # noqa: ANN401
+        """Encode a plain JSON-compatible object compactly."""
+        return self._orjson.dumps(obj).decode()
+
+    def loads(self, data: str | bytes) -> Any:  # noqa: ANN401
+        """Decode JSON."""
+        return self._orjson.loads(data)
+
+
+CODECS: dict[str, type[JSONCodec]] = {"json": StdlibCodec, "orjson": OrjsonCodec}
+
+
+def create_codec(name: str = "auto") -> JSONCodec:
+    """Create the codec with the given name, "auto" picks the fastest installed one.
+
+    Raise a ValueError if the name is unknown.
+    """
+    if name == "auto":
+        try:
+            return OrjsonCodec()
+        except ImportError:
+            return StdlibCodec()
+    if name not in CODECS:
+        raise ValueError(f"Unknown JSON codec '{name}', use one of {list(CODECS)}.")
+    return CODECS[name]()
+
+
+def set_codec(new_codec: JSONCodec) -> None:
+    """Use the codec for all payloads encoded from now on."""
+    global codec  # noqa: PLW0603
+    codec = new_codec
+
+
+codec = create_codec(os.getenv("JSON_CODEC") or "auto")
+
+
+class RawJSON:
+    """Wraps an already encoded JSON fragment, which is embedded without changes."""
+
+    __slots__ = ("text",)
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+
+    def __repr__(self) -> str:
+        """Return a string representation of the fragment."""
+        return f"RawJSON({self.text!r})"
+
+
+def encode(obj: Any) -> RawJSON:  # noqa: ANN401
+    """Encode a plain JSON-compatible object to a fragment."""
+    return RawJSON(codec.dumps(obj))
+
+
+def dumps(obj: Any) -> str:  # noqa: ANN401
+    """Encode the object as JSON, embedding RawJSON fragments as they are."""
+    parts: list[str] = []
+    _write(obj, parts)
+    return "".join(parts)
+
+
+def loads(data: str | bytes) -> Any:  # noqa: ANN401
+    """Decode JSON, e.g. a message of a client."""
+    return codec.loads(data)
+
+
+def extend(encoded: str, fields: dict[str, Any]) -> str:
+    """Append fields to an encoded JSON object, without encoding it again.
+
+    Used to send a message encoded once to many recipients, with a few fields of
+    their own. The fields must not be part of the encoded object yet.
+    """
+    if not fields:
+        return encoded
+    separator = "," if encoded != "{}" else ""
+    return encoded[:-1] + separator + dumps(fields)[1:]
+
+
+def _write(obj: Any, parts: list[str]) -> None:  # noqa: ANN401
+    if isinstance(obj, RawJSON):
+        parts.append(obj.text)
+    elif isinstance(obj, dict):
+        parts.append("{")
+        for position, (key, value) in enumerate(obj.items()):
+            if position:
+                parts.append(",")
+            parts.append(codec.dumps(str(key)))
+            parts.append(":")
+            _write(value, parts)
+        parts.append("}")
+    elif isinstance(obj, list | tuple):
+        parts.append("[")
+        for position, value in enumerate(obj):
+            if position:
+                parts.append(",")
+            _write(value, parts)
+        parts.append("]")
+    else:
+        parts.append(codec.dumps(obj))
@@ -1,25 +1,45 @@
 """Contains a class representing a song."""
 
-from dataclasses import asdict, dataclass
+from dataclasses import dataclass, field
 from typing import Any
 
+from game.serialization import RawJSON, encode
 
-@dataclass
+
+@dataclass(frozen=True, slots=True, weakref_slot=True)
 class Song:
-    """Represents a song with title, artist and release year."""
+    """Represents a song with title, artist and release year.
+
+    Songs are immutable and hashable. The ``track_id`` is the stable ID of the
+    track at the music service and is used by the song catalog to intern songs.
+    """
 
     title: str
     artist: str
     release_year: int
     album_cover_url: str = ""
+    track_id: str = ""
+    _json: RawJSON | None = field(default=None, init=False, repr=False, compare=False)
 
     def __str__(self) -> str:
         """Return a string representation of the song's metadata."""
         return f"'{self.title}' by {self.artist} ({self.release_year})"
 
-    def serialize(self) -> dict[str, str]:
+    def serialize(self) -> dict[str, Any]:
         """Serialize the song to a dictionary."""
-        return asdict(self)
+        return {
+            "title": self.title,
+            "artist": self.artist,
+            "release_year": self.release_year,
+            "album_cover_url": self.album_cover_url,
+            "track_id": self.track_id,
+        }
+
+    def to_json(self) -> RawJSON:
+        """Return the song as encoded JSON fragment, which is computed only once."""
+        if self._json is None:
+            object.__setattr__(self, "_json", encode(self.serialize()))
+        return self._json  # type: ignore[return-value]
 
 
 def deserialize_song(data: dict[str, Any]) -> Song:
@@ -0,0 +1,62 @@
+"""Contains the SongCatalog class, which interns songs per process."""
+
+import sys
+import threading
+import weakref
+from dataclasses import replace
+
+from game.song import Song
+
+
+class SongCatalog:
+    """Interns songs by their track ID.
+
+    All adapters pass the songs they create through the catalog, so every player
+    list, payload and cache refers to one shared instance per track. The catalog
+    holds the songs weakly, a song is dropped once no game refers to it anymore.
+    The integer IDs of the songs are assigned per game, by its delta log.
+    """
+
+    def __init__(self) -> None:
+        self._songs: weakref.WeakValueDictionary[str, Song] = (
+            weakref.WeakValueDictionary()
+        )
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Return the number of interned songs."""
+        return len(self._songs)
+
+    def intern(self, song: Song) -> Song:
+        """Return the shared instance for the song, registering it if it is new.
+
+        The first instance of a track is kept, even if a later one has other metadata.
+        Otherwise the song of a round would stop being equal to the same track
+        reported by the next poll. Songs with an unknown release year (0) are not
+        interned, so the first instance with the year becomes the shared one.
+        """
+        if not song.release_year:
+            return song
+        key = self._key(song)
+        with self._lock:
+            if (interned := self._songs.get(key)) is not None:
+                return interned
+
+            song = replace(
+                song,
+                artist=sys.intern(song.artist),
+                album_cover_url=sys.intern(song.album_cover_url),
+            )
+            self._songs[key] = song
+            return song
+
+    @staticmethod
+    def _key(song: Song) -> str:
+        if song.track_id:
+            return song.track_id
+        # Songs without a service ID are identified by their metadata.
+        return f"{song.title}\x1f{song.artist}\x1f{song.release_year}"
+
+
+# Global instance (singleton)
+song_catalog = SongCatalog()
@@ -26,3 +26,19 @@ class AbstractGameStrategy(ABC):
     @abstractmethod
     def get_players_to_notify_for_next_turn(self) -> list[User]:
         """Return a list of players to notify for the next turn."""
+
+    def on_game_started(self) -> None:  # noqa: B027
+        """Initialize the turn bookkeeping once the players are known."""
+
+    def on_user_activated(self, user: User) -> None:  # noqa: B027
+        """Update the turn bookkeeping when a user re-joins."""
+
+    def on_user_deactivated(self, user: User) -> None:  # noqa: B027
+        """Update the turn bookkeeping when a user disconnects."""
+
+    def export_state(self) -> dict[str, Any]:
+        """Return the turn bookkeeping as JSON, to restore it after a restart."""
+        return {}
+
+    def import_state(self, state: dict[str, Any]) -> None:  # noqa: B027
+        """Restore the turn bookkeeping exported by export_state."""
@@ -24,24 +24,29 @@ class SequentialStrategy(AbstractGameStrategy):
         return None
 
     def handle_turn_progression(self, _: str) -> dict[str, Any]:
-        """Skip to next track and to the next player."""
-        self.current_player_index = (self.current_player_index + 1) % len(
-            self.game.users
+        """Skip to next track and to the next active player."""
+        next_player_index = self.game.player_ring.next_active_seat(
+            self.current_player_index
         )
+        # without any active player, the turn stays with the current player
+        if next_player_index is not None:
+            self.current_player_index = next_player_index
 
-        # skip non active players
-        while not self._get_current_player().is_active:
-            self.current_player_index = (self.current_player_index + 1) % len(
-                self.game.users
-            )
-
-        self.game.music_service.next_track()
+        self.game.end_round()
         return {"next_player": self._get_current_player().name}
 
     def get_players_to_notify_for_next_turn(self) -> list[User]:
         """Return a list of players to notify for the next turn."""
         return [self._get_current_player()]
 
+    def export_state(self) -> dict[str, Any]:
+        """Return the index of the current player."""
+        return {"current_player_index": self.current_player_index}
+
+    def import_state(self, state: dict[str, Any]) -> None:
+        """Restore the index of the current player."""
+        self.current_player_index = state["current_player_index"]
+
     def _get_current_player(self) -> User:
         """Get the current player."""
         return self.game.users[self.current_player_index]
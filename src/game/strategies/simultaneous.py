@@ -16,6 +16,34 @@ class SimultaneousStrategy(AbstractGameStrategy):
     def __init__(self, game: "GameLogic") -> None:
         super().__init__(game)
         self.users_already_guessed: set[str] = set()
+        # Number of active users that have not guessed the current song yet.
+        self.pending_guessers = 0
+
+    def on_game_started(self) -> None:
+        """Let every active user guess the first song."""
+        self.pending_guessers = self.game.player_ring.active_count
+
+    def on_user_activated(self, user: User) -> None:
+        """Let a re-joined user guess the song, unless it already did."""
+        if user.name not in self.users_already_guessed:
+            self.pending_guessers += 1
+
+    def on_user_deactivated(self, user: User) -> None:
+        """Stop waiting for a disconnected user."""
+        if user.name not in self.users_already_guessed:
+            self.pending_guessers -= 1
+
+    def export_state(self) -> dict[str, Any]:
+        """Return the users who guessed the current song already."""
+        return {"users_already_guessed": sorted(self.users_already_guessed)}
+
+    def import_state(self, state: dict[str, Any]) -> None:
+        """Restore the users who guessed, and wait for the active users who didn't."""
+        self.users_already_guessed = set(state["users_already_guessed"])
+        self.pending_guessers = sum(
+            user.name not in self.users_already_guessed
+            for user in self.game.player_ring.active_users()
+        )
 
     def validate_turn(self, username: str) -> dict[str, str] | None:
         """Only users who haven't guessed yet can make a guess."""
@@ -29,19 +57,17 @@ class SimultaneousStrategy(AbstractGameStrategy):
     def handle_turn_progression(self, username: str) -> dict[str, Any]:
         """Only when every user has guessed, the game will skip to the next track."""
         self.users_already_guessed.add(username)
+        self.pending_guessers -= 1
 
-        active_users = {user.name for user in self.game.users if user.is_active}
-
-        missing_users = active_users - self.users_already_guessed
-
-        if not missing_users:
-            self.game.music_service.next_track()
+        if self.pending_guessers <= 0:
+            self.game.end_round()
             self.users_already_guessed.clear()
+            self.pending_guessers = self.game.player_ring.active_count
 
         return {"next_player": None}
 
     def get_players_to_notify_for_next_turn(self) -> list[User]:
         """Return a list of players to notify for the next turn."""
         if len(self.users_already_guessed) == 0:
-            return [user for user in self.game.users if user.is_active]
+            return self.game.player_ring.active_users()
         return []
@@ -1,5 +1,9 @@
 """Contains the user class."""
 
+import json
+from bisect import bisect_left, bisect_right
+
+from game.serialization import RawJSON
 from game.song import Song
 
 
@@ -10,11 +14,27 @@ class User:
         """User has name and song list (release year ascending)."""
         self.name = name
         self.song_list = []  # type: list[Song]
+        # Parallel to song_list, kept sorted for bisect lookups.
+        self.release_years = []  # type: list[int]
         self.is_active = True
 
+        # Encoded JSON, invalidated whenever the song list changes.
+        self._song_list_json: RawJSON | None = None
+        self._json: RawJSON | None = None
+
     def add_song(self, index: int, song: Song) -> None:
         """Add a song to the song_list of the user."""
         self.song_list.insert(index, song)
+        self.release_years.insert(index, song.release_year)
+        self._song_list_json = None
+        self._json = None
+
+    def valid_insertion_range(self, release_year: int) -> range:
+        """Return all indices where a song of the given year keeps the list sorted."""
+        return range(
+            bisect_left(self.release_years, release_year),
+            bisect_right(self.release_years, release_year) + 1,
+        )
 
     def serialize(self) -> dict[str, str | list[dict[str, str]]]:
         """Serialize the user object to a dictionary."""
@@ -22,3 +42,20 @@ class User:
             "name": self.name,
             "song_list": [song.serialize() for song in self.song_list],
         }
+
+    def song_list_json(self) -> RawJSON:
+        """Return the song list as encoded JSON fragment."""
+        if self._song_list_json is None:
+            self._song_list_json = RawJSON(
+                "[" + ",".join(song.to_json().text for song in self.song_list) + "]"
+            )
+        return self._song_list_json
+
+    def to_json(self) -> RawJSON:
+        """Return the serialized user as encoded JSON fragment."""
+        if self._json is None:
+            self._json = RawJSON(
+                f'{{"name":{json.dumps(self.name)},'
+                f'"song_list":{self.song_list_json().text}}}'
+            )
+        return self._json
@@ -1,14 +1,35 @@
 """Defines the interface for music services."""
 
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any
 
 from game.song import Song
 
 
+@dataclass(frozen=True)
+class PlaybackState:
+    """The currently playing song and, if the service reports it, its progress."""
+
+    song: Song
+    progress_ms: int | None = None
+    duration_ms: int | None = None
+
+    @property
+    def remaining_ms(self) -> int | None:
+        """Return the remaining play time of the song, if known."""
+        if self.progress_ms is None or self.duration_ms is None:
+            return None
+        return max(self.duration_ms - self.progress_ms, 0)
+
+
 class AbstractMusicServiceAdapter(ABC):
     """Abstract base class that defines the interface for a music service."""
 
     service_name: str
+    # Seconds after skipping a track, during which the service may still report the
+    # previous one.
+    skip_settle_time: float = 0.0
 
     @abstractmethod
     def current_song(self) -> Song:
@@ -21,3 +42,31 @@ class AbstractMusicServiceAdapter(ABC):
     @abstractmethod
     def next_track(self) -> None:
         """Skip to the next track."""
+
+    def upcoming_songs(self, count: int) -> list[Song]:  # noqa: ARG002
+        """Return up to count songs that will be played after the current one.
+
+        This is optional, services that can't look ahead return an empty list.
+        """
+        return []
+
+    def playback_state(self) -> PlaybackState:
+        """Return the currently playing song with its progress.
+
+        Services that report the progress of a song should override this.
+        """
+        return PlaybackState(song=self.current_song())
+
+    def stats(self) -> dict[str, Any]:
+        """Return service specific statistics, e.g. the API usage."""
+        return {}
+
+    def snapshot(self) -> dict[str, Any] | None:
+        """Return the settings to recreate the service after a restart.
+
+        Services that can't be recreated return None.
+        """
+        return None
+
+    def close(self) -> None:  # noqa: B027
+        """Release the resources held by the service, e.g. processes or sessions."""
@@ -2,14 +2,167 @@
 
 # pylint: disable=line-too-long
 
+import contextlib
+import json
+import os
+import queue
 import subprocess
 import sys
+import threading
+from typing import IO, Any
 
 from game.song import Song
+from game.song_catalog import song_catalog
 from music_service.abstract_adapter import AbstractMusicServiceAdapter
 from music_service.error import MusicServiceError
+from music_service.metadata_cache import metadata_cache, song_key
 
-OSA_SCRIPT_PATH = "osascript"
+OSA_SCRIPT_PATH = os.getenv("OSASCRIPT_PATH", "osascript")
+SEPARATOR = "TrackBackSeparator"
+LINE_SEPARATOR = "TrackBackLineSeparator"
+# Seconds a script may take, before the co-process is considered hanging.
+DEFAULT_SCRIPT_TIMEOUT = 10.0
+
+# JavaScript for Automation program that runs as long-lived co-process. It reads
+# one JSON-encoded AppleScript per line from stdin, runs it and writes the result
+# as one JSON line to stdout.
+SCRIPT_RUNNER = """
+ObjC.import('Foundation')
+const stdin = $.NSFileHandle.fileHandleWithStandardInput
+const stdout = $.NSFileHandle.fileHandleWithStandardOutput
+const reply = message => {
+  const line = $.NSString.alloc.initWithUTF8String(JSON.stringify(message) + '\\n')
+  stdout.writeData(line.dataUsingEncoding($.NSUTF8StringEncoding))
+}
+let buffer = ''
+while (true) {
+  const data = stdin.availableData
+  if (data.length === 0) break
+  buffer += $.NSString.alloc.initWithDataEncoding(data, $.NSUTF8StringEncoding).js
+  let newline
+  while ((newline = buffer.indexOf('\\n')) >= 0) {
+    const source = JSON.parse(buffer.slice(0, newline))
+    buffer = buffer.slice(newline + 1)
+    const error = Ref()
+    const result = $.NSAppleScript.alloc.initWithSource(source).executeAndReturnError(error)
+    if (result.isNil()) {
+      reply({ ok: false, error: String(ObjC.deepUnwrap(error[0]).NSAppleScriptErrorMessage) })
+    } else {
+      reply({ ok: true, result: ObjC.unwrap(result.stringValue) || '' })
+    }
+  }
+}
+"""
+
+
+class ScriptRunner:
+    """Runs AppleScripts in one long-lived osascript co-process.
+
+    Starting osascript takes tens of milliseconds, so the process is started once and
+    fed with scripts over stdin/stdout. A thread reads the replies, so waiting for a
+    reply can time out; a co-process that hangs is killed and started again.
+    """
+
+    def __init__(self, timeout: float = DEFAULT_SCRIPT_TIMEOUT) -> None:
+        self.timeout = timeout
+        self._process: subprocess.Popen[str] | None = None
+        # Reply lines of the co-process, an empty line once it exited.
+        self._replies: queue.Queue[str] = queue.Queue()
+        self._lock = threading.Lock()
+
+    def run(self, script: str) -> str:
+        """Run the script and return its result."""
+        with self._lock:
+            process = self._ensure_process()
+            if process.stdin is None:
+                raise MusicServiceError("The osascript co-process has no pipes.")
+            try:
+                process.stdin.write(json.dumps(script) + "\n")
+                process.stdin.flush()
+            except OSError as e:
+                self._stop_process()
+                raise MusicServiceError("The osascript co-process failed.") from e
+            try:
+                line = self._replies.get(timeout=self.timeout)
+            except queue.Empty:
+                # Later scripts would queue up behind the hanging one.
+                self._stop_process(kill=True)
+                raise MusicServiceError(
+                    f"AppleScript did not finish within {self.timeout} s."
+                ) from None
+            if not line:
+                self._stop_process()
+                raise MusicServiceError("The osascript co-process exited unexpectedly.")
+
+        reply = json.loads(line)
+        if not reply["ok"]:
+            raise MusicServiceError(f"AppleScript failed: {reply['error']}")
+        return str(reply["result"])
+
+    def close(self) -> None:
+        """Stop the co-process, a script that is still running is aborted."""
+        if not self._lock.acquire(blocking=False):
+            # Killing the co-process ends the wait for the reply of the running script.
+            if (process := self._process) is not None:
+                process.kill()
+            self._lock.acquire()
+        try:
+            self._stop_process()
+        finally:
+            self._lock.release()
+
+    def _ensure_process(self) -> subprocess.Popen[str]:
+        if self._process is None or self._process.poll() is not None:
+            try:
+                self._process = subprocess.Popen(  # noqa: S603
+                    [OSA_SCRIPT_PATH, "-l", "JavaScript", "-e", SCRIPT_RUNNER],
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    text=True,
+                    encoding="utf-8",
+                )
+            except OSError as e:
+                raise MusicServiceError("Cannot start osascript.") from e
+            # Replies of an earlier co-process must not be taken for the new ones.
+            self._replies = queue.Queue()
+            threading.Thread(
+                target=_read_replies,
+                args=(self._process.stdout, self._replies),
+                name="osascript-replies",
+                daemon=True,
+            ).start()
+        return self._process
+
+    def _stop_process(self, kill: bool = False) -> None:
+        if self._process is not None:
+            if kill:
+                self._process.kill()
+            elif self._process.stdin:
+                self._process.stdin.close()
+            try:
+                self._process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+                self._process.wait()
+            if self._process.stdin:
+                with contextlib.suppress(OSError):  # the pipe broke with the process
+                    self._process.stdin.close()
+            self._process = None
+
+
+def _read_replies(stdout: IO[str] | None, replies: queue.Queue[str]) -> None:
+    """Put the lines of the co-process into the queue, until it exits."""
+    if stdout is None:
+        replies.put("")
+        return
+    try:
+        for line in stdout:
+            replies.put(line)
+    except (OSError, ValueError):  # the pipe was closed
+        pass
+    finally:
+        replies.put("")
+        stdout.close()
 
 
 class AppleMusicAdapter(AbstractMusicServiceAdapter):
@@ -22,68 +175,102 @@ class AppleMusicAdapter(AbstractMusicServiceAdapter):
             raise MusicServiceError("Apple Music is only supported on macOS!")
         if not self.music_app_is_running():
             raise MusicServiceError("Apple Music is not running!")
+        self.script_runner = ScriptRunner()
 
     def current_song(self) -> Song:
         """Get the currently playing song."""
-        if not self._music_is_playing():
-            self.start_playback()
-
-        separator = "TrackBackSeparator"
+        # Starting the playback and querying the song is one round trip.
         script = f"""
     tell application "Music"
+        if player state is not playing then play
         if player state is playing then
             set trackName to name of current track
             set artistName to artist of current track
             set releaseYear to year of current track
-            return trackName & "{separator}" & artistName & "{separator}" & releaseYear
+            set trackId to persistent ID of current track
+            return trackName & "{SEPARATOR}" & artistName & "{SEPARATOR}" & releaseYear & "{SEPARATOR}" & trackId
         else
             return "No song is currently playing"
         end if
     end tell
     """
-        result = subprocess.run(  # noqa: S603
-            [OSA_SCRIPT_PATH, "-e", script],
-            capture_output=True,
-            text=True,
-            check=False,
-        )
+        output = self.script_runner.run(script)
         try:
-            track_name, artist_name, release_year = result.stdout.strip().split(
-                separator
-            )
+            return self._parse_song(output.strip())
         except ValueError as err:
             raise MusicServiceError(
                 f"Failed to parse the current song information. "
-                f"Output was '{result.stdout}'. Check if a song is playing!"
+                f"Output was '{output}'. Check if a song is playing!"
             ) from err
 
-        release_year_int = int(release_year) if release_year.isdigit() else 0
-
-        return Song(title=track_name, artist=artist_name, release_year=release_year_int)
-
-    def start_playback(self) -> None:
-        """Start playing music."""
-        script = """
+    def upcoming_songs(self, count: int) -> list[Song]:
+        """Return the next songs of the current playlist."""
+        script = f"""
     tell application "Music"
-        play
+        set output to ""
+        set thePlaylist to current playlist
+        set currentIndex to index of current track
+        set trackCount to count of tracks of thePlaylist
+        repeat with i from (currentIndex + 1) to (currentIndex + {count})
+            if i > trackCount then exit repeat
+            set t to track i of thePlaylist
+            set output to output & name of t & "{SEPARATOR}" & artist of t & "{SEPARATOR}" & year of t & "{SEPARATOR}" & persistent ID of t & "{LINE_SEPARATOR}"
+        end repeat
+        return output
     end tell
     """
+        output = self.script_runner.run(script)
+        try:
+            return [
+                self._parse_song(line)
+                for line in output.strip().split(LINE_SEPARATOR)
+                if line
+            ]
+        except ValueError as err:
+            raise MusicServiceError(
+                f"Failed to parse the upcoming songs. Output was '{output}'."
+            ) from err
+
+    @staticmethod
+    def _parse_song(output: str) -> Song:
+        track_name, artist_name, release_year, track_id = output.split(SEPARATOR)
+        track_id = f"applemusic:{track_id}"
+        keys = [track_id, song_key(artist_name, track_name)]
+        cached_year = metadata_cache.get_year(keys)
+        if release_year.isdigit() and int(release_year) > 0:
+            release_year_int = int(release_year)
+            # The same track is parsed at every poll, it is stored once.
+            if cached_year != release_year_int:
+                metadata_cache.put_year(keys, release_year_int)
+        else:
+            # The year tag is empty, maybe another game knows the song.
+            release_year_int = cached_year or 0
+
+        return song_catalog.intern(
+            Song(
+                title=track_name,
+                artist=artist_name,
+                release_year=release_year_int,
+                track_id=track_id,
+            )
+        )
 
-        subprocess.run([OSA_SCRIPT_PATH, "-e", script], check=False)  # noqa: S603
+    def snapshot(self) -> dict[str, Any]:
+        """Return the name of the service, the Music app keeps its own state."""
+        return {"provider": "applemusic"}
 
-    def _music_is_playing(self) -> bool:
+    def stats(self) -> dict[str, Any]:
+        """Return the statistics of the release year cache."""
+        return {"metadata_cache": metadata_cache.stats()}
+
+    def start_playback(self) -> None:
+        """Start playing music."""
         script = """
     tell application "Music"
-        return player state is playing
+        play
     end tell
     """
-        result = subprocess.run(  # noqa: S603
-            [OSA_SCRIPT_PATH, "-e", script],
-            capture_output=True,
-            text=True,
-            check=False,
-        )
-        return result.stdout.strip().lower() == "true"
+        self.script_runner.run(script)
 
     def next_track(self) -> None:
         """Skip to the next track."""
@@ -92,7 +279,11 @@ class AppleMusicAdapter(AbstractMusicServiceAdapter):
         next track
     end tell
     """
-        subprocess.run([OSA_SCRIPT_PATH, "-e", script], check=False)  # noqa: S603
+        self.script_runner.run(script)
+
+    def close(self) -> None:
+        """Stop the osascript co-process."""
+        self.script_runner.close()
 
     @staticmethod
     def running_on_macos() -> bool:
@@ -105,10 +296,13 @@ class AppleMusicAdapter(AbstractMusicServiceAdapter):
         script = (
             'tell application "System Events" to (name of processes) contains "Music"'
         )
-        result = subprocess.run(  # noqa: S603
-            [OSA_SCRIPT_PATH, "-e", script],
-            capture_output=True,
-            text=True,
-            check=False,
-        )
+        try:
+            result = subprocess.run(  # noqa: S603
+                [OSA_SCRIPT_PATH, "-e", script],
+                capture_output=True,
+                text=True,
+                check=False,
+            )
+        except OSError:
+            return False
         return result.stdout.strip().lower() == "true"
@@ -0,0 +1,111 @@
+"""Defines the async interface for music services and the executor-backed wrapper."""
+
+import asyncio
+import functools
+import os
+from abc import ABC, abstractmethod
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import ParamSpec, TypeVar
+
+from game.song import Song
+from music_service.abstract_adapter import AbstractMusicServiceAdapter, PlaybackState
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+_executor: ThreadPoolExecutor | None = None
+
+
+def music_service_executor() -> ThreadPoolExecutor:
+    """Return the bounded thread pool, which runs all blocking music service calls."""
+    global _executor  # noqa: PLW0603
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("MUSIC_SERVICE_WORKERS", "16")),
+            thread_name_prefix="music-service",
+        )
+    return _executor
+
+
+# PEP 695 type parameters need Python 3.12, the package still supports 3.11.
+async def run_blocking(  # noqa: UP047
+    fn: Callable[P, T], *args: P.args, **kwargs: P.kwargs
+) -> T:
+    """Run a blocking music service call in the music service thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        music_service_executor(), functools.partial(fn, *args, **kwargs)
+    )
+
+
+class AsyncMusicServiceAdapter(ABC):
+    """Abstract base class that defines the async interface for a music service."""
+
+    service_name: str
+
+    @abstractmethod
+    async def current_song(self) -> Song:
+        """Return the currently playing song."""
+
+    @abstractmethod
+    async def start_playback(self) -> None:
+        """Start playing the music."""
+
+    @abstractmethod
+    async def next_track(self) -> None:
+        """Skip to the next track."""
+
+    @abstractmethod
+    async def playback_state(self) -> PlaybackState:
+        """Return the currently playing song with its progress."""
+
+    @abstractmethod
+    async def upcoming_songs(self, count: int) -> list[Song]:
+        """Return up to count songs that will be played after the current one."""
+
+
+class ExecutorMusicServiceAdapter(AsyncMusicServiceAdapter):
+    """Runs the calls of a synchronous adapter in the music service thread pool.
+
+    The calls of one adapter (i.e. one game session) are serialized, so a slow music
+    service occupies at most one thread and only stalls its own game.
+    """
+
+    def __init__(self, adapter: AbstractMusicServiceAdapter) -> None:
+        self.adapter = adapter
+        self.service_name = adapter.service_name
+        self._lock = asyncio.Lock()
+
+    async def current_song(self) -> Song:
+        """Return the currently playing song."""
+        return await self._call(self.adapter.current_song)
+
+    async def start_playback(self) -> None:
+        """Start playing the music."""
+        await self._call(self.adapter.start_playback)
+
+    async def next_track(self) -> None:
+        """Skip to the next track."""
+        await self._call(self.adapter.next_track)
+
+    async def playback_state(self) -> PlaybackState:
+        """Return the currently playing song with its progress."""
+        return await self._call(self.adapter.playback_state)
+
+    async def upcoming_songs(self, count: int) -> list[Song]:
+        """Return up to count songs that will be played after the current one."""
+        return await self._call(self.adapter.upcoming_songs, count)
+
+    async def _call(self, fn: Callable[P, T], *args: P.args, **kwargs: P.kwargs) -> T:
+        async with self._lock:
+            return await run_blocking(fn, *args, **kwargs)
+
+
+def as_async_adapter(
+    adapter: AbstractMusicServiceAdapter | AsyncMusicServiceAdapter,
+) -> AsyncMusicServiceAdapter:
+    """Return an async adapter, wrapping synchronous adapters automatically."""
+    if isinstance(adapter, AsyncMusicServiceAdapter):
+        return adapter
+    return ExecutorMusicServiceAdapter(adapter)
@@ -1,5 +1,8 @@
 """Defines the MusicServiceFactory class."""
 
+from collections.abc import Mapping
+from typing import Any
+
 from music_service.abstract_adapter import AbstractMusicServiceAdapter
 from music_service.apple_music import AppleMusicAdapter
 from music_service.mock import DummyMusicService
@@ -16,8 +19,13 @@ class MusicServiceFactory:
     @staticmethod
     def create_music_service(
         provider_name: str,
+        options: Mapping[str, Any] | None = None,
     ) -> AbstractMusicServiceAdapter:
-        """Create a music service adapter based on the provided name."""
+        """Create a music service adapter based on the provided name.
+
+        The options configure the mock music service, e.g. its playlist size and
+        latency, and are ignored by the other services.
+        """
         if provider_name == "spotify":
             return SpotifyAdapter()
 
@@ -25,6 +33,32 @@ class MusicServiceFactory:
             return AppleMusicAdapter()
 
         if provider_name == "mock":
-            return DummyMusicService()
+            return DummyMusicService.from_options(options or {})
 
         raise MusicServiceError(f"Invalid music service: '{provider_name}'")
+
+    @staticmethod
+    def restore_music_service(
+        snapshot: Mapping[str, Any],
+    ) -> AbstractMusicServiceAdapter:
+        """Recreate a music service from its snapshot, e.g. after a restart."""
+        provider_name = snapshot["provider"]
+        if provider_name == "spotify":
+            spotify = SpotifyAdapter(session_id=snapshot["session_id"])
+            spotify.authenticate(
+                snapshot["access_token"],
+                snapshot.get("refresh_token"),
+                snapshot.get("expires_at"),
+            )
+            if spotify.token_expired():
+                raise MusicServiceError(
+                    "The Spotify access token of the session expired."
+                )
+            return spotify
+
+        if provider_name == "mock":
+            mock = DummyMusicService.from_options(snapshot["options"])
+            mock.playlist_index = snapshot["playlist_index"]
+            return mock
+
+        return MusicServiceFactory.create_music_service(provider_name)
@@ -0,0 +1,171 @@
+"""Contains the MetadataCache class, which remembers release years across games."""
+
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+
+def isrc_key(isrc: str) -> str:
+    """Return the cache key of a recording, which is the same across services."""
+    return f"isrc:{isrc.upper()}"
+
+
+def song_key(artist: str, title: str) -> str:
+    """Return the fallback cache key, for tracks without a shared ID."""
+    return f"{artist.casefold().strip()}|{title.casefold().strip()}"
+
+
+class MetadataCache:
+    """Release years by track key, in an in-memory LRU backed by a SQLite file.
+
+    Tracks are keyed by their service track ID (e.g. ``spotify:track:<id>``), their
+    ISRC and the artist and title.
+
+    Lookups are answered from memory if possible, and from the SQLite file
+    otherwise. New years are written to the file in batches, either when
+    ``flush_batch_size`` are pending or ``flush_interval`` seconds have passed.
+    Without a path, the cache is kept in memory only. The file is opened on the
+    first lookup that misses the memory or the first flush.
+    """
+
+    def __init__(
+        self,
+        path: str | Path | None = None,
+        max_entries: int = 10_000,
+        flush_batch_size: int = 64,
+        flush_interval: float = 5.0,
+    ) -> None:
+        self.path = Path(path).expanduser() if path else None
+        self.max_entries = max_entries
+        self.flush_batch_size = flush_batch_size
+        self.flush_interval = flush_interval
+
+        self._years: OrderedDict[str, int] = OrderedDict()
+        self._pending: dict[str, int] = {}
+        self._flushed_at = time.monotonic()
+        self._connection: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get_year(self, keys: Iterable[str]) -> int | None:
+        """Return the release year stored under the first known key."""
+        keys = list(keys)
+        with self._lock:
+            for key in keys:
+                if (year := self._years.get(key)) is not None:
+                    self._years.move_to_end(key)
+                    self.hits += 1
+                    return year
+
+            year = self._load(keys)
+            if year is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._remember(keys, year)
+            return year
+
+    def put_year(self, keys: Iterable[str], year: int) -> None:
+        """Store the release year under all keys of the track."""
+        if year <= 0:
+            return
+        keys = list(keys)
+        with self._lock:
+            self._remember(keys, year)
+            if self.path is None:
+                return
+            self._pending.update(dict.fromkeys(keys, year))
+            if (
+                len(self._pending) >= self.flush_batch_size
+                or time.monotonic() - self._flushed_at >= self.flush_interval
+            ):
+                self._flush()
+
+    def flush(self) -> None:
+        """Write the pending years to the SQLite file."""
+        with self._lock:
+            self._flush()
+
+    def close(self) -> None:
+        """Write the pending years and close the SQLite file."""
+        with self._lock:
+            self._flush()
+            if self._connection:
+                self._connection.close()
+                self._connection = None
+
+    def stats(self) -> dict[str, Any]:
+        """Return the hit and miss counters of the cache."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._years),
+        }
+
+    def _remember(self, keys: list[str], year: int) -> None:
+        for key in keys:
+            self._years[key] = year
+            self._years.move_to_end(key)
+        while len(self._years) > self.max_entries:
+            self._years.popitem(last=False)
+
+    def _load(self, keys: list[str]) -> int | None:
+        for key in keys:
+            if key in self._pending:
+                return self._pending[key]
+        if (connection := self._connect()) is None:
+            return None
+        for key in keys:
+            row = connection.execute(
+                "SELECT year FROM release_years WHERE key = ?", (key,)
+            ).fetchone()
+            if row:
+                return row[0]
+        return None
+
+    def _flush(self) -> None:
+        self._flushed_at = time.monotonic()
+        if not self._pending or (connection := self._connect()) is None:
+            return
+        try:
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO release_years (key, year) VALUES (?, ?)",
+                    self._pending.items(),
+                )
+        except sqlite3.Error as e:
+            logging.warning("Writing the metadata cache failed: %s", e)
+        self._pending.clear()
+
+    def _connect(self) -> sqlite3.Connection | None:
+        if self._connection is None and self.path is not None:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._connection = sqlite3.connect(self.path, check_same_thread=False)
+                self._connection.execute(
+                    "CREATE TABLE IF NOT EXISTS release_years "
+                    "(key TEXT PRIMARY KEY, year INTEGER NOT NULL)"
+                )
+            except (OSError, sqlite3.Error) as e:
+                logging.warning("Cannot open the metadata cache %s: %s", self.path, e)
+                # Keep working from memory.
+                self.path = None
+                self._connection = None
+        return self._connection
+
+
+# Global instance (singleton), shared by the music services of all games. It is kept
+# in memory, unless METADATA_CACHE_PATH is set.
+metadata_cache = MetadataCache(os.getenv("METADATA_CACHE_PATH") or None)
+atexit.register(metadata_cache.close)
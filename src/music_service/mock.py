@@ -1,16 +1,62 @@
 """Contains a mock music service for testing purposes."""
 
+import functools
+import math
+import random
+import time
+from collections.abc import Mapping
+from dataclasses import asdict, dataclass, replace
+from typing import Any
+
 from game.song import Song
+from game.song_catalog import song_catalog
 from music_service.abstract_adapter import AbstractMusicServiceAdapter
+from music_service.error import MusicServiceError
 
+# Relative share of songs per decade in a typical hit playlist, from 1950 on.
+DECADE_WEIGHTS = [2, 6, 10, 13, 14, 15, 18, 22]
+LAST_YEAR = 2024
+# z-score of the 99th percentile of the standard normal distribution
+Z_99 = 2.326
 
-class DummyMusicService(AbstractMusicServiceAdapter):
-    """Mock music service for testing purposes."""
 
-    service_name = "Dummy Music Service"
+@dataclass(frozen=True)
+class Latency:
+    """Log-normal latency of a call, given by its median and 99th percentile."""
+
+    p50_ms: float = 0.0
+    p99_ms: float = 0.0
+
+    def sample(self, rng: random.Random) -> float:
+        """Return a random latency in seconds."""
+        if self.p50_ms <= 0:
+            return 0.0
+        sigma = math.log(max(self.p99_ms, self.p50_ms) / self.p50_ms) / Z_99
+        return rng.lognormvariate(math.log(self.p50_ms), sigma) / 1000
+
 
-    def __init__(self) -> None:
-        self.playlist: list[Song] = [
+def synthetic_playlist(song_count: int, seed: int = 0) -> list[Song]:
+    """Return a shuffled playlist of made-up songs, with years spread like real hits."""
+    rng = random.Random(seed)  # noqa: S311
+    decades = rng.choices(range(1950, 2030, 10), weights=DECADE_WEIGHTS, k=song_count)
+    return [
+        Song(
+            title=f"Song {index}",
+            artist=f"Artist {rng.randrange(max(song_count // 3, 1))}",
+            release_year=min(decade + rng.randrange(10), LAST_YEAR),
+        )
+        for index, decade in enumerate(decades)
+    ]
+
+
+@functools.lru_cache(maxsize=16)
+def interned_playlist(song_count: int | None, seed: int) -> tuple[Song, ...]:
+    """Return the songs of a mock playlist, built once per size and seed.
+
+    Without a song count, the playlist has six well-known songs.
+    """
+    if song_count is None:
+        playlist = [
             Song(title="Yesterday", artist="The Beatles", release_year=1965),
             Song(title="Bohemian Rhapsody", artist="Queen", release_year=1975),
             Song(
@@ -26,18 +72,116 @@ class DummyMusicService(AbstractMusicServiceAdapter):
                 release_year=2021,
             ),
         ]
+        prefix = "mock"
+    else:
+        playlist = synthetic_playlist(song_count, seed)
+        prefix = f"mock-{seed}"
+    return tuple(
+        song_catalog.intern(replace(song, track_id=f"{prefix}:{index}"))
+        for index, song in enumerate(playlist)
+    )
+
+
+class DummyMusicService(AbstractMusicServiceAdapter):
+    """Mock music service for testing purposes.
+
+    By default it plays six songs, ordered by release year, and answers instantly.
+    For load tests it can play a seeded synthetic playlist of any size, and delay or
+    fail its calls like a real music service would.
+    """
+
+    service_name = "Dummy Music Service"
+
+    def __init__(  # noqa: PLR0913
+        self,
+        *,
+        song_count: int | None = None,
+        seed: int = 0,
+        latency: Mapping[str, Latency] | None = None,
+        error_rate: float = 0.0,
+        timeout_rate: float = 0.0,
+        timeout_ms: float = 5000.0,
+    ) -> None:
+        if song_count is not None and song_count <= 0:
+            raise ValueError("The playlist needs at least one song.")
+        self.playlist: list[Song] = list(interned_playlist(song_count, seed))
         self.playlist_index = 0
 
+        # Options of from_options, to recreate the service after a restart.
+        self.options: dict[str, Any] = {
+            "song_count": song_count,
+            "seed": seed,
+            "latency": {call: asdict(value) for call, value in (latency or {}).items()},
+            "error_rate": error_rate,
+            "timeout_rate": timeout_rate,
+            "timeout_ms": timeout_ms,
+        }
+        # Latency per call name, "default" applies to all other calls.
+        self.latency = dict(latency or {})
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_ms = timeout_ms
+        self._rng = random.Random(seed)  # noqa: S311
+
+    @classmethod
+    def from_options(cls, options: Mapping[str, Any]) -> "DummyMusicService":
+        """Create the mock from JSON options, e.g. of a create game request.
+
+        Latencies are given as ``{"current_song": {"p50_ms": 80, "p99_ms": 900}}``.
+        Raise a ValueError if the options are invalid.
+        """
+        options = dict(options)
+        try:
+            latency = {
+                call: Latency(**distribution)
+                for call, distribution in options.pop("latency", {}).items()
+            }
+            return cls(latency=latency, **options)
+        except (AttributeError, TypeError) as e:
+            raise ValueError(f"Invalid mock music service options: {e}") from e
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return the options and the position in the playlist."""
+        return {
+            "provider": "mock",
+            "options": self.options,
+            "playlist_index": self.playlist_index,
+        }
+
     def current_song(self) -> Song:
         """Return the currently playing song."""
+        self._simulate("current_song")
         return self.playlist[self.playlist_index]
 
+    def upcoming_songs(self, count: int) -> list[Song]:
+        """Return the next songs of the playlist."""
+        self._simulate("upcoming_songs")
+        return [
+            self.playlist[(self.playlist_index + offset) % len(self.playlist)]
+            for offset in range(1, min(count, len(self.playlist)) + 1)
+        ]
+
     def start_playback(self) -> None:
         """Reset the playlist index to start playback."""
+        self._simulate("start_playback")
         self.playlist_index = 0
 
     def next_track(self) -> None:
         """Skip to next track. Songs are orderer by release year."""
+        self._simulate("next_track")
         self.playlist_index += 1
         if self.playlist_index >= len(self.playlist):
             self.playlist_index = 0  # Loop back around
+
+    def _simulate(self, call: str) -> None:
+        """Delay the call and inject errors and timeouts at the configured rates."""
+        latency = self.latency.get(call) or self.latency.get("default")
+        if latency and (delay := latency.sample(self._rng)):
+            time.sleep(delay)
+
+        roll = self._rng.random()
+        if roll < self.timeout_rate:
+            time.sleep(self.timeout_ms / 1000)
+            raise MusicServiceError(f"Injected timeout in {call}.")
+        if roll < self.timeout_rate + self.error_rate:
+            raise MusicServiceError(f"Injected error in {call}.")
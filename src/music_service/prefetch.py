@@ -0,0 +1,57 @@
+"""Contains the TrackPrefetcher class, which looks ahead in the playback queue."""
+
+from collections import deque
+
+from game.song import Song
+
+
+class TrackPrefetcher:
+    """Holds the metadata of the next tracks, fetched ahead of the round transitions.
+
+    When the game skips to the next track, the predicted song serves the new round
+    right away. The prediction is confirmed by the next poll of the music service,
+    which also drives the hit rate used to tune the lookahead.
+    """
+
+    def __init__(self, lookahead: int = 3) -> None:
+        self.lookahead = lookahead
+        self.upcoming: deque[Song] = deque()
+
+        self.hits = 0
+        self.misses = 0
+
+    def needs_refill(self) -> bool:
+        """Return True if there are no more predicted songs."""
+        return self.lookahead > 0 and not self.upcoming
+
+    def fill(self, upcoming_songs: list[Song]) -> None:
+        """Replace the predicted songs with freshly fetched ones."""
+        self.upcoming = deque(upcoming_songs[: self.lookahead])
+
+    def take_next(self) -> Song | None:
+        """Return the song predicted to play after skipping to the next track."""
+        return self.upcoming.popleft() if self.upcoming else None
+
+    def record(self, predicted: Song, actual: Song) -> None:
+        """Record whether a predicted song turned out to be the one playing."""
+        if predicted == actual:
+            self.hits += 1
+        else:
+            self.misses += 1
+            # The queue changed, the remaining predictions are stale as well.
+            self.upcoming.clear()
+
+    @property
+    def hit_rate(self) -> float:
+        """Return the share of predictions that were correct."""
+        predictions = self.hits + self.misses
+        return self.hits / predictions if predictions else 0.0
+
+    def stats(self) -> dict[str, float | int]:
+        """Return the prefetch statistics."""
+        return {
+            "lookahead": self.lookahead,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+        }
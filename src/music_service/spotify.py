@@ -1,8 +1,15 @@
 """Implementation of the SpotifyClient class."""
 
+import functools
+import itertools
 import json
+import logging
 import os
+import threading
+import time
+from collections.abc import Callable, Iterator
 from datetime import datetime
+from typing import Any, TypeVar
 
 import spotipy
 from fastapi import APIRouter, Request
@@ -12,53 +19,106 @@ from spotipy.oauth2 import SpotifyOAuth
 
 from game.game_logic import GameLogic
 from game.song import Song
-from music_service.abstract_adapter import AbstractMusicServiceAdapter
+from game.song_catalog import song_catalog
+from music_service.abstract_adapter import AbstractMusicServiceAdapter, PlaybackState
+from music_service.async_adapter import music_service_executor, run_blocking
 from music_service.error import MusicServiceError
+from music_service.metadata_cache import isrc_key, metadata_cache, song_key
+from music_service.spotify_scheduler import Priority, spotify_scheduler
 from server.game_sessions import game_session_manager
 
+T = TypeVar("T")
+
+# Seconds before the access token expires, from which on it is refreshed.
+TOKEN_REFRESH_MARGIN = 60
+
+# Only the fields needed for the songs, which keeps the playlist pages small.
+PLAYLIST_ITEM_FIELDS = (
+    "items(track(uri,type,name,artists(name),external_ids,album(release_date,images))),"
+    "next"
+)
+
 
 class SpotifyAdapter(AbstractMusicServiceAdapter):
     """Interface to the Spotify API."""
 
     service_name = "Spotify"
+    skip_settle_time = 1.0
 
-    def __init__(self) -> None:
+    def __init__(self, session_id: str = "", max_preloaded_tracks: int = 1000) -> None:
         self.session: spotipy.Spotify | None = None
-
-    def authenticate(self, access_token: str) -> None:
-        """Authenticate the Spotify session with the provided access token."""
-        self.session = spotipy.Spotify(auth=access_token)
+        self._access_token: str | None = None
+        self._refresh_token: str | None = None
+        # Expiry of the access token, in seconds since the epoch.
+        self._expires_at: float | None = None
+        self._token_lock = threading.Lock()
+        # Spotify calls in flight, the last one closes the client of a closed adapter.
+        self._calls = 0
+        self._calls_lock = threading.Lock()
+        self._closed_session: spotipy.Spotify | None = None
+        # Game session, whose API usage the calls are counted for.
+        self.session_id = session_id
+        # Songs of the played playlist or album by track URI, parsed once up front.
+        self.tracks: dict[str, Song] = {}
+        self.max_preloaded_tracks = max_preloaded_tracks
+
+    def authenticate(
+        self,
+        access_token: str,
+        refresh_token: str | None = None,
+        expires_at: float | None = None,
+    ) -> None:
+        """Authenticate the Spotify session with the provided access token.
+
+        With a refresh token, the access token is renewed shortly before it expires
+        at expires_at, in seconds since the epoch.
+        """
+        self._access_token = access_token
+        self._refresh_token = refresh_token
+        self._expires_at = expires_at
+        self.session = create_spotify_client(access_token)
 
     def current_song(self) -> Song:
         """Get the currently playing song."""
-        if not self.session:
-            raise MusicServiceError("Spotify session is not yet authenticated.")
-        playback = self.session.current_playback()
-        if playback["is_playing"] is False:
+        return self.playback_state().song
+
+    def playback_state(self) -> PlaybackState:
+        """Get the currently playing song and its progress."""
+        session = self._client()
+        playback = self._call(session.currently_playing, Priority.CRITICAL)
+        if not playback or playback["is_playing"] is False or not playback["item"]:
             raise MusicServiceError("Spotify is not playing.")
-        song_name = playback["item"]["name"]
-        artist_names = ", ".join(
-            [artist["name"] for artist in playback["item"]["artists"]]
+        item = playback["item"]
+        return PlaybackState(
+            song=self._song(item),
+            progress_ms=playback.get("progress_ms"),
+            duration_ms=item.get("duration_ms"),
         )
-        release_year = extract_year(playback["item"]["album"]["release_date"])
-        album_cover_url = playback["item"]["album"]["images"][-1]["url"]
 
-        return Song(
-            title=song_name,
-            artist=artist_names,
-            release_year=release_year,
-            album_cover_url=album_cover_url,
-        )
+    def upcoming_songs(self, count: int) -> list[Song]:
+        """Return the next songs of the user's playback queue.
+
+        The songs end before the first queued item that is no song, e.g. an episode,
+        since the predictions have to follow the order of the queue.
+        """
+        session = self._client()
+        queue = self._call(session.queue, Priority.COSMETIC)
+        songs = []
+        for item in queue["queue"][:count]:
+            try:
+                songs.append(self._song(item))
+            except MusicServiceError:
+                break
+        return songs
 
     def start_playback(self) -> None:
         """Start playing music."""
-        if not self.session:
-            raise MusicServiceError("Spotify session is not yet authenticated.")
+        session = self._client()
         try:
-            self.session.start_playback()
+            self._call(session.start_playback, Priority.CRITICAL)
         except spotipy.exceptions.SpotifyException:
             try:
-                self.session.next_track()
+                self._call(session.next_track, Priority.CRITICAL)
             except spotipy.exceptions.SpotifyException as e:
                 raise MusicServiceError(
                     "Cannot start playback. Spotify is probably not running."
@@ -66,9 +126,199 @@ class SpotifyAdapter(AbstractMusicServiceAdapter):
 
     def next_track(self) -> None:
         """Skip to the next track."""
+        self._call(self._client().next_track, Priority.CRITICAL)
+
+    def preload_tracks(self) -> None:
+        """Fetch the songs of the playlist or album that is being played in bulk.
+
+        Afterwards the songs of the game are looked up by their track URI, instead of
+        being parsed from every playback response.
+        """
+        session = self._client()
+        playback = self._call(session.current_playback, Priority.NORMAL)
+        context = playback.get("context") if playback else None
+        if not context:
+            logging.info("Nothing to preload, Spotify is not playing a playlist.")
+            return
+
+        if context["type"] == "playlist":
+            tracks = self._playlist_tracks(session, context["uri"])
+        elif context["type"] == "album":
+            tracks = self._album_tracks(session, context["uri"])
+        else:
+            logging.info("Cannot preload the tracks of a %s.", context["type"])
+            return
+
+        for track in itertools.islice(tracks, self.max_preloaded_tracks):
+            try:
+                self.tracks[track["uri"]] = song_from_track(track)
+            except (KeyError, IndexError, TypeError, ValueError):
+                logging.debug("Skipping track without metadata: %s", track.get("uri"))
+        logging.info("Preloaded %d tracks from %s.", len(self.tracks), context["uri"])
+
+    def _playlist_tracks(
+        self, session: spotipy.Spotify, playlist_uri: str
+    ) -> Iterator[dict[str, Any]]:
+        page = self._call(
+            functools.partial(
+                session.playlist_items,
+                playlist_uri,
+                fields=PLAYLIST_ITEM_FIELDS,
+                additional_types=("track",),
+            ),
+            Priority.NORMAL,
+        )
+        while page:
+            for item in page["items"]:
+                if (track := item.get("track")) and track.get("type") == "track":
+                    yield track
+            page = (
+                self._call(functools.partial(session.next, page), Priority.NORMAL)
+                if page.get("next")
+                else None
+            )
+
+    def _album_tracks(
+        self, session: spotipy.Spotify, album_uri: str
+    ) -> Iterator[dict[str, Any]]:
+        album = self._call(functools.partial(session.album, album_uri), Priority.NORMAL)
+        page = album["tracks"]
+        while page:
+            for track in page["items"]:
+                # Tracks of an album page come without the album object.
+                yield {**track, "album": album}
+            page = (
+                self._call(functools.partial(session.next, page), Priority.NORMAL)
+                if page.get("next")
+                else None
+            )
+
+    def _song(self, track: dict[str, Any]) -> Song:
+        """Return the song of a track object.
+
+        Raise a MusicServiceError for items without a song, e.g. episodes or local
+        files without an album.
+        """
+        if song := self.tracks.get(track.get("uri", "")):
+            return song
+        if track.get("type") != "track":
+            raise MusicServiceError(
+                f"{track.get('uri')} is no song, but a {track.get('type')}."
+            )
+        try:
+            return song_from_track(track)
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            raise MusicServiceError(
+                f"{track.get('uri')} is a track without release date."
+            ) from e
+
+    def snapshot(self) -> dict[str, Any] | None:
+        """Return the tokens of the game session, if it was authenticated."""
+        if not self._access_token:
+            return None
+        return {
+            "provider": "spotify",
+            "session_id": self.session_id,
+            "access_token": self._access_token,
+            "refresh_token": self._refresh_token,
+            "expires_at": self._expires_at,
+        }
+
+    def token_expired(self) -> bool:
+        """Return whether the access token expired and can't be refreshed."""
+        return (
+            self._refresh_token is None
+            and self._expires_at is not None
+            and self._expires_at <= time.time()
+        )
+
+    def stats(self) -> dict[str, Any]:
+        """Return the Spotify API usage of the game session."""
+        return {
+            "api_usage": spotify_scheduler.usage_of(self.session_id),
+            "preloaded_tracks": len(self.tracks),
+            "metadata_cache": metadata_cache.stats(),
+        }
+
+    def close(self) -> None:
+        """Drop the API usage of the game session and close its HTTP connections.
+
+        The connections are closed once the calls in flight finished.
+        """
+        spotify_scheduler.forget(self.session_id)
+        with self._calls_lock:
+            session, self.session = self.session, None
+            if self._calls:
+                self._closed_session, session = session, None
+        close_http_connections(session)
+        self.tracks.clear()
+
+    def _client(self) -> spotipy.Spotify:
+        """Return the Spotify client, with an access token that is still valid."""
+        if self._token_expiring():
+            with self._token_lock:
+                if self._token_expiring() and self._refresh_token:
+                    self._refresh_access_token(self._refresh_token)
         if not self.session:
             raise MusicServiceError("Spotify session is not yet authenticated.")
-        self.session.next_track()
+        return self.session
+
+    def _token_expiring(self) -> bool:
+        return (
+            self._refresh_token is not None
+            and self._expires_at is not None
+            and time.time() >= self._expires_at - TOKEN_REFRESH_MARGIN
+        )
+
+    def _refresh_access_token(self, refresh_token: str) -> None:
+        try:
+            token_info = get_spotify_oauth().refresh_access_token(refresh_token)
+        except spotipy.exceptions.SpotifyOauthError as e:
+            raise MusicServiceError(
+                "Refreshing the Spotify access token failed."
+            ) from e
+        self.authenticate(
+            token_info["access_token"],
+            # Spotify may or may not rotate the refresh token.
+            token_info.get("refresh_token") or refresh_token,
+            token_info["expires_at"],
+        )
+
+    def _call(self, fn: Callable[[], T], priority: Priority) -> T:
+        with self._calls_lock:
+            self._calls += 1
+        try:
+            return spotify_scheduler.call(
+                fn, priority=priority, session_id=self.session_id
+            )
+        finally:
+            with self._calls_lock:
+                self._calls -= 1
+                closed = None if self._calls else self._closed_session
+                if closed:
+                    self._closed_session = None
+            close_http_connections(closed)
+
+
+def create_spotify_client(access_token: str) -> spotipy.Spotify:
+    """Create a Spotify client, which leaves retrying to the request scheduler.
+
+    spotipy would otherwise sleep through rate limits inside the request thread.
+    """
+    return spotipy.Spotify(
+        auth=access_token, retries=0, status_retries=0, status_forcelist=()
+    )
+
+
+def close_http_connections(client: spotipy.Spotify | None) -> None:
+    """Close the connection pool of a client.
+
+    spotipy only closes it when the client is garbage collected, and offers no
+    public way to close it.
+    """
+    http_session = getattr(client, "_session", None)
+    if close := getattr(http_session, "close", None):
+        close()
 
 
 # ----------------------
@@ -118,7 +368,7 @@ def spotify_login(state: str = "") -> RedirectResponse:
 
 
 @router.get("/spotify-callback")
-def spotify_callback(request: Request) -> HTMLResponse:
+async def spotify_callback(request: Request) -> HTMLResponse:
     """Handle the Spotify OAuth callback after user authorization.
 
     This endpoint is triggered by Spotify after a user logs in and approves access. It
@@ -158,22 +408,30 @@ def spotify_callback(request: Request) -> HTMLResponse:
         return HTMLResponse("❌ Missing target_song_count", status_code=400)
 
     sp_oauth = get_spotify_oauth()
-    token_info = sp_oauth.get_access_token(code)
+    # The Spotify requests block, the session is added on the event loop.
+    token_info = await run_blocking(sp_oauth.get_access_token, code)
 
     if not token_info:
         return HTMLResponse("❌ Could not get token from Spotify", status_code=400)
 
     access_token = token_info["access_token"]
-    sp = spotipy.Spotify(auth=access_token)
+    sp = create_spotify_client(access_token)
 
-    user_profile = sp.current_user()
+    user_profile = await run_blocking(
+        spotify_scheduler.call, sp.current_user, session_id=game_id
+    )
     username = user_profile["id"]
 
-    adapter = SpotifyAdapter()
-    adapter.authenticate(access_token)
+    adapter = SpotifyAdapter(session_id=game_id)
+    adapter.authenticate(
+        access_token, token_info.get("refresh_token"), token_info.get("expires_at")
+    )
     game = GameLogic(target_song_count=target_song_count, music_service=adapter)
 
-    game_session_manager.add_game(game_id, game)
+    await game_session_manager.add_game_async(game_id, game)
+
+    # Large playlists take many requests, the login doesn't wait for them.
+    music_service_executor().submit(_preload_tracks, adapter, game_id)
 
     return HTMLResponse(
         content=f"✅ Logged in as <b>{username}</b>. "
@@ -181,6 +439,42 @@ def spotify_callback(request: Request) -> HTMLResponse:
     )
 
 
+def _preload_tracks(adapter: SpotifyAdapter, game_id: str) -> None:
+    try:
+        adapter.preload_tracks()
+    except (MusicServiceError, spotipy.exceptions.SpotifyException) as e:
+        # The songs are parsed from the playback responses instead.
+        logging.warning("Preloading the tracks of game %s failed: %s", game_id, e)
+    except Exception:  # the executor would drop it silently
+        logging.exception("Preloading the tracks of game %s failed.", game_id)
+
+
+def song_from_track(track: dict[str, Any]) -> Song:
+    """Create the song from a Spotify track object."""
+    title = track["name"]
+    artist = ", ".join([artist["name"] for artist in track["artists"]])
+    keys = [track["uri"]]
+    if isrc := track.get("external_ids", {}).get("isrc"):
+        keys.append(isrc_key(isrc))
+
+    release_year = metadata_cache.get_year(keys)
+    if release_year is None:
+        release_year = extract_year(track["album"]["release_date"])
+        metadata_cache.put_year([*keys, song_key(artist, title)], release_year)
+
+    return song_catalog.intern(
+        Song(
+            title=title,
+            artist=artist,
+            release_year=release_year,
+            album_cover_url=images[-1]["url"]
+            if (images := track["album"]["images"])
+            else "",
+            track_id=track["uri"],
+        )
+    )
+
+
 def extract_year(date_str: str) -> int:
     """Extract the year from a date and handle different date formats."""
     formats = ["%Y-%m-%d", "%Y-%m", "%Y"]
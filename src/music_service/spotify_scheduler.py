@@ -0,0 +1,180 @@
+"""Contains the SpotifyRequestScheduler, which paces all calls to the Spotify API."""
+
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from enum import IntEnum
+from http import HTTPStatus
+from typing import ParamSpec, TypeVar
+
+from spotipy.exceptions import SpotifyException
+
+from music_service.error import MusicServiceError
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+DEFAULT_RETRY_AFTER = 1.0
+
+
+class Priority(IntEnum):
+    """Priority of a Spotify call, lower values are served first."""
+
+    CRITICAL = 0  # needed to play the round, e.g. the current playback or skipping
+    NORMAL = 1
+    COSMETIC = 2  # nice to have, e.g. looking ahead in the queue
+
+
+@dataclass
+class ApiUsage:
+    """Spotify API calls made on behalf of one game session."""
+
+    requests: int = 0
+    throttled: int = 0
+    shed: int = 0
+
+
+class SpotifyRequestScheduler:
+    """Paces the Spotify calls of all game sessions, which share one rate limit.
+
+    Calls take a token from a token bucket before they are sent. Waiting calls are
+    served by priority, so round-critical calls overtake cosmetic ones, and cosmetic
+    calls give up instead of waiting long. A 429 response blocks all calls for its
+    ``Retry-After`` period, after which the call is retried.
+    """
+
+    def __init__(
+        self,
+        rate: float = 5.0,
+        burst: int = 10,
+        max_retries: int = 2,
+        max_retry_after: float = 10.0,
+        cosmetic_max_wait: float = 2.0,
+    ) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.max_retry_after = max_retry_after
+        self.cosmetic_max_wait = cosmetic_max_wait
+
+        self._condition = threading.Condition()
+        self._waiting: list[tuple[Priority, int]] = []
+        self._tickets = itertools.count()
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._blocked_until = 0.0
+
+        self.usage: defaultdict[str, ApiUsage] = defaultdict(ApiUsage)
+
+    def call(
+        self,
+        fn: Callable[P, T],
+        *args: P.args,
+        priority: Priority = Priority.NORMAL,
+        session_id: str = "",
+        **kwargs: P.kwargs,
+    ) -> T:
+        """Call the Spotify API once it is the call's turn and count it for the session.
+
+        Raise a MusicServiceError if a cosmetic call would wait too long or Spotify
+        asks to back off for longer than ``max_retry_after``.
+        """
+        with self._condition:
+            usage = self.usage[session_id]
+        for attempt in itertools.count():
+            self._acquire(priority, usage)
+            try:
+                return fn(*args, **kwargs)
+            except SpotifyException as e:
+                if e.http_status != HTTPStatus.TOO_MANY_REQUESTS:
+                    raise
+                retry_after = self._throttle(e, usage)
+                if attempt >= self.max_retries or retry_after > self.max_retry_after:
+                    raise MusicServiceError(
+                        f"Spotify rate limit reached, retry after {retry_after:.0f}s."
+                    ) from e
+                logging.info("Spotify rate limit reached, retry in %.1fs.", retry_after)
+        raise AssertionError("unreachable")
+
+    def usage_of(self, session_id: str) -> dict[str, int]:
+        """Return the API usage of a game session."""
+        with self._condition:
+            return asdict(self.usage.get(session_id, ApiUsage()))
+
+    def forget(self, session_id: str) -> None:
+        """Drop the API usage of a closed game session."""
+        with self._condition:
+            self.usage.pop(session_id, None)
+
+    def _acquire(self, priority: Priority, usage: ApiUsage) -> None:
+        """Wait for the turn of the call and count it for the session."""
+        entry = (priority, next(self._tickets))
+        deadline = (
+            time.monotonic() + self.cosmetic_max_wait
+            if priority == Priority.COSMETIC
+            else None
+        )
+        with self._condition:
+            heapq.heappush(self._waiting, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = self._wait_time(now)
+                    is_next = self._waiting[0] == entry
+                    if is_next and wait <= 0:
+                        heapq.heappop(self._waiting)
+                        self._tokens -= 1
+                        usage.requests += 1
+                        # The next caller in line has to check the bucket now.
+                        self._condition.notify_all()
+                        return
+                    timeout = wait if is_next else None
+                    if deadline is not None:
+                        if now >= deadline:
+                            usage.shed += 1
+                            raise MusicServiceError(
+                                "Spotify is busy, skipped a non-essential request."
+                            )
+                        timeout = min(timeout or deadline - now, deadline - now)
+                    self._condition.wait(timeout)
+            except BaseException:
+                if entry in self._waiting:
+                    self._waiting.remove(entry)
+                    heapq.heapify(self._waiting)
+                    self._condition.notify_all()
+                raise
+
+    def _wait_time(self, now: float) -> float:
+        """Return the time until a call may be sent. Call with the lock held."""
+        self._tokens = min(
+            self.burst, self._tokens + (now - self._refilled_at) * self.rate
+        )
+        self._refilled_at = now
+        token_wait = max(0.0, (1 - self._tokens) / self.rate)
+        return max(token_wait, self._blocked_until - now)
+
+    def _throttle(self, error: SpotifyException, usage: ApiUsage) -> float:
+        try:
+            retry_after = float(error.headers.get("Retry-After", DEFAULT_RETRY_AFTER))
+        except (AttributeError, TypeError, ValueError):
+            retry_after = DEFAULT_RETRY_AFTER
+        with self._condition:
+            usage.throttled += 1
+            self._blocked_until = max(
+                self._blocked_until, time.monotonic() + retry_after
+            )
+            self._condition.notify_all()
+        return retry_after
+
+
+# Global instance (singleton), all sessions share the rate limit of the Spotify app.
+spotify_scheduler = SpotifyRequestScheduler(
+    rate=float(os.getenv("SPOTIFY_REQUESTS_PER_SECOND", "5")),
+    burst=int(os.getenv("SPOTIFY_REQUEST_BURST", "10")),
+)
@@ -0,0 +1,216 @@
+"""Contains the ClusterLink class, which connects a worker to the other workers.
+
+A worker that receives a request for a session owned by another worker forwards it
+over pub/sub. Every worker listens on the channel ``worker:<id>`` for:
+
+- ``join`` and ``start`` requests, answered on the ``reply_to`` channel,
+- ``connect``, ``client_message`` and ``disconnect`` of players, whose WebSocket is
+  connected to another worker. The owner sends messages to such a player through a
+  RemoteWebSocket, which publishes them on the player's ``client:`` channel.
+"""
+
+import asyncio
+import contextlib
+import itertools
+import logging
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from starlette.websockets import WebSocketState
+
+from server.outbound import CLOSE_GOING_AWAY
+from server.session_store import PubSub, Subscription
+from server.websocket_handler import PING_MESSAGES
+
+DEFAULT_REQUEST_TIMEOUT = 10.0
+
+
+def worker_channel(worker_id: str) -> str:
+    """Return the channel on which a worker receives requests."""
+    return f"worker:{worker_id}"
+
+
+class RemoteWebSocket:
+    """Stands in for the WebSocket of a player connected to another worker."""
+
+    def __init__(self, pubsub: PubSub, client_channel: str) -> None:
+        self.pubsub = pubsub
+        self.client_channel = client_channel
+        self.application_state = WebSocketState.CONNECTED
+
+    async def send_text(self, text: str) -> None:
+        """Forward a message to the worker that holds the WebSocket."""
+        if self.application_state != WebSocketState.CONNECTED:
+            raise ConnectionError("The remote WebSocket is closed.")
+        await self.pubsub.publish(self.client_channel, {"op": "send", "text": text})
+
+    async def close(self, code: int = 1000) -> None:
+        """Ask the worker that holds the WebSocket to close it."""
+        self.application_state = WebSocketState.DISCONNECTED
+        await self.pubsub.publish(self.client_channel, {"op": "close", "code": code})
+
+
+class ClusterLink:
+    """Sends requests to the workers owning sessions and serves their requests."""
+
+    def __init__(
+        self,
+        pubsub: PubSub,
+        worker_id: str,
+        request_timeout: float = DEFAULT_REQUEST_TIMEOUT,
+    ) -> None:
+        self.pubsub = pubsub
+        self.worker_id = worker_id
+        self.request_timeout = request_timeout
+
+        self._request_ids = itertools.count()
+        self._pending: dict[int, asyncio.Future[dict[str, Any]]] = {}
+        self._tasks: list[asyncio.Task[None]] = []
+
+    @property
+    def reply_channel(self) -> str:
+        """Return the channel on which this worker receives replies."""
+        return f"reply:{self.worker_id}"
+
+    async def start(
+        self, handle_request: Callable[[dict[str, Any]], Awaitable[dict | None]]
+    ) -> None:
+        """Serve the requests of other workers with the handler.
+
+        The handler returns the reply to ``join`` and ``start`` requests.
+        """
+        requests = await self.pubsub.subscribe(worker_channel(self.worker_id))
+        replies = await self.pubsub.subscribe(self.reply_channel)
+        self._tasks = [
+            asyncio.create_task(self._serve(requests, handle_request)),
+            asyncio.create_task(self._receive_replies(replies)),
+        ]
+
+    async def close(self) -> None:
+        """Stop serving requests."""
+        for task in self._tasks:
+            task.cancel()
+        for future in self._pending.values():
+            future.cancel()
+        await self.pubsub.close()
+
+    async def request(self, owner: str, message: dict[str, Any]) -> dict[str, Any]:
+        """Send a request to the owner of a session and return its reply.
+
+        Raise a TimeoutError if the owner doesn't reply in time.
+        """
+        request_id = next(self._request_ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            await self.send(
+                owner,
+                message | {"request_id": request_id, "reply_to": self.reply_channel},
+            )
+            return await asyncio.wait_for(future, self.request_timeout)
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def send(self, owner: str, message: dict[str, Any]) -> None:
+        """Send a message to the owner of a session, without waiting for a reply."""
+        await self.pubsub.publish(worker_channel(owner), message)
+
+    async def _serve(
+        self,
+        requests: Subscription,
+        handle_request: Callable[[dict[str, Any]], Awaitable[dict | None]],
+    ) -> None:
+        # Requests of different sessions are handled concurrently, those of one
+        # session in the order they were sent.
+        last_of_session: dict[str, asyncio.Task[None]] = {}
+        async for message in requests:
+            game_id = message.get("game_id", "")
+            task = asyncio.create_task(
+                self._handle(message, handle_request, last_of_session.get(game_id))
+            )
+            last_of_session[game_id] = task
+            task.add_done_callback(
+                lambda done, game_id=game_id: (
+                    last_of_session.get(game_id) is done
+                    and last_of_session.pop(game_id)
+                )
+            )
+
+    async def _handle(
+        self,
+        message: dict[str, Any],
+        handle_request: Callable[[dict[str, Any]], Awaitable[dict | None]],
+        previous: asyncio.Task[None] | None,
+    ) -> None:
+        if previous:
+            await asyncio.wait([previous])
+        try:
+            reply = await handle_request(message)
+        except Exception:
+            logging.exception("Handling a request of another worker failed.")
+            reply = {"status_code": 500, "content": {"detail": "Internal error"}}
+        if reply_to := message.get("reply_to"):
+            await self.pubsub.publish(
+                reply_to, (reply or {}) | {"request_id": message["request_id"]}
+            )
+
+    async def _receive_replies(self, replies: Subscription) -> None:
+        async for reply in replies:
+            future = self._pending.get(reply["request_id"])
+            if future and not future.done():
+                future.set_result(reply)
+
+
+async def proxy_websocket(  # noqa: PLR0913
+    websocket: Any,  # noqa: ANN401
+    link: ClusterLink,
+    owner: str,
+    client_channel: str,
+    connect: dict[str, Any],
+    *,
+    idle_timeout: float | None = None,
+) -> None:
+    """Connect a player's WebSocket to the session on the owning worker.
+
+    Messages of the player are forwarded to the owner, messages of the owner are
+    sent to the player, until either side disconnects or the player sends nothing
+    for idle_timeout seconds. Keepalive pings aren't forwarded.
+    """
+    subscription = await link.pubsub.subscribe(client_channel)
+
+    async def forward_to_player() -> None:
+        async for message in subscription:
+            if message["op"] == "send":
+                await websocket.send_text(message["text"])
+            elif message["op"] == "close":
+                await websocket.close(code=message["code"])
+                return
+
+    forwarding = asyncio.create_task(forward_to_player())
+    base = {"game_id": connect["game_id"], "username": connect["username"]}
+    try:
+        await link.send(owner, connect | {"op": "connect"})
+        while True:
+            receiving = asyncio.ensure_future(websocket.receive_text())
+            done, _ = await asyncio.wait(
+                {receiving, forwarding},
+                timeout=idle_timeout,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not done:
+                receiving.cancel()
+                logging.info("Closing the idle WebSocket of %s.", base["username"])
+                with contextlib.suppress(RuntimeError):
+                    await websocket.close(code=CLOSE_GOING_AWAY)
+                break
+            if forwarding in done:
+                receiving.cancel()
+                break
+            text = receiving.result()
+            if text not in PING_MESSAGES:
+                await link.send(owner, base | {"op": "client_message", "text": text})
+    finally:
+        forwarding.cancel()
+        subscription.close()
+        with contextlib.suppress(Exception):
+            await link.send(owner, base | {"op": "disconnect"})
@@ -1,14 +1,25 @@
 """Contains the ConnectionManager class, which handles user connections."""
 
+from collections import Counter
+from typing import Any
+
 from fastapi import HTTPException, WebSocket, status
 from fastapi.responses import JSONResponse
 
+from game.delta import ProtocolVersion
+from game.serialization import dumps
+from server.outbound import OutboundQueue
+
 
 class ConnectionManager:
     """Holds the registered users and websocket connections."""
 
     def __init__(self) -> None:
         self.user_connections: dict[str, WebSocket | None] = {}
+        self.protocol_versions: dict[str, ProtocolVersion] = {}
+        self.outbound: dict[str, OutboundQueue] = {}
+        # Counters of the queues of users that are gone.
+        self._closed_queue_stats: Counter[str] = Counter()
 
         self.first_player: str | None = None
 
@@ -47,6 +58,8 @@ class ConnectionManager:
             )
 
         self.user_connections.pop(username)
+        self.protocol_versions.pop(username, None)
+        self._close_outbound(username)
 
         return JSONResponse(
             status_code=200,
@@ -68,6 +81,18 @@ class ConnectionManager:
                 detail=f"User '{username}' not registered.",
             )
         self.user_connections[username] = websocket
+        self._close_outbound(username)
+        self.outbound[username] = OutboundQueue(
+            websocket, on_close=lambda queue: self._outbound_closed(username, queue)
+        )
+
+    def set_protocol_version(self, username: str, protocol: ProtocolVersion) -> None:
+        """Set the protocol version the client of a user speaks."""
+        self.protocol_versions[username] = protocol
+
+    def get_protocol_version(self, username: str) -> ProtocolVersion:
+        """Get the protocol version the client of a user speaks."""
+        return self.protocol_versions.get(username, ProtocolVersion.FULL)
 
     def get_websocket(self, username: str) -> WebSocket | None:
         """Get the WebSocket connection for a given username."""
@@ -81,3 +106,46 @@ class ConnectionManager:
                 detail=f"User '{username}' not registered.",
             )
         self.user_connections[username] = None
+        self._close_outbound(username)
+
+    def send(self, username: str, message: dict[str, Any]) -> bool:
+        """Queue a message to a user, return whether the user is connected."""
+        return self.send_text(username, dumps(message), message["type"])
+
+    def send_text(self, username: str, text: str, message_type: str) -> bool:
+        """Queue an encoded message to a user, return whether the user is connected."""
+        if queue := self.outbound.get(username):
+            queue.send(text, message_type)
+            return True
+        return False
+
+    def broadcast(self, message: dict[str, Any], exclude: str | None = None) -> None:
+        """Encode a message once and queue it to all connected users.
+
+        Doesn't wait for the messages to be sent, so slow clients don't hold up the
+        others.
+        """
+        text = dumps(message)
+        for username, queue in list(self.outbound.items()):
+            if username != exclude:
+                queue.send(text, message["type"])
+
+    def stats(self) -> dict[str, int]:
+        """Return the message counters of all connections, past and present."""
+        totals = Counter(self._closed_queue_stats)
+        for queue in self.outbound.values():
+            totals.update(queue.stats())
+        return dict(totals)
+
+    def _outbound_closed(self, username: str, queue: OutboundQueue) -> None:
+        # The queue closed the WebSocket, which ends the connection of the player.
+        # Until then, the player counts as disconnected.
+        if self.outbound.get(username) is queue:
+            self._close_outbound(username)
+
+    def _close_outbound(self, username: str) -> None:
+        if queue := self.outbound.pop(username, None):
+            queue.close()
+            stats = queue.stats()
+            del stats["queued"]  # dropped on close
+            self._closed_queue_stats.update(stats)
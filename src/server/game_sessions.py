@@ -1,9 +1,32 @@
 """Module with the GameSession and GameSessionManager classes."""
 
+import asyncio
+import functools
+import logging
+import os
+import time
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, ParamSpec, TypeVar
+
 from fastapi import HTTPException, status
 
 from game.game_logic import GameLogic  # or wherever your GameLogic class is
+from music_service.async_adapter import music_service_executor
 from server.connection_manager import ConnectionManager
+from server.lobby import LobbyIndex
+from server.now_playing import NowPlayingWatcher
+from server.session_actor import SessionActor
+from server.session_store import SessionStore, create_session_store, default_worker_id
+from server.timer_wheel import TimerWheel
+
+# Seconds without any event, after which a session expires.
+DEFAULT_IDLE_TTL = 3600.0
+# Seconds without any event, after which a session without connected players expires.
+DEFAULT_EMPTY_TTL = 600.0
+
+P = ParamSpec("P")
+T = TypeVar("T")
 
 
 class GameSession:
@@ -13,31 +36,239 @@ class GameSession:
         self.game_id = game_id
         self.game_logic = game_logic
         self.connection_manager = ConnectionManager()
+        self.now_playing_watcher: NowPlayingWatcher | None = None
+        # Applies joins, starts, guesses and disconnects one after another.
+        self.actor = SessionActor()
+
+    @property
+    def joinable(self) -> bool:
+        """Whether new players can join or disconnected players can re-join."""
+        return (
+            not self.game_logic.running
+            or self.game_logic.player_ring.active_count < len(self.game_logic.users)
+        )
+
+    def stats(self) -> dict[str, Any]:
+        """Return statistics about the session."""
+        stats: dict[str, Any] = {
+            "running": self.game_logic.running,
+            "players": len(self.connection_manager.user_connections),
+            "messages": self.connection_manager.stats(),
+            "events": self.actor.stats(),
+        }
+        if prefetcher := self.game_logic.prefetcher:
+            stats["prefetch"] = prefetcher.stats()
+        if music_service_stats := self.game_logic.music_service.stats():
+            stats["music_service"] = music_service_stats
+        return stats
+
+    def close(self) -> None:
+        """Stop the background tasks of the session and release the music service."""
+        if self.now_playing_watcher:
+            self.now_playing_watcher.stop()
+        # Closing may block (e.g. waiting for a process), keep it off the event loop.
+        music_service_executor().submit(self.game_logic.music_service.close)
 
 
 class GameSessionManager:
-    """Holds all game sessions."""
+    """Holds the game sessions of this worker.
+
+    The lobby index keeps the joinable sessions of this worker. The session store
+    tells which worker owns the sessions of the other workers.
+
+    Sessions expire after idle_ttl seconds without events, or empty_ttl seconds if no
+    player is connected. A timer wheel holds the time each session may expire at;
+    events don't move the timer, it is checked against the last event when it fires.
 
-    def __init__(self) -> None:
+    A shared session store is called from a thread of its own, so its I/O doesn't
+    block the event loop. Writes are queued there in order and not waited for.
+    """
+
+    def __init__(
+        self,
+        store: SessionStore | None = None,
+        worker_id: str | None = None,
+        idle_ttl: float | None = None,
+        empty_ttl: float | None = None,
+    ) -> None:
         self.sessions: dict[str, GameSession] = {}
+        self.store = store or create_session_store()
+        self.worker_id = worker_id or default_worker_id()
+        self.lobby = LobbyIndex()
+        self.idle_ttl = (
+            idle_ttl
+            if idle_ttl is not None
+            else float(os.getenv("SESSION_IDLE_TTL", str(DEFAULT_IDLE_TTL)))
+        )
+        self.empty_ttl = (
+            empty_ttl
+            if empty_ttl is not None
+            else float(os.getenv("SESSION_EMPTY_TTL", str(DEFAULT_EMPTY_TTL)))
+        )
+        self.expiry = TimerWheel()
+        self.expired = 0
+        self._store_thread = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="session-store"
+        )
 
     def add_game(self, game_id: str, game: GameLogic) -> None:
-        """Create and store a full GameLogic instance."""
-        if game_id in self.sessions:
+        """Create and store a full GameLogic instance.
+
+        This blocks on the session store, on the event loop use add_game_async.
+        """
+        self.add_session(GameSession(game_id, game))
+
+    async def add_game_async(self, game_id: str, game: GameLogic) -> None:
+        """Create and store a full GameLogic instance, without blocking the loop."""
+        await self.add_session_async(GameSession(game_id, game))
+
+    async def add_session_async(self, session: GameSession) -> None:
+        """Store a game session, without blocking the loop."""
+        game_id = session.game_id
+        claimed = game_id not in self.sessions and await self.run_store(
+            self.store.claim, game_id, self.worker_id
+        )
+        self._add(session, claimed)
+
+    def add_session(self, session: GameSession) -> None:
+        """Store a game session, e.g. one restored after a restart."""
+        game_id = session.game_id
+        self._add(
+            session,
+            game_id not in self.sessions and self.store.claim(game_id, self.worker_id),
+        )
+
+    def _add(self, session: GameSession, claimed: bool) -> None:
+        # The expiry wheel and the lobby are only changed on the event loop.
+        game_id = session.game_id
+        if not claimed or game_id in self.sessions:
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
                 detail=f"Session '{game_id}' already exists. Choose different ID.",
             )
-        self.sessions[game_id] = GameSession(game_id, game)
+        self.sessions[game_id] = session
+        running = session.game_logic.running
+        self.lobby.update(game_id, session.joinable, running)
+        self._write_store(self.store.set_joinable, game_id, session.joinable, running)
+        self.schedule_expiry(session)
+
+    async def run_store(
+        self, fn: Callable[P, T], *args: P.args, **kwargs: P.kwargs
+    ) -> T:
+        """Call the session store after the queued writes, off the event loop."""
+        if not self.store.shared:
+            return fn(*args, **kwargs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._store_thread, functools.partial(fn, *args, **kwargs)
+        )
+
+    def _write_store(
+        self, fn: Callable[P, None], *args: P.args, **kwargs: P.kwargs
+    ) -> None:
+        if not self.store.shared:
+            fn(*args, **kwargs)
+            return
+        future = self._store_thread.submit(fn, *args, **kwargs)
+        future.add_done_callback(_log_store_error)
+
+    async def renew_lease(self) -> None:
+        """Tell the other workers that this worker still owns its sessions."""
+        await self.run_store(self.store.heartbeat, self.worker_id)
 
     def get_game_session(self, game_id: str) -> GameSession | None:
         """Retrieve the game session by ID."""
         return self.sessions.get(game_id)
 
+    async def remote_owner(self, game_id: str) -> str | None:
+        """Return the worker that owns the session, if it isn't this worker."""
+        owner = await self.run_store(self.store.owner_of, game_id)
+        return owner if owner != self.worker_id else None
+
+    def sync(self, session: GameSession) -> None:
+        """Update the lobby after the session started or players left or re-joined."""
+        game_id = session.game_id
+        running = session.game_logic.running
+        # The store is only written when the lobby state changed.
+        if game_id in self.sessions and self.lobby.update(
+            game_id, session.joinable, running
+        ):
+            self._write_store(
+                self.store.set_joinable, game_id, session.joinable, running
+            )
+
+    async def joinable_sessions(
+        self, prefix: str = "", running: bool | None = None
+    ) -> list[str]:
+        """Return the IDs of the joinable sessions of all workers matching the filters.
+
+        The sessions of this worker come first.
+        """
+        game_ids = self.lobby.query(prefix, running)
+        if self.store.shared:
+            owners = await self.run_store(self.store.joinable_sessions, running)
+            game_ids += [
+                game_id
+                for game_id, owner in owners.items()
+                if owner != self.worker_id and game_id.startswith(prefix)
+            ]
+        return game_ids
+
     def remove_game_session(self, game_id: str) -> None:
         """Remove a game session by ID."""
         if game_id in self.sessions:
-            del self.sessions[game_id]
+            self.sessions.pop(game_id).close()
+            self.lobby.discard(game_id)
+            self.expiry.cancel(game_id)
+            self._write_store(self.store.release, game_id, self.worker_id)
+
+    def expires_in(self, session: GameSession, now: float | None = None) -> float:
+        """Return the seconds until the session expires, unless an event comes first."""
+        connected = bool(session.connection_manager.outbound)
+        ttl = self.idle_ttl if connected else self.empty_ttl
+        now = time.monotonic() if now is None else now
+        return session.actor.last_event_at + ttl - now
+
+    def schedule_expiry(self, session: GameSession) -> None:
+        """Set the timer of the session to the time it expires."""
+        now = time.monotonic()
+        self.expiry.schedule(session.game_id, now + self.expires_in(session, now))
+
+    def expired_sessions(self, now: float | None = None) -> list[GameSession]:
+        """Return the sessions that expired, the timers of the others are set again."""
+        now = time.monotonic() if now is None else now
+        expired = []
+        for game_id in self.expiry.advance(now):
+            session = self.sessions.get(str(game_id))
+            if session is None:
+                continue
+            remaining = self.expires_in(session, now)
+            if remaining > 0:
+                self.expiry.schedule(game_id, now + remaining)
+            else:
+                expired.append(session)
+        return expired
+
+    def expire(self, game_id: str) -> None:
+        """Remove a session that expired."""
+        if game_id in self.sessions:
+            self.remove_game_session(game_id)
+            self.expired += 1
+
+    def remove_all(self) -> None:
+        """Remove the sessions of this worker, e.g. when it stops."""
+        for game_id in list(self.sessions):
+            self.remove_game_session(game_id)
+        self._write_store(self.store.release_all, self.worker_id)
+
+    async def flush(self) -> None:
+        """Wait until the queued writes reached the session store."""
+        await self.run_store(lambda: None)
+
+
+def _log_store_error(future: Future[None]) -> None:
+    if error := future.exception():
+        logging.error("Updating the session store failed: %r", error)
 
 
 # Global instance (singleton)
@@ -0,0 +1,312 @@
+"""Load generator, which plays many games against a running TrackBack server.
+
+Every simulated session is created, joined and started through the REST API, and its
+players guess over the WebSocket endpoint like the web UI does. Example::
+
+    ENABLE_MOCK_OPTIONS=1 track-back-server --port 4200 &
+    track-back-loadgen --url http://localhost:4200 --sessions 200 --players 5
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any
+
+import httpx
+from websockets.asyncio.client import ClientConnection, connect
+from websockets.exceptions import ConnectionClosed
+
+PERCENTILES = (50, 95, 99)
+
+
+@dataclass
+class LoadGenConfig:
+    """Parameters of a load test."""
+
+    url: str = "http://localhost:4200"
+    sessions: int = 10
+    players: int = 4
+    duration: float = 30.0
+    ramp_up: float = 5.0
+    think_time: float = 1.0
+    churn_rate: float = 0.0
+    rejoin_delay: float = 1.0
+    target_song_count: int = 1000
+    mock_options: dict[str, Any] = field(default_factory=dict)
+    seed: int = 0
+
+    @property
+    def ws_url(self) -> str:
+        """Return the base URL of the WebSocket endpoint."""
+        return "ws" + self.url.removeprefix("http")
+
+
+def percentile(samples: list[float], percent: float) -> float:
+    """Return the percentile of the samples, using the nearest rank."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+@dataclass
+class LoadReport:
+    """Latencies and counters collected during a load test."""
+
+    guess_latencies: list[float] = field(default_factory=list)
+    turn_latencies: list[float] = field(default_factory=list)
+    counters: defaultdict[str, int] = field(default_factory=lambda: defaultdict(int))
+    started_at: float = field(default_factory=time.monotonic)
+    finished_at: float | None = None
+
+    @property
+    def elapsed(self) -> float:
+        """Return the duration of the load test in seconds."""
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    def summary(self) -> dict[str, Any]:
+        """Return the throughput, latency percentiles (in ms) and counters."""
+        return {
+            "elapsed_s": round(self.elapsed, 2),
+            "guesses_per_s": round(self.counters["guess_result"] / self.elapsed, 2),
+            "guess_to_result_ms": self._percentiles(self.guess_latencies),
+            "last_guess_to_your_turn_ms": self._percentiles(self.turn_latencies),
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    @staticmethod
+    def _percentiles(samples: list[float]) -> dict[str, float]:
+        return {"count": len(samples)} | {
+            f"p{p}": round(percentile(samples, p) * 1000, 2) for p in PERCENTILES
+        }
+
+
+class SimulatedSession:
+    """A game session with simulated players."""
+
+    def __init__(
+        self,
+        config: LoadGenConfig,
+        client: httpx.AsyncClient,
+        report: LoadReport,
+        deadline: float,
+    ) -> None:
+        self.config = config
+        self.client = client
+        self.report = report
+        self.deadline = deadline
+        self.game_id = f"load-{uuid.uuid4().hex[:12]}"
+        self.player_names = [f"player{i}" for i in range(config.players)]
+        self.last_guess_at: float | None = None
+        self.game_over = False
+        self._connected = 0
+        self._all_connected = asyncio.Event()
+        self._rng = random.Random(f"{config.seed}-{self.game_id}")  # noqa: S311
+
+    async def run(self) -> None:
+        """Create the session, connect all players, start the game and play it."""
+        response = await self.client.post(
+            "/create",
+            json={
+                "game_id": self.game_id,
+                "target_song_count": self.config.target_song_count,
+                "music_service_type": "mock",
+                "music_service_options": self.config.mock_options or None,
+            },
+        )
+        response.raise_for_status()
+        self.report.counters["sessions"] += 1
+
+        players = [
+            asyncio.create_task(self._play(name, first_join=True))
+            for name in self.player_names
+        ]
+        try:
+            await asyncio.wait_for(
+                self._all_connected.wait(), self.deadline - time.monotonic()
+            )
+            response = await self.client.post("/start", json={"game_id": self.game_id})
+            response.raise_for_status()
+        except BaseException:
+            for player in players:
+                player.cancel()
+            raise
+        await asyncio.gather(*players)
+
+    async def _play(self, name: str, first_join: bool) -> None:
+        while not await self._join(name):
+            if time.monotonic() >= self.deadline:
+                return
+            await asyncio.sleep(0.1)
+
+        url = f"{self.config.ws_url}/ws/{self.game_id}/{name}"
+        async with connect(url, max_size=None) as ws:
+            message = json.loads(await ws.recv())
+            if message.get("type") != "welcome":
+                raise ConnectionError(f"{name} was not welcomed: {message}")
+            if first_join:
+                self._connected += 1
+                if self._connected == len(self.player_names):
+                    self._all_connected.set()
+            rejoin = await self._guess_until_done(ws)
+
+        if rejoin:
+            self.report.counters["disconnects"] += 1
+            await asyncio.sleep(self.config.rejoin_delay)
+            self.report.counters["rejoins"] += 1
+            await self._play(name, first_join=False)
+
+    async def _join(self, name: str) -> bool:
+        response = await self.client.post(
+            "/join", json={"game_id": self.game_id, "user_name": name}
+        )
+        # The server may not have noticed the last disconnect of the player yet.
+        return response.status_code == httpx.codes.OK
+
+    async def _guess_until_done(self, ws: ClientConnection) -> bool:
+        """Guess whenever it's the player's turn, return True to rejoin."""
+        guess_sent_at: float | None = None
+        # A your_turn right after (re)connecting doesn't follow a guess.
+        has_guessed = False
+        while not self.game_over:
+            message = await self._receive(ws)
+            if message is None:
+                return False
+            now = time.monotonic()
+            message_type = message.get("type", "unknown")
+            self.report.counters[message_type] += 1
+
+            if message_type == "your_turn":
+                if has_guessed and self.last_guess_at is not None:
+                    self.report.turn_latencies.append(now - self.last_guess_at)
+                guess_sent_at = await self._guess(ws, len(message.get("song_list", [])))
+                has_guessed = True
+            elif message_type == "guess_result" and guess_sent_at is not None:
+                self.report.guess_latencies.append(now - guess_sent_at)
+                guess_sent_at = None
+                self.game_over = bool(message.get("game_over"))
+                if not self.game_over and self._rng.random() < self.config.churn_rate:
+                    return True
+            elif message_type == "game_over":
+                self.game_over = True
+        return False
+
+    async def _receive(self, ws: ClientConnection) -> dict[str, Any] | None:
+        """Return the next JSON message, or None once the test is over."""
+        while (timeout := self.deadline - time.monotonic()) > 0:
+            try:
+                return json.loads(await asyncio.wait_for(ws.recv(), timeout))
+            except (TimeoutError, ConnectionClosed):
+                return None
+            except json.JSONDecodeError:
+                self.report.counters["invalid_messages"] += 1
+        return None
+
+    async def _guess(self, ws: ClientConnection, song_count: int) -> float:
+        """Think, then guess a random position, return the time of the guess."""
+        await asyncio.sleep(self._think_time())
+        self.last_guess_at = time.monotonic()
+        await ws.send(
+            json.dumps({"type": "guess", "index": self._rng.randint(0, song_count)})
+        )
+        return self.last_guess_at
+
+    def _think_time(self) -> float:
+        if self.config.think_time <= 0:
+            return 0.0
+        return self._rng.expovariate(1 / self.config.think_time)
+
+
+async def run_load_test(config: LoadGenConfig) -> LoadReport:
+    """Play the configured sessions against the server and return the report."""
+    report = LoadReport()
+    deadline = time.monotonic() + config.duration
+    limits = httpx.Limits(max_connections=max(100, config.sessions))
+    async with httpx.AsyncClient(
+        base_url=config.url, limits=limits, timeout=30.0
+    ) as client:
+
+        async def start_session(index: int) -> None:
+            await asyncio.sleep(config.ramp_up * index / max(config.sessions, 1))
+            try:
+                await SimulatedSession(config, client, report, deadline).run()
+            except (httpx.HTTPError, OSError, ConnectionClosed) as e:
+                report.counters["failed_sessions"] += 1
+                logging.warning("Simulated session failed: %r", e)
+
+        await asyncio.gather(*(start_session(i) for i in range(config.sessions)))
+    report.finished_at = time.monotonic()
+    return report
+
+
+def parse_args() -> tuple[LoadGenConfig, str | None]:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Simulate many TrackBack players against a running server."
+    )
+    parser.add_argument("--url", default="http://localhost:4200")
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--players", type=int, default=4, help="Players per session.")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds.")
+    parser.add_argument(
+        "--ramp-up", type=float, default=5.0, help="Seconds to start all sessions."
+    )
+    parser.add_argument(
+        "--think-time", type=float, default=1.0, help="Mean seconds per guess."
+    )
+    parser.add_argument(
+        "--churn-rate",
+        type=float,
+        default=0.0,
+        help="Probability that a player disconnects and rejoins after a guess.",
+    )
+    parser.add_argument("--rejoin-delay", type=float, default=1.0, help="Seconds.")
+    parser.add_argument("--target-song-count", type=int, default=1000)
+    parser.add_argument(
+        "--mock-options",
+        type=json.loads,
+        default={},
+        help="Options of the mock music service, e.g. '{\"song_count\": 500}'.",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the report to this JSON file.")
+    args = parser.parse_args()
+
+    config = LoadGenConfig(
+        url=args.url.rstrip("/"),
+        sessions=args.sessions,
+        players=args.players,
+        duration=args.duration,
+        ramp_up=args.ramp_up,
+        think_time=args.think_time,
+        churn_rate=args.churn_rate,
+        rejoin_delay=args.rejoin_delay,
+        target_song_count=args.target_song_count,
+        mock_options=args.mock_options,
+        seed=args.seed,
+    )
+    return config, args.json
+
+
+def main() -> None:
+    """Run the load test and print the report."""
+    logging.basicConfig(level=logging.INFO)
+    # One log line per request would drown the report.
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    config, json_path = parse_args()
+    summary = asyncio.run(run_load_test(config)).summary()
+    print(json.dumps(summary, indent=2))
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as file:  # noqa: PTH123
+            json.dump(summary, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
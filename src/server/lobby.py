@@ -0,0 +1,107 @@
+"""Contains the LobbyIndex class, which keeps the joinable game sessions of a worker.
+
+The index is updated when a session is added, started, loses a player or is removed,
+so listing the lobby doesn't look at every session. Listeners, e.g. the lobby
+WebSockets, receive the sessions that became joinable or stopped being joinable.
+"""
+
+import hashlib
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from fastapi import Request, Response, status
+
+from game.serialization import dumps
+
+# Most sessions returned by one request of the session list.
+MAX_PAGE_SIZE = 1000
+
+LobbyListener = Callable[[dict[str, Any]], None]
+
+
+class LobbyIndex:
+    """The joinable sessions of this worker, in the order they became joinable."""
+
+    def __init__(self) -> None:
+        # Whether each joinable session is running, by session ID.
+        self._running: dict[str, bool] = {}
+        self._listeners: list[LobbyListener] = []
+
+    def __len__(self) -> int:
+        """Return the number of joinable sessions."""
+        return len(self._running)
+
+    def __contains__(self, game_id: object) -> bool:
+        """Return whether the session is joinable."""
+        return game_id in self._running
+
+    def update(self, game_id: str, joinable: bool, running: bool) -> bool:
+        """Record the state of a session, return whether it changed."""
+        if not joinable:
+            return self.discard(game_id)
+        added = game_id not in self._running
+        if not added and self._running[game_id] == running:
+            return False
+        self._running[game_id] = running
+        if added:
+            self._notify(added=[game_id])
+        return True
+
+    def discard(self, game_id: str) -> bool:
+        """Remove a session from the lobby, return whether it was in it."""
+        if self._running.pop(game_id, None) is None:
+            return False
+        self._notify(removed=[game_id])
+        return True
+
+    def query(self, prefix: str = "", running: bool | None = None) -> list[str]:
+        """Return the IDs of the joinable sessions matching the filters."""
+        if not prefix and running is None:
+            return list(self._running)
+        return [
+            game_id
+            for game_id, session_running in self._running.items()
+            if game_id.startswith(prefix)
+            and (running is None or session_running == running)
+        ]
+
+    def subscribe(self, listener: LobbyListener) -> Callable[[], None]:
+        """Call the listener with every change, return a function to unsubscribe."""
+        self._listeners.append(listener)
+        return lambda: self._listeners.remove(listener)
+
+    def _notify(self, added: Iterable[str] = (), removed: Iterable[str] = ()) -> None:
+        update = lobby_update(added, removed)
+        for listener in list(self._listeners):
+            listener(update)
+
+
+def lobby_message(game_ids: list[str]) -> dict[str, Any]:
+    """Return the first message of a lobby WebSocket, with all joinable sessions."""
+    return {"type": "lobby", "sessions": game_ids}
+
+
+def lobby_update(
+    added: Iterable[str] = (), removed: Iterable[str] = ()
+) -> dict[str, Any]:
+    """Return a message with the sessions that were added to or removed from the lobby."""
+    return {"type": "lobby_update", "added": list(added), "removed": list(removed)}
+
+
+def session_list_response(
+    request: Request, game_ids: list[str], offset: int = 0, limit: int | None = None
+) -> Response:
+    """Return a page of the session list, or 304 if the client has it already.
+
+    The body is ``{"sessions": [...]}``. The X-Total-Count header holds the number of
+    sessions of all pages, the ETag changes with the page and the total.
+    """
+    page = game_ids[offset : offset + limit if limit is not None else None]
+    body = dumps({"sessions": page})
+    digest = hashlib.blake2b(
+        f"{len(game_ids)}:{body}".encode(), digest_size=8
+    ).hexdigest()
+    headers = {"ETag": f'"{digest}"', "X-Total-Count": str(len(game_ids))}
+    if headers["ETag"] in request.headers.get("if-none-match", ""):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
@@ -6,7 +6,10 @@ import os
 
 from dotenv import load_dotenv
 
+from server.router import run_workers_behind_router
 from server.server import Server
+from server.session_store import DEFAULT_SOCKET_PATH
+from server.sqlite_backend import start_broker_thread
 
 
 def parse_args() -> tuple[int, int]:
@@ -36,6 +39,14 @@ def main() -> None:
 
     load_dotenv()
 
+    workers = int(os.getenv("WORKERS", "1"))
+    if workers > 1:
+        if os.getenv("SESSION_BACKEND") == "sqlite":
+            # The workers share sessions through the broker of this process.
+            start_broker_thread(os.getenv("PUBSUB_SOCKET_PATH") or DEFAULT_SOCKET_PATH)
+        run_workers_behind_router(port, workers, log_level)
+        return
+
     server = Server()
     server.run(port=port)
 
@@ -0,0 +1,133 @@
+"""Contains the NowPlayingWatcher class, which follows the playback of a session."""
+
+import asyncio
+import contextlib
+import logging
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from game.game_logic import GameLogic
+from music_service.abstract_adapter import PlaybackState
+from music_service.error import MusicServiceError
+
+
+class NowPlayingWatcher:
+    """Polls the music service of a game session on an adaptive schedule.
+
+    Mid-track the service is polled rarely, close to the end of a track more often.
+    Every poll updates the song of the current round in the game logic, so guesses
+    are served from memory, and refills the game's track prefetcher if it ran dry.
+    If the track changed without the game skipping it (e.g. the host skipped it on
+    the device), a ``track_changed`` message is pushed.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        game: GameLogic,
+        broadcast: Callable[[dict[str, Any]], Awaitable[None]],
+        *,
+        default_interval: float = 5.0,
+        max_interval: float = 15.0,
+        min_interval: float = 1.0,
+        track_end_window: float = 10.0,
+    ) -> None:
+        self.game = game
+        self.broadcast = broadcast
+        self.default_interval = default_interval
+        self.max_interval = max_interval
+        self.min_interval = min_interval
+        self.track_end_window = track_end_window
+
+        self._task: asyncio.Task[None] | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wakeup = asyncio.Event()
+        self._polled_round = -1
+
+    def start(self) -> None:
+        """Start polling in the background of the running event loop."""
+        if self._is_running():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = self._loop.create_task(self._run())
+
+    def stop(self) -> None:
+        """Stop polling."""
+        if self._is_running() and self._loop and self._task:
+            self._loop.call_soon_threadsafe(self._task.cancel)
+        self._task = None
+
+    def wake(self) -> None:
+        """Poll right away if the game started a new round since the last poll."""
+        if self.game.round_number == self._polled_round:
+            return
+        if not self._is_running():
+            self.start()
+        elif self._loop:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _is_running(self) -> bool:
+        return (
+            self._task is not None
+            and not self._task.done()
+            and self._loop is not None
+            and not self._loop.is_closed()
+        )
+
+    def next_interval(self, state: PlaybackState | None) -> float:
+        """Return the number of seconds until the next poll."""
+        if state is None or state.remaining_ms is None:
+            return self.default_interval
+        remaining = state.remaining_ms / 1000
+        if remaining <= self.track_end_window:
+            return self.min_interval
+        return min(self.max_interval, remaining - self.track_end_window)
+
+    async def poll(self) -> PlaybackState | None:
+        """Poll the music service once and push a message if the track changed.
+
+        Right after a skip, the poll waits until the music service settled, so the
+        previous track isn't taken for a track changed outside of the game.
+        """
+        while delay := self.game.settle_delay():
+            await asyncio.sleep(delay)
+        round_number = self._polled_round = self.game.round_number
+        try:
+            state = await self.game.async_music_service.playback_state()
+        except MusicServiceError as e:
+            logging.warning("Polling the current song failed: %s", e)
+            return None
+        except Exception:  # keep watching despite unexpected service errors
+            logging.exception("Unexpected error while polling the current song.")
+            return None
+
+        if self.game.observe_current_song(state.song, round_number):
+            await self.broadcast(
+                {
+                    "type": "track_changed",
+                    "message": "The track was changed. Guess the new song!",
+                }
+            )
+
+        prefetcher = self.game.prefetcher
+        if prefetcher and prefetcher.needs_refill():
+            try:
+                upcoming_songs = await self.game.async_music_service.upcoming_songs(
+                    prefetcher.lookahead
+                )
+            except MusicServiceError as e:
+                logging.warning("Prefetching the upcoming songs failed: %s", e)
+                return state
+            # After a skip, the queue fetched before may start with the new song.
+            if self.game.round_number == round_number:
+                prefetcher.fill(upcoming_songs)
+        return state
+
+    async def _run(self) -> None:
+        while self.game.running:
+            state = await self.poll()
+            self._wakeup.clear()
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(
+                    self._wakeup.wait(), timeout=self.next_interval(state)
+                )
@@ -0,0 +1,218 @@
+"""Contains the OutboundQueue class, which sends messages to one WebSocket client."""
+
+import asyncio
+import contextlib
+import logging
+import os
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass
+from enum import IntEnum, StrEnum
+
+from fastapi import WebSocket
+from starlette.websockets import WebSocketState
+
+# Closed because the client doesn't keep up, it may reconnect.
+CLOSE_TRY_AGAIN_LATER = 1013
+# Close code of the WebSockets that are open while the server shuts down.
+CLOSE_SERVICE_RESTART = 1012
+# Closed because the client sent nothing for too long.
+CLOSE_GOING_AWAY = 1001
+DEFAULT_QUEUE_SIZE = int(os.getenv("OUTBOUND_QUEUE_SIZE", "64"))
+
+
+class Priority(IntEnum):
+    """Priority of a message, informational messages give way on overflow."""
+
+    CRITICAL = 0  # needed to play, e.g. the player's turn or the result of a guess
+    INFO = 1  # keeps the client up to date, e.g. the guesses of other players
+
+
+# Messages that a client can't play without, all others are informational.
+CRITICAL_MESSAGE_TYPES = frozenset(
+    {"welcome", "your_turn", "guess_result", "game_over", "sync", "error"}
+)
+
+
+def priority_of(message_type: str) -> Priority:
+    """Return the priority of a message type."""
+    if message_type in CRITICAL_MESSAGE_TYPES:
+        return Priority.CRITICAL
+    return Priority.INFO
+
+
+class OverflowPolicy(StrEnum):
+    """What to do when a client falls so far behind that its queue is full."""
+
+    DROP_STALE = "drop_stale"  # drop the oldest informational message
+    COALESCE = "coalesce"  # replace a queued informational message of the same type
+    DISCONNECT = "disconnect"  # close the connection, the client may reconnect
+
+
+DEFAULT_OVERFLOW_POLICY = OverflowPolicy(
+    os.getenv("OUTBOUND_OVERFLOW_POLICY", OverflowPolicy.DROP_STALE.value)
+)
+
+
+@dataclass
+class OutboundMessage:
+    """A message waiting to be sent."""
+
+    text: str
+    message_type: str
+    priority: Priority
+
+
+class OutboundQueue:
+    """Bounded queue of messages to one WebSocket, drained by its own writer task.
+
+    Enqueuing never waits for the client, so a slow or dead client doesn't hold up
+    the messages to the other players. Messages are sent in order. If the queue is
+    full, the overflow policy makes room by dropping or coalescing informational
+    messages, or disconnects the client. Critical messages are never dropped; a
+    client with more than max_critical of them queued is disconnected.
+
+    If the queue stops on its own, because the client was disconnected or sending
+    failed, it closes the WebSocket and calls on_close with itself.
+
+    The writer runs on the event loop that created the queue, ``send`` may be called
+    from any thread or event loop.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_size: int = DEFAULT_QUEUE_SIZE,
+        policy: OverflowPolicy = DEFAULT_OVERFLOW_POLICY,
+        *,
+        max_critical: int | None = None,
+        on_close: Callable[["OutboundQueue"], None] | None = None,
+    ) -> None:
+        self.websocket = websocket
+        self.max_size = max_size
+        self.policy = policy
+        self.max_critical = max_critical if max_critical is not None else 2 * max_size
+        self.on_close = on_close
+
+        self._messages: deque[OutboundMessage] = deque()
+        self._loop = asyncio.get_running_loop()
+        self._ready = asyncio.Event()
+        self._closed = False
+        self._writer = self._loop.create_task(self._write())
+
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+
+    @property
+    def closed(self) -> bool:
+        """Return whether the queue stopped sending."""
+        return self._closed
+
+    def send(self, text: str, message_type: str) -> None:
+        """Queue an encoded message for the client, without waiting for it."""
+        message = OutboundMessage(text, message_type, priority_of(message_type))
+        if running_loop_is(self._loop):
+            self._enqueue(message)
+        else:
+            self._loop.call_soon_threadsafe(self._enqueue, message)
+
+    def close(self) -> None:
+        """Stop the writer and drop the queued messages."""
+        if running_loop_is(self._loop):
+            self._stop()
+        else:
+            self._loop.call_soon_threadsafe(self._stop)
+
+    def stats(self) -> dict[str, int]:
+        """Return the message counters of the queue."""
+        return {
+            "queued": len(self._messages),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+        }
+
+    def _enqueue(self, message: OutboundMessage) -> None:
+        if self._closed:
+            return
+        if len(self._messages) >= self.max_size and not self._make_room(message):
+            return
+        self._messages.append(message)
+        self._ready.set()
+
+    def _make_room(self, message: OutboundMessage) -> bool:
+        """Handle a full queue, return whether the message should still be appended."""
+        if self.policy == OverflowPolicy.DISCONNECT:
+            logging.warning(
+                "Disconnecting a client, %d messages queued.", self.max_size
+            )
+            self._abort()
+            return False
+
+        if self.policy == OverflowPolicy.COALESCE and message.priority == Priority.INFO:
+            for index, queued in enumerate(self._messages):
+                if queued.message_type == message.message_type:
+                    # Keep the position, the client sees the update where it was due.
+                    self._messages[index] = message
+                    self.coalesced += 1
+                    return False
+
+        for queued in self._messages:
+            if queued.priority == Priority.INFO:
+                self._messages.remove(queued)
+                self.dropped += 1
+                return True
+        if message.priority == Priority.INFO:
+            self.dropped += 1
+            return False
+        # Only critical messages are queued, exceed the limit rather than drop one.
+        if len(self._messages) >= self.max_critical:
+            logging.warning(
+                "Disconnecting a client, %d critical messages queued.",
+                len(self._messages),
+            )
+            self._abort()
+            return False
+        return True
+
+    async def _write(self) -> None:
+        while not self._closed:
+            await self._ready.wait()
+            while self._messages:
+                message = self._messages.popleft()
+                try:
+                    await self.websocket.send_text(message.text)
+                except Exception as e:  # noqa: BLE001
+                    # The client is gone, the receiving side handles the disconnect.
+                    logging.info("Sending to a WebSocket client failed: %r", e)
+                    self._abort()
+                    return
+                self.sent += 1
+            self._ready.clear()
+
+    async def _close_websocket(self) -> None:
+        if self.websocket.application_state == WebSocketState.CONNECTED:
+            with contextlib.suppress(Exception):
+                await self.websocket.close(code=CLOSE_TRY_AGAIN_LATER)
+
+    def _abort(self) -> None:
+        """Stop the queue and close the WebSocket, so the client is disconnected."""
+        self._stop()
+        self._loop.create_task(self._close_websocket())
+        if self.on_close:
+            self.on_close(self)
+
+    def _stop(self) -> None:
+        self._closed = True
+        self._messages.clear()
+        if self._writer is not asyncio.current_task(self._loop):
+            self._writer.cancel()
+
+
+def running_loop_is(loop: asyncio.AbstractEventLoop) -> bool:
+    """Return whether the loop runs in the current thread."""
+    try:
+        return asyncio.get_running_loop() is loop
+    except RuntimeError:
+        return False
@@ -0,0 +1,561 @@
+"""Contains the front router, which spreads the game sessions over worker processes.
+
+Every worker is a ``Server`` in a process of its own, so the sessions use all CPU
+cores. The router hashes the game ID of each request onto a ring of workers, so all
+requests and WebSockets of a session reach the worker that created it, without a
+shared session store. Adding or removing a worker only moves the sessions between it
+and its neighbours on the ring; sessions created before the change stay pinned to
+their worker. Example::
+
+    WORKERS=4 track-back-server --port 4200
+"""
+
+import asyncio
+import bisect
+import contextlib
+import hashlib
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from collections.abc import AsyncIterator, Iterable
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Annotated, Any
+from urllib.parse import quote
+
+import httpx
+from fastapi import (
+    FastAPI,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    WebSocket,
+    status,
+)
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from starlette.websockets import WebSocketDisconnect
+from websockets.asyncio.client import ClientConnection, connect
+from websockets.exceptions import ConnectionClosed, WebSocketException
+
+from game.serialization import dumps, loads
+from server.lobby import (
+    MAX_PAGE_SIZE,
+    lobby_message,
+    lobby_update,
+    session_list_response,
+)
+from server.outbound import CLOSE_TRY_AGAIN_LATER, running_loop_is
+from server.server import Server, serve
+
+# Points per worker on the ring, more spread the sessions more evenly.
+DEFAULT_REPLICAS = 128
+# Headers that only concern one hop of a proxied request.
+HOP_BY_HOP_HEADERS = frozenset(
+    {
+        "connection",
+        "content-encoding",
+        "content-length",
+        "host",
+        "keep-alive",
+        "transfer-encoding",
+        "upgrade",
+    }
+)
+CLOSE_INTERNAL_ERROR = 1011
+# Seconds between the checks which pinned sessions still exist on their worker.
+PIN_PRUNE_INTERVAL = 60.0
+
+
+class HashRing:
+    """Consistent hashing of keys onto nodes."""
+
+    def __init__(
+        self, nodes: Iterable[str] = (), replicas: int = DEFAULT_REPLICAS
+    ) -> None:
+        self.replicas = replicas
+        self._points: list[int] = []
+        self._owners: list[str] = []
+        self._lock = threading.Lock()
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self) -> list[str]:
+        """Return the nodes on the ring."""
+        with self._lock:
+            return list(dict.fromkeys(self._owners))
+
+    def add(self, node: str) -> None:
+        """Put a node on the ring, it takes over keys of its neighbours."""
+        with self._lock:
+            if node in self._owners:
+                return
+            for replica in range(self.replicas):
+                point = self._hash(f"{node}#{replica}")
+                index = bisect.bisect(self._points, point)
+                self._points.insert(index, point)
+                self._owners.insert(index, node)
+
+    def remove(self, node: str) -> None:
+        """Take a node off the ring, its neighbours take over its keys."""
+        with self._lock:
+            kept = [
+                (point, owner)
+                for point, owner in zip(self._points, self._owners, strict=True)
+                if owner != node
+            ]
+            self._points = [point for point, _ in kept]
+            self._owners = [owner for _, owner in kept]
+
+    def node_for(self, key: str) -> str:
+        """Return the node of the key.
+
+        Raise a LookupError if the ring is empty.
+        """
+        with self._lock:
+            if not self._points:
+                raise LookupError("The hash ring has no nodes.")
+            index = bisect.bisect(self._points, self._hash(key)) % len(self._points)
+            return self._owners[index]
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest())
+
+
+@dataclass
+class WorkerLoad:
+    """Traffic the router sent to a worker."""
+
+    requests: int = 0
+    errors: int = 0
+    websockets: int = 0
+    open_websockets: int = 0
+
+
+class Router:
+    """Forwards the requests and WebSockets of each game session to its worker."""
+
+    pin_prune_interval = PIN_PRUNE_INTERVAL
+
+    def __init__(
+        self,
+        workers: Iterable[str],
+        replicas: int = DEFAULT_REPLICAS,
+        request_timeout: float = 30.0,
+    ) -> None:
+        self.ring = HashRing(replicas=replicas)
+        self.load: dict[str, WorkerLoad] = {}
+        self.request_timeout = request_timeout
+        # Worker of each session created through the router, so sessions stay put
+        # when workers are added. Sessions the worker removed are pruned.
+        self._pinned: dict[str, str] = {}
+        self._client: httpx.AsyncClient | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        for worker in workers:
+            self.add_worker(worker)
+        self.app = self.create_app()
+
+    def add_worker(self, url: str) -> None:
+        """Route new sessions to the worker as well."""
+        self.load.setdefault(url, WorkerLoad())
+        self.ring.add(url)
+
+    def remove_worker(self, url: str) -> None:
+        """Stop routing to the worker, its sessions are lost."""
+        self.ring.remove(url)
+        self.load.pop(url, None)
+        for game_id, worker in list(self._pinned.items()):
+            if worker == url:
+                self._pinned.pop(game_id, None)
+
+    def remove_worker_threadsafe(self, url: str) -> None:
+        """Remove the worker on the event loop of the router, from any thread."""
+        if self._loop is None or running_loop_is(self._loop):
+            self.remove_worker(url)
+        else:
+            self._loop.call_soon_threadsafe(self.remove_worker, url)
+
+    async def prune_pins(self) -> None:
+        """Forget the pinned sessions that their worker doesn't have anymore."""
+        pinned = dict(self._pinned)
+        workers = list(dict.fromkeys(pinned.values()))
+        responses = await asyncio.gather(
+            *(self._get_json(worker, "stats") for worker in workers)
+        )
+        for worker, response in zip(workers, responses, strict=True):
+            if response is None:
+                continue
+            for game_id, pinned_worker in pinned.items():
+                # Sessions created after the snapshot of the pins are not pruned.
+                if (
+                    pinned_worker == worker
+                    and game_id not in response["sessions"]
+                    and self._pinned.get(game_id) == worker
+                ):
+                    del self._pinned[game_id]
+
+    def worker_for(self, game_id: str) -> str:
+        """Return the URL of the worker owning the session."""
+        pinned = self._pinned.get(game_id)
+        if pinned in self.load:
+            return pinned
+        try:
+            return self.ring.node_for(game_id)
+        except LookupError as e:
+            raise HTTPException(status_code=503, detail="No worker is running.") from e
+
+    def create_app(self) -> FastAPI:
+        """Create the FastAPI app that forwards all routes of the game server."""
+        app = FastAPI(lifespan=self._lifespan)
+
+        app.add_middleware(
+            CORSMiddleware,
+            allow_origins=["*"],
+            allow_credentials=True,
+            allow_methods=["*"],
+            allow_headers=["*"],
+            expose_headers=["ETag", "X-Total-Count"],
+        )
+
+        app.get("/list-sessions")(self._list_joinable_game_sessions)
+        app.get("/stats")(self._stats)
+        app.websocket("/ws/lobby")(self._lobby_endpoint)
+        app.websocket("/ws/{game_id}/{username}")(self._websocket_endpoint)
+        app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])(
+            self._forward
+        )
+
+        return app
+
+    @contextlib.asynccontextmanager
+    async def _lifespan(self, _app: FastAPI) -> AsyncIterator[None]:
+        self._loop = asyncio.get_running_loop()
+        async with httpx.AsyncClient(timeout=self.request_timeout) as client:
+            self._client = client
+            pruning = asyncio.create_task(self._prune_pins_periodically())
+            try:
+                yield
+            finally:
+                pruning.cancel()
+        self._loop = None
+
+    async def _prune_pins_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.pin_prune_interval)
+            try:
+                await self.prune_pins()
+            except Exception:  # keep pruning, the next try may succeed
+                logging.exception("Pruning the pinned sessions failed.")
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Return the HTTP client, which is open while the app runs."""
+        if self._client is None:
+            raise RuntimeError("The router is not running.")
+        return self._client
+
+    async def _forward(self, request: Request, path: str) -> Response:
+        body = await request.body()
+        game_id = self._game_id_of(request, body)
+        worker = self.worker_for(game_id)
+        response = await self._request(
+            worker,
+            request.method,
+            path,
+            params=request.query_params,
+            content=body,
+            headers={
+                name: value
+                for name, value in request.headers.items()
+                if name not in HOP_BY_HOP_HEADERS
+            },
+        )
+        if path == "create" and response.status_code == status.HTTP_201_CREATED:
+            self._pinned[game_id] = worker
+        elif response.status_code == status.HTTP_404_NOT_FOUND:
+            self._pinned.pop(game_id, None)
+        return Response(
+            content=response.content,
+            status_code=response.status_code,
+            headers={
+                name: value
+                for name, value in response.headers.items()
+                if name not in HOP_BY_HOP_HEADERS
+            },
+        )
+
+    async def _request(
+        self,
+        worker: str,
+        method: str,
+        path: str,
+        **kwargs: Any,  # noqa: ANN401
+    ) -> httpx.Response:
+        load = self.load.get(worker, WorkerLoad())
+        load.requests += 1
+        try:
+            return await self.client.request(method, f"{worker}/{path}", **kwargs)
+        except httpx.HTTPError as e:
+            load.errors += 1
+            raise HTTPException(
+                status_code=502, detail=f"Worker {worker} is not reachable."
+            ) from e
+
+    @staticmethod
+    def _game_id_of(request: Request, body: bytes) -> str:
+        """Return the game ID of a request, or its path if it has none."""
+        with contextlib.suppress(ValueError, TypeError, AttributeError):
+            if body and (game_id := loads(body).get("game_id")):
+                return str(game_id)
+        # The Spotify login passes the game settings as OAuth state.
+        with contextlib.suppress(ValueError, TypeError, AttributeError):
+            if (state := request.query_params.get("state")) and (
+                game_id := loads(state).get("game_id")
+            ):
+                return str(game_id)
+        return request.query_params.get("game_id") or request.url.path
+
+    async def _list_joinable_game_sessions(
+        self,
+        request: Request,
+        offset: Annotated[int, Query(ge=0)] = 0,
+        limit: Annotated[int | None, Query(ge=1, le=MAX_PAGE_SIZE)] = None,
+        prefix: str = "",
+        running: bool | None = None,
+    ) -> Response:
+        """Merge the session lists of the workers, then take the requested page."""
+        params: dict[str, Any] = {"prefix": prefix}
+        if running is not None:
+            params["running"] = running
+        responses = await asyncio.gather(
+            *(
+                self._get_json(worker, "list-sessions", params)
+                for worker in self.ring.nodes
+            )
+        )
+        sessions = [
+            session_id
+            for response in responses
+            if response
+            for session_id in response["sessions"]
+        ]
+        # Workers sharing a session store list the sessions of the others as well.
+        return session_list_response(
+            request, list(dict.fromkeys(sessions)), offset, limit
+        )
+
+    async def _stats(self) -> JSONResponse:
+        workers = self.ring.nodes
+        responses = await asyncio.gather(
+            *(self._get_json(worker, "stats") for worker in workers)
+        )
+        return JSONResponse(
+            content={
+                "workers": {
+                    worker: asdict(self.load.get(worker, WorkerLoad()))
+                    | {
+                        "reachable": response is not None,
+                        "sessions": len(response["sessions"]) if response else 0,
+                    }
+                    for worker, response in zip(workers, responses, strict=True)
+                }
+            }
+        )
+
+    async def _get_json(
+        self, worker: str, path: str, params: dict[str, Any] | None = None
+    ) -> dict[str, Any] | None:
+        try:
+            response = await self._request(worker, "GET", path, params=params)
+        except HTTPException:
+            return None
+        return response.json() if response.is_success else None
+
+    async def _lobby_endpoint(self, websocket: WebSocket) -> None:
+        """Merge the lobby WebSockets of all workers into one.
+
+        The client is disconnected when a worker's lobby closes, it gets the whole
+        list again when it reconnects.
+        """
+        await websocket.accept()
+        async with contextlib.AsyncExitStack() as stack:
+            try:
+                upstreams = [
+                    await stack.enter_async_context(
+                        connect(self._websocket_url(worker, "/ws/lobby"))
+                    )
+                    for worker in self.ring.nodes
+                ]
+                sessions: dict[str, None] = {}
+                for upstream in upstreams:
+                    sessions.update(
+                        dict.fromkeys(loads(await upstream.recv())["sessions"])
+                    )
+            except (OSError, WebSocketException) as e:
+                logging.warning("Lobby WebSocket to a worker failed: %r", e)
+                with contextlib.suppress(RuntimeError):
+                    await websocket.close(code=CLOSE_INTERNAL_ERROR)
+                return
+            await websocket.send_text(dumps(lobby_message(list(sessions))))
+            sending = asyncio.Lock()
+
+            async def forward(upstream: ClientConnection) -> None:
+                with contextlib.suppress(ConnectionClosed):
+                    async for message in upstream:
+                        update = loads(message)
+                        # Workers sharing a session store report the same sessions.
+                        added = [i for i in update["added"] if i not in sessions]
+                        removed = [i for i in update["removed"] if i in sessions]
+                        sessions.update(dict.fromkeys(added))
+                        for game_id in removed:
+                            del sessions[game_id]
+                        if added or removed:
+                            async with sending:
+                                await websocket.send_text(
+                                    dumps(lobby_update(added, removed))
+                                )
+
+            async def wait_for_client() -> None:
+                with contextlib.suppress(WebSocketDisconnect):
+                    while True:
+                        await websocket.receive_text()
+
+            tasks = [asyncio.create_task(wait_for_client())] + [
+                asyncio.create_task(forward(upstream)) for upstream in upstreams
+            ]
+            try:
+                await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for task in tasks:
+                    task.cancel()
+            with contextlib.suppress(RuntimeError):
+                await websocket.close(code=CLOSE_TRY_AGAIN_LATER)
+
+    @staticmethod
+    def _websocket_url(worker: str, path: str) -> str:
+        return "ws" + worker.removeprefix("http") + path
+
+    async def _websocket_endpoint(
+        self, websocket: WebSocket, game_id: str, username: str
+    ) -> None:
+        worker = self.worker_for(game_id)
+        url = self._websocket_url(
+            worker, f"/ws/{quote(game_id, safe='')}/{quote(username, safe='')}"
+        )
+        if websocket.url.query:
+            url += f"?{websocket.url.query}"
+        load = self.load.get(worker, WorkerLoad())
+        await websocket.accept()
+        try:
+            async with connect(url, max_size=None) as upstream:
+                load.websockets += 1
+                load.open_websockets += 1
+                try:
+                    await self._relay(websocket, upstream)
+                finally:
+                    load.open_websockets -= 1
+        except (OSError, WebSocketException) as e:
+            load.errors += 1
+            logging.warning("WebSocket to worker %s failed: %r", worker, e)
+            with contextlib.suppress(RuntimeError):
+                await websocket.close(code=CLOSE_INTERNAL_ERROR)
+
+    @staticmethod
+    async def _relay(websocket: WebSocket, upstream: ClientConnection) -> None:
+        """Pass messages both ways until either side closes."""
+
+        async def to_worker() -> None:
+            with contextlib.suppress(WebSocketDisconnect):
+                while True:
+                    await upstream.send(await websocket.receive_text())
+            await upstream.close()
+
+        async def to_player() -> None:
+            with contextlib.suppress(ConnectionClosed):
+                async for message in upstream:
+                    await websocket.send_text(message)
+            with contextlib.suppress(RuntimeError):
+                await websocket.close(code=upstream.close_code or 1000)
+
+        tasks = [asyncio.create_task(to_worker()), asyncio.create_task(to_player())]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+        for task in done:
+            task.result()
+
+
+def _run_worker(port: int, worker_id: str, log_level: int) -> None:
+    """Run a game server behind the router, in a process of its own."""
+    logging.basicConfig(level=log_level)
+    os.environ["WORKER_ID"] = worker_id
+    if snapshot_path := os.getenv("SNAPSHOT_PATH"):
+        # Every worker snapshots its own sessions.
+        path = Path(snapshot_path)
+        os.environ["SNAPSHOT_PATH"] = str(path.with_stem(f"{path.stem}-{worker_id}"))
+    serve(Server().app, port=port, host="127.0.0.1", use_ssl=False)
+
+
+def _wait_until_listening(port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with (
+            contextlib.suppress(OSError),
+            socket.create_connection(("127.0.0.1", port), timeout=1),
+        ):
+            return
+        time.sleep(0.05)
+    raise TimeoutError(f"The worker on port {port} didn't start.")
+
+
+def run_workers_behind_router(port: int, workers: int, log_level: int) -> None:
+    """Start the worker processes and serve the router until it is stopped.
+
+    The workers listen on the ports after the router's port, on localhost only.
+    A worker that exits is taken off the ring.
+    """
+    base_port = int(os.getenv("WORKER_BASE_PORT", str(port + 1)))
+    context = multiprocessing.get_context("spawn")
+    processes: dict[str, multiprocessing.process.BaseProcess] = {}
+    for index in range(workers):
+        worker_port = base_port + index
+        process = context.Process(
+            target=_run_worker,
+            args=(worker_port, f"{socket.gethostname()}-{worker_port}", log_level),
+            name=f"track-back-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        processes[f"http://127.0.0.1:{worker_port}"] = process
+    for url in processes:
+        _wait_until_listening(int(url.rsplit(":", 1)[1]))
+
+    router = Router(processes)
+    stopping = threading.Event()
+
+    def watch(url: str, process: multiprocessing.process.BaseProcess) -> None:
+        process.join()
+        if not stopping.is_set():
+            logging.error("Worker %s exited with %s.", url, process.exitcode)
+            router.remove_worker_threadsafe(url)
+
+    for url, process in processes.items():
+        threading.Thread(target=watch, args=(url, process), daemon=True).start()
+
+    logging.info("Routing to %d workers: %s", workers, ", ".join(processes))
+    try:
+        serve(router.app, port=port)
+    finally:
+        stopping.set()
+        for process in processes.values():
+            process.terminate()
+        for process in processes.values():
+            process.join(timeout=5)
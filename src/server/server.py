@@ -1,22 +1,121 @@
 """Contains the game server class for managing game state and WebSocket connections."""
 
-import json
+import asyncio
+import contextlib
 import logging
 import os
-from typing import Any
+import time
+import uuid
+from collections.abc import AsyncIterator
+from functools import partial
+from typing import Annotated, Any
 
 import uvicorn
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import (
+    FastAPI,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+)
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field
 
+from game.delta import ProtocolVersion
 from game.game_logic import GameLogic
+from game.serialization import dumps, loads
 from game.user import User
+from music_service.async_adapter import run_blocking
 from music_service.factory import MusicServiceFactory
+from music_service.prefetch import TrackPrefetcher
 from music_service.spotify import router as spotify_auth_router
-from server.game_sessions import GameSession, game_session_manager
-from server.websocket_handler import WebSocketGameHandler
+from server.cluster import ClusterLink, RemoteWebSocket, proxy_websocket
+from server.game_sessions import GameSession, GameSessionManager, game_session_manager
+from server.lobby import (
+    MAX_PAGE_SIZE,
+    lobby_message,
+    session_list_response,
+)
+from server.now_playing import NowPlayingWatcher
+from server.outbound import (
+    CLOSE_GOING_AWAY,
+    CLOSE_SERVICE_RESTART,
+    OutboundQueue,
+    OverflowPolicy,
+)
+from server.session_store import PubSub, create_pubsub
+from server.snapshots import SessionSnapshotter, create_snapshotter
+from server.websocket_handler import (
+    PING_MESSAGES,
+    WebSocketGameHandler,
+    YourTurnMessage,
+)
+
+
+def serve(
+    app: FastAPI,
+    port: int,
+    host: str = "0.0.0.0",  # noqa: S104
+    use_ssl: bool = True,
+) -> None:
+    """Run the app with Uvicorn, with SSL if SSL_KEYFILE and SSL_CERTFILE are set.
+
+    Uvicorn pings every WebSocket each WS_PING_INTERVAL seconds, and closes it if the
+    client doesn't answer within WS_PING_TIMEOUT seconds.
+    """
+    ssl_keyfile = os.getenv("SSL_KEYFILE")
+    ssl_certfile = os.getenv("SSL_CERTFILE")
+    ping = {
+        "ws_ping_interval": float(os.getenv("WS_PING_INTERVAL", "20")),
+        "ws_ping_timeout": float(os.getenv("WS_PING_TIMEOUT", "20")),
+    }
+
+    if use_ssl and ssl_keyfile and ssl_certfile:
+        logging.info("Running server with SSL.")
+        uvicorn.run(
+            app,
+            host=host,
+            port=port,
+            ssl_keyfile=ssl_keyfile,
+            ssl_certfile=ssl_certfile,
+            **ping,
+        )
+    else:
+        logging.info("Running server without SSL.")
+        uvicorn.run(app, host=host, port=port, **ping)
+
+
+# Bounds of the mock music service options, so a request can't exhaust the server.
+MAX_MOCK_SONG_COUNT = 100_000
+MAX_MOCK_DELAY_MS = 5000.0
+
+
+class MockLatencyOptions(BaseModel):
+    """Latency distribution of a mock music service call."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    p50_ms: float = Field(0.0, ge=0, le=MAX_MOCK_DELAY_MS)
+    p99_ms: float = Field(0.0, ge=0, le=MAX_MOCK_DELAY_MS)
+
+
+class MockMusicServiceOptions(BaseModel):
+    """Options of the mock music service, for load tests.
+
+    Only accepted if the server runs with ENABLE_MOCK_OPTIONS=1.
+    """
+
+    model_config = ConfigDict(extra="forbid")
+
+    song_count: int | None = Field(None, ge=1, le=MAX_MOCK_SONG_COUNT)
+    seed: int = 0
+    latency: dict[str, MockLatencyOptions] = Field(default_factory=dict, max_length=16)
+    error_rate: float = Field(0.0, ge=0, le=1)
+    timeout_rate: float = Field(0.0, ge=0, le=1)
+    timeout_ms: float = Field(5000.0, ge=0, le=MAX_MOCK_DELAY_MS)
 
 
 class CreateGameRequest(BaseModel):
@@ -25,6 +124,7 @@ class CreateGameRequest(BaseModel):
     game_id: str
     target_song_count: int
     music_service_type: str
+    music_service_options: MockMusicServiceOptions | None = None
 
 
 class JoinGameRequest(BaseModel):
@@ -41,32 +141,47 @@ class StartGameRequest(BaseModel):
 
 
 class Server:
-    """Encapsulates the FastAPI application."""
-
-    def __init__(self) -> None:
+    """Encapsulates the FastAPI application.
+
+    Requests for sessions owned by other workers are forwarded to their owner.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        *,
+        watch_now_playing: bool = True,
+        prefetch_lookahead: int | None = None,
+        session_manager: GameSessionManager | None = None,
+        pubsub: PubSub | None = None,
+        snapshotter: SessionSnapshotter | None = None,
+        idle_timeout: float | None = None,
+    ) -> None:
+        self.watch_now_playing = watch_now_playing
+        self.prefetch_lookahead = (
+            prefetch_lookahead
+            if prefetch_lookahead is not None
+            else int(os.getenv("PREFETCH_LOOKAHEAD", "3"))
+        )
+        # Seconds a player's WebSocket may stay silent before it is closed, 0 never.
+        self.idle_timeout = (
+            idle_timeout
+            if idle_timeout is not None
+            else float(os.getenv("WS_IDLE_TIMEOUT", "600"))
+        )
+        # The mock music service options inject latency and errors, for load tests.
+        self.enable_mock_options = os.getenv("ENABLE_MOCK_OPTIONS", "") == "1"
+        self.sessions = session_manager or game_session_manager
+        self.snapshotter = snapshotter or create_snapshotter(self.sessions)
+        self.link = ClusterLink(pubsub or create_pubsub(), self.sessions.worker_id)
         self.app = self.create_app()
 
     def run(self, port: int) -> None:
         """Start the Uvicorn server."""
-        ssl_keyfile = os.getenv("SSL_KEYFILE")
-        ssl_certfile = os.getenv("SSL_CERTFILE")
-
-        if ssl_keyfile and ssl_certfile:
-            logging.info("Running server with SSL.")
-            uvicorn.run(
-                self.app,
-                host="0.0.0.0",  # noqa: S104
-                port=port,
-                ssl_keyfile=ssl_keyfile,
-                ssl_certfile=ssl_certfile,
-            )
-        else:
-            logging.info("Running server without SSL.")
-            uvicorn.run(self.app, host="0.0.0.0", port=port)  # noqa: S104
+        serve(self.app, port=port)
 
     def create_app(self) -> FastAPI:
         """Initialize and configure the FastAPI app with middleware and routes."""
-        app = FastAPI()
+        app = FastAPI(lifespan=self._lifespan)
 
         app.add_middleware(
             CORSMiddleware,
@@ -74,50 +189,221 @@ class Server:
             allow_credentials=True,
             allow_methods=["*"],
             allow_headers=["*"],
+            expose_headers=["ETag", "X-Total-Count"],
         )
 
         app.post("/create")(self._create_game_session)
         app.get("/list-sessions")(self._list_joinable_game_sessions)
         app.post("/join")(self._join_game_session)
         app.post("/start")(self._start_game_session)
+        app.get("/stats")(self._stats)
+        app.websocket("/ws/lobby")(self._lobby_endpoint)
         app.websocket("/ws/{game_id}/{username}")(self._websocket_endpoint)
         app.include_router(spotify_auth_router)
 
         return app
 
+    @contextlib.asynccontextmanager
+    async def _lifespan(self, _app: FastAPI) -> AsyncIterator[None]:
+        snapshots = None
+        if self.snapshotter:
+            await self._restore_sessions(self.snapshotter)
+            snapshots = asyncio.create_task(self.snapshotter.run())
+        reaper = asyncio.create_task(self._reap_expired_sessions())
+        lease = asyncio.create_task(self._renew_lease())
+        await self.link.start(self._handle_cluster_request)
+        try:
+            yield
+        finally:
+            reaper.cancel()
+            lease.cancel()
+            await self.link.close()
+            if snapshots and self.snapshotter:
+                snapshots.cancel()
+                await self.snapshotter.snapshot()
+            self.sessions.remove_all()
+            await self.sessions.flush()
+
+    async def _restore_sessions(self, snapshotter: SessionSnapshotter) -> None:
+        started_at = time.monotonic()
+        restored = await snapshotter.restore()
+        for session in restored:
+            # Polling starts with the first guess, once players are back.
+            if self.watch_now_playing and session.game_logic.running:
+                self._watch_now_playing(session)
+        logging.info(
+            "Restored %d game sessions in %.2f s.",
+            len(restored),
+            time.monotonic() - started_at,
+        )
+
+    async def _renew_lease(self) -> None:
+        """Renew this worker's lease on its sessions in the shared session store."""
+        if not self.sessions.store.shared:
+            return
+        while True:
+            try:
+                await self.sessions.renew_lease()
+            except Exception:  # keep renewing, the next try may succeed
+                logging.exception(
+                    "Renewing the lease of worker %s failed.", self.sessions.worker_id
+                )
+            await asyncio.sleep(self.sessions.store.lease_ttl / 3)
+
+    async def _reap_expired_sessions(self) -> None:
+        """Remove the expired sessions at every tick of the expiry wheel."""
+        expiring: set[asyncio.Task[None]] = set()
+        while True:
+            await asyncio.sleep(self.sessions.expiry.tick)
+            try:
+                expired = self.sessions.expired_sessions()
+            except Exception:  # keep reaping, or no session would expire anymore
+                logging.exception("Expiring the idle game sessions failed.")
+                continue
+            for session in expired:
+                # A session busy with an event doesn't hold up the others.
+                task = asyncio.create_task(
+                    session.actor.submit("expire", partial(self._expire, session))
+                )
+                expiring.add(task)
+                task.add_done_callback(expiring.discard)
+
+    async def _expire(self, session: GameSession) -> None:
+        if self.sessions.get_game_session(session.game_id) is not session:
+            return
+        # Events may have come in while the expiry waited for its turn.
+        if self.sessions.expires_in(session) > 0:
+            self.sessions.schedule_expiry(session)
+            return
+        logging.info("Game session %s expired.", session.game_id)
+        self.sessions.expire(session.game_id)
+        # Players whose connection died without a close are still registered.
+        for websocket in session.connection_manager.get_all_websockets():
+            with contextlib.suppress(RuntimeError, OSError):
+                await websocket.close()
+
     async def _create_game_session(self, req: CreateGameRequest) -> JSONResponse:
         game_id = req.game_id
         target_song_count = req.target_song_count
 
         music_service_type = req.music_service_type
-        music_service = MusicServiceFactory.create_music_service(music_service_type)
+        options = req.music_service_options
+        if options and options.model_fields_set and not self.enable_mock_options:
+            raise HTTPException(
+                status_code=403,
+                detail="Music service options are disabled on this server.",
+            )
+        # Creating an adapter may talk to the music service already.
+        try:
+            music_service = await run_blocking(
+                MusicServiceFactory.create_music_service,
+                music_service_type,
+                options.model_dump(exclude_unset=True) if options else None,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e)) from e
 
         game = GameLogic(
             target_song_count=target_song_count, music_service=music_service
         )
-        game_session_manager.add_game(game_id, game)
+        await self.sessions.add_game_async(game_id, game)
 
         return JSONResponse(
             status_code=201, content={"message": f"Game session {game_id} created."}
         )
 
-    async def _list_joinable_game_sessions(self) -> JSONResponse:
-        joinable_session_ids = [
-            session_id
-            for session_id, session in game_session_manager.sessions.items()
-            if not session.game_logic.running
-            or any(user.is_active is False for user in session.game_logic.users)
-        ]
-        return JSONResponse(content={"sessions": joinable_session_ids})
+    async def _list_joinable_game_sessions(
+        self,
+        request: Request,
+        offset: Annotated[int, Query(ge=0)] = 0,
+        limit: Annotated[int | None, Query(ge=1, le=MAX_PAGE_SIZE)] = None,
+        prefix: str = "",
+        running: bool | None = None,
+    ) -> Response:
+        """List the joinable sessions, optionally a page of them and filtered.
+
+        Clients send the ETag back in If-None-Match to get 304 while nothing changed.
+        """
+        return session_list_response(
+            request,
+            await self.sessions.joinable_sessions(prefix, running),
+            offset,
+            limit,
+        )
+
+    async def _lobby_endpoint(self, websocket: WebSocket) -> None:
+        """Send the joinable sessions, then every session added to or removed from them.
+
+        Only the changes of this worker's sessions are pushed. A client that falls
+        behind is disconnected and gets the whole list again when it reconnects.
+        """
+        await websocket.accept()
+        outbound = OutboundQueue(websocket, policy=OverflowPolicy.DISCONNECT)
+        unsubscribe = self.sessions.lobby.subscribe(
+            lambda update: outbound.send(dumps(update), update["type"])
+        )
+        try:
+            message = lobby_message(await self.sessions.joinable_sessions())
+            outbound.send(dumps(message), message["type"])
+            while True:
+                # Clients don't send anything but pings.
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            unsubscribe()
+            outbound.close()
+
+    async def _stats(self) -> JSONResponse:
+        stats: dict[str, Any] = {
+            "sessions": {
+                session_id: session.stats()
+                for session_id, session in self.sessions.sessions.items()
+            }
+        }
+        if self.snapshotter:
+            stats["snapshots"] = self.snapshotter.stats()
+        stats["expired_sessions"] = self.sessions.expired
+        return JSONResponse(content=stats)
 
     async def _join_game_session(self, req: JoinGameRequest) -> JSONResponse:
-        game_id = req.game_id
-        user_name = req.user_name
-        session = game_session_manager.get_game_session(game_id)
+        if owner := await self._remote_owner(req.game_id):
+            return await self._forward(
+                owner,
+                {"op": "join", "game_id": req.game_id, "user_name": req.user_name},
+            )
+        session = self._get_session(req.game_id)
+        return await session.actor.submit(
+            "join", lambda: self._join(session, req.user_name)
+        )
+
+    def _get_session(self, game_id: str) -> GameSession:
+        session = self.sessions.get_game_session(game_id)
         if not session:
             raise HTTPException(
                 status_code=404, detail=f"Game session {game_id} not found."
             )
+        return session
+
+    async def _remote_owner(self, game_id: str) -> str | None:
+        if self.sessions.get_game_session(game_id):
+            return None
+        return await self.sessions.remote_owner(game_id)
+
+    async def _forward(self, owner: str, message: dict[str, Any]) -> JSONResponse:
+        """Send an HTTP request to the worker owning the session."""
+        try:
+            reply = await self.link.request(owner, message)
+        except TimeoutError as e:
+            raise HTTPException(
+                status_code=504,
+                detail=f"Worker {owner} of game session {message['game_id']} "
+                "didn't reply.",
+            ) from e
+        return JSONResponse(status_code=reply["status_code"], content=reply["content"])
+
+    async def _join(self, session: GameSession, user_name: str) -> JSONResponse:
+        game_id = session.game_id
         if session.game_logic.running:
             user_to_reconnect = session.game_logic.get_user(user_name)
             joinable_user_names = ", ".join(
@@ -138,7 +424,7 @@ class Server:
                     f"Only one of the following users can be connected: "
                     f"{joinable_user_names}.",
                 )
-            user_to_reconnect.is_active = True
+            session.game_logic.activate_user(user_name)
             session.connection_manager.register_user(user_name)
 
             number_of_users = len(
@@ -155,7 +441,7 @@ class Server:
                     f"There are now {number_of_users} players: "
                     f"{user_names_string}."
                 ),
-                "song_list": [song.serialize() for song in user_to_reconnect.song_list],
+                "song_list": user_to_reconnect.song_list_json(),
                 "user_name": user_name,
                 "next_player": user_name,
             }
@@ -163,6 +449,7 @@ class Server:
             await self._broadcast_to_all_connected_users(
                 session, player_rejoined_message
             )
+            self.sessions.sync(session)
             return JSONResponse(
                 content={"message": f"User {user_name} re-joined game {game_id}."}
             )
@@ -193,20 +480,17 @@ class Server:
         self, session: GameSession, message: dict[str, Any]
     ) -> None:
         """Broadcast a message to all connected users in the game session."""
-        for ws in session.connection_manager.get_all_websockets():
-            if ws.client_state.name != "CONNECTED":
-                continue
-            await ws.send_text(json.dumps(message))
+        session.connection_manager.broadcast(message)
 
     async def _start_game_session(self, req: StartGameRequest) -> JSONResponse:
         """Start the game and notify the first player via WebSocket."""
-        game_id = req.game_id
-        session = game_session_manager.get_game_session(game_id)
-        if not session:
-            raise HTTPException(
-                status_code=404, detail=f"Game session {game_id} not found."
-            )
+        if owner := await self._remote_owner(req.game_id):
+            return await self._forward(owner, {"op": "start", "game_id": req.game_id})
+        session = self._get_session(req.game_id)
+        return await session.actor.submit("start", lambda: self._start(session))
 
+    async def _start(self, session: GameSession) -> JSONResponse:
+        game_id = session.game_id
         connection_manager = session.connection_manager
 
         if len(connection_manager.get_registered_user_names()) < 1:
@@ -219,29 +503,25 @@ class Server:
 
         game = session.game_logic
 
-        game.start_game(users)
+        await game.start_game_async(users)
+        self.sessions.sync(session)
+
+        if self.watch_now_playing:
+            self._watch_now_playing(session).start()
 
         players_to_notify = game.strategy.get_players_to_notify_for_next_turn()
+        your_turn = YourTurnMessage("It's your turn!")
 
         for player in players_to_notify:
-            ws = connection_manager.get_websocket(player.name)
-            if not ws:
+            protocol = connection_manager.get_protocol_version(player.name)
+            if not connection_manager.send_text(
+                player.name, your_turn.for_player(player, protocol), "your_turn"
+            ):
                 raise HTTPException(
                     status_code=409,
                     detail=f"{player.name} is not connected via WebSocket.",
                 )
 
-            await ws.send_text(
-                json.dumps(
-                    {
-                        "type": "your_turn",
-                        "message": "It's your turn!",
-                        "next_player": player.name,
-                        "song_list": [song.serialize() for song in player.song_list],
-                    }
-                )
-            )
-
         return JSONResponse(
             status_code=200,
             content={
@@ -250,81 +530,238 @@ class Server:
             },
         )
 
+    def _watch_now_playing(self, session: GameSession) -> NowPlayingWatcher:
+        game = session.game_logic
+        game.prefetcher = TrackPrefetcher(self.prefetch_lookahead)
+        session.now_playing_watcher = NowPlayingWatcher(
+            game,
+            lambda message: self._broadcast_to_all_connected_users(session, message),
+        )
+        return session.now_playing_watcher
+
     async def _websocket_endpoint(
-        self, websocket: WebSocket, game_id: str, username: str
+        self,
+        websocket: WebSocket,
+        game_id: str,
+        username: str,
+        protocol: int = ProtocolVersion.FULL,
     ) -> None:
         await websocket.accept()
-        game_session = game_session_manager.get_game_session(game_id)
-        if not game_session:
+        game_session = self.sessions.get_game_session(game_id)
+        owner = None if game_session else await self.sessions.remote_owner(game_id)
+        if not game_session and not owner:
             await websocket.close()
             logging.error("Game session %s not found.", game_id)
             return
+        try:
+            protocol_version = ProtocolVersion(protocol)
+        except ValueError:
+            await websocket.close()
+            logging.error("Unsupported protocol version %s.", protocol)
+            return
+
+        if owner:
+            # The player's messages go to the owner, which sends its messages back.
+            client_channel = f"client:{self.sessions.worker_id}:{uuid.uuid4().hex}"
+            connect = {
+                "game_id": game_id,
+                "username": username,
+                "protocol": int(protocol_version),
+                "client_channel": client_channel,
+            }
+            with contextlib.suppress(WebSocketDisconnect):
+                await proxy_websocket(
+                    websocket,
+                    self.link,
+                    owner,
+                    client_channel,
+                    connect,
+                    idle_timeout=self.idle_timeout or None,
+                )
+            return
+
+        handler = WebSocketGameHandler(game_session.connection_manager)
+        # Registering the socket doesn't await, so it can't interleave with events.
+        # It runs here, because the socket's writer has to run on this event loop.
+        await handler.handle_connection(websocket, username, protocol_version)
+        await game_session.actor.submit(
+            "connect",
+            lambda: self._connect(handler, game_session, username, protocol_version),
+        )
+
+        try:
+            while True:
+                raw_data = await self._receive(websocket)
+                if raw_data is None:
+                    logging.info("Closing the idle WebSocket of %s.", username)
+                    with contextlib.suppress(RuntimeError):
+                        await websocket.close(code=CLOSE_GOING_AWAY)
+                    await self.handle_disconnection(username, game_session)
+                    return
+                if raw_data in PING_MESSAGES:
+                    continue
+                await self._handle_client_message(game_session, username, raw_data)
+        except WebSocketDisconnect as e:
+            # Uvicorn closes connections whose client doesn't answer its pings.
+            await self.handle_disconnection(
+                username, game_session, restarting=e.code == CLOSE_SERVICE_RESTART
+            )
+
+    async def _receive(self, websocket: WebSocket) -> str | None:
+        """Wait for the next message, return None if the client stays idle too long."""
+        try:
+            async with asyncio.timeout(self.idle_timeout or None):
+                return await websocket.receive_text()
+        except TimeoutError:
+            return None
+
+    async def _handle_client_message(
+        self, game_session: GameSession, username: str, raw_data: str
+    ) -> None:
+        handler = WebSocketGameHandler(game_session.connection_manager)
+        data = loads(raw_data)
+
+        if data.get("type") == "guess":
+            index = data.get("index")
+            await game_session.actor.submit(
+                "guess",
+                partial(self._guess, handler, game_session, username, index),
+            )
+            if game_session.now_playing_watcher:
+                game_session.now_playing_watcher.wake()
+        elif data.get("type") == "resync":
+            await game_session.actor.submit(
+                "resync",
+                lambda: handler.handle_resync(username, game_session.game_logic),
+            )
+        elif data.get("type") == "ping":
+            logging.debug("Received ping from %s", username)
+        else:
+            game_session.connection_manager.send_text(
+                username, "Unknown message type.", "unknown"
+            )
+
+    async def _handle_cluster_request(
+        self, message: dict[str, Any]
+    ) -> dict[str, Any] | None:
+        """Handle a request of another worker for a session of this worker."""
+        op = message["op"]
+        game_id = message["game_id"]
+        if op in ("join", "start"):
+            try:
+                session = self._get_session(game_id)
+                if op == "join":
+                    response = await session.actor.submit(
+                        "join", lambda: self._join(session, message["user_name"])
+                    )
+                else:
+                    response = await session.actor.submit(
+                        "start", lambda: self._start(session)
+                    )
+            except HTTPException as e:
+                return {"status_code": e.status_code, "content": {"detail": e.detail}}
+            return {
+                "status_code": response.status_code,
+                "content": loads(response.body),
+            }
 
+        game_session = self.sessions.get_game_session(game_id)
+        username = message["username"]
+        if op == "connect":
+            websocket = RemoteWebSocket(self.link.pubsub, message["client_channel"])
+            if not game_session:
+                await websocket.close()
+                logging.error("Game session %s not found.", game_id)
+                return None
+            protocol_version = ProtocolVersion(message["protocol"])
+            handler = WebSocketGameHandler(game_session.connection_manager)
+            await handler.handle_connection(
+                websocket,  # type: ignore[arg-type]
+                username,
+                protocol_version,
+            )
+            await game_session.actor.submit(
+                "connect",
+                lambda: self._connect(
+                    handler, game_session, username, protocol_version
+                ),
+            )
+        elif not game_session:
+            return None
+        elif op == "client_message":
+            await self._handle_client_message(game_session, username, message["text"])
+        elif op == "disconnect":
+            await self.handle_disconnection(username, game_session)
+        return None
+
+    async def _connect(
+        self,
+        handler: WebSocketGameHandler,
+        game_session: GameSession,
+        username: str,
+        protocol_version: ProtocolVersion,
+    ) -> None:
+        """Catch a (re)connected player up with the game."""
         connection_manager = game_session.connection_manager
         if connection_manager.first_player is None:
             connection_manager.first_player = username
             logging.info("First player: %s", connection_manager.first_player)
 
-        handler = WebSocketGameHandler(connection_manager)
-        await handler.handle_connection(websocket, username)
-
         player = game_session.game_logic.get_user(username)
 
+        if player and protocol_version == ProtocolVersion.DELTA:
+            await handler.handle_resync(username, game_session.game_logic)
+
         if (
             game_session.game_logic.running
             and player
             in game_session.game_logic.strategy.get_players_to_notify_for_next_turn()
+            and not connection_manager.send_text(
+                username,
+                YourTurnMessage("It's your turn!").for_player(player, protocol_version),
+                "your_turn",
+            )
         ):
-            if ws := connection_manager.get_websocket(username):
-                await ws.send_text(
-                    json.dumps(
-                        {
-                            "type": "your_turn",
-                            "message": "It's your turn!",
-                            "next_player": username,
-                            "song_list": [
-                                song.serialize() for song in player.song_list
-                            ],
-                        }
-                    )
-                )
-            else:
-                raise HTTPException(
-                    status_code=409,
-                    detail=f"{username} is not connected via WebSocket.",
-                )
-
-        try:
-            while True:
-                raw_data = await websocket.receive_text()
-                data = json.loads(raw_data)
-
-                game = game_session.game_logic
+            raise HTTPException(
+                status_code=409,
+                detail=f"{username} is not connected via WebSocket.",
+            )
 
-                if data.get("type") == "guess":
-                    index = data.get("index")
-                    await handler.handle_guess(websocket, username, index, game)
-                elif data.get("type") == "ping":
-                    logging.info("Received ping from %s", username)
-                else:
-                    await websocket.send_text("Unknown message type.")
+    async def _guess(
+        self,
+        handler: WebSocketGameHandler,
+        game_session: GameSession,
+        username: str,
+        index: int,
+    ) -> None:
+        game = game_session.game_logic
+        await handler.handle_guess(username, index, game)
+        if not game.running:
+            self.sessions.remove_game_session(game_session.game_id)
 
-                if not game.running:
-                    game_session_manager.remove_game_session(game_id)
+    async def handle_disconnection(
+        self, username: str, game_session: GameSession, restarting: bool = False
+    ) -> None:
+        """Handle user disconnection from the game session.
 
-        except WebSocketDisconnect:
-            await self.handle_disconnection(username, game_session)
+        While the server restarts, the sessions are kept for the snapshot.
+        """
+        await game_session.actor.submit(
+            "disconnect",
+            lambda: self._disconnect(username, game_session, restarting),
+        )
 
-    async def handle_disconnection(
-        self, username: str, game_session: GameSession
+    async def _disconnect(
+        self, username: str, game_session: GameSession, restarting: bool
     ) -> None:
-        """Handle user disconnection from the game session."""
         connection_manager = game_session.connection_manager
 
         connection_manager.unregister_user(username)
 
-        if inactive_user := game_session.game_logic.get_user(username):
-            inactive_user.is_active = False
+        game_session.game_logic.deactivate_user(username)
+        if restarting:
+            self.sessions.sync(game_session)
+            return
 
         await self._broadcast_to_all_connected_users(
             game_session,
@@ -337,5 +774,7 @@ class Server:
 
         game_id = game_session.game_id
         if not connection_manager.user_connections:
-            game_session_manager.remove_game_session(game_id)
+            self.sessions.remove_game_session(game_id)
             logging.info("Removed empty game session %s", game_id)
+        else:
+            self.sessions.sync(game_session)
@@ -0,0 +1,146 @@
+"""Contains the SessionActor class, which applies the events of a session in order."""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import Any, TypeVar
+
+from server.outbound import running_loop_is
+
+T = TypeVar("T")
+
+
+@dataclass
+class SessionEvent:
+    """An event waiting to be applied to a game session."""
+
+    kind: str
+    handler: Callable[[], Awaitable[Any]]
+    future: asyncio.Future[Any]
+    loop: asyncio.AbstractEventLoop
+    submitted_at: float = field(default_factory=time.monotonic)
+
+
+class SessionActor:
+    """Applies the events of a game session one after another.
+
+    Events are joins, starts, connects, guesses and disconnects. Their handlers may
+    await, e.g. the music service, without another event of the session mutating the
+    game in between. Sessions don't block each other, each has an actor of its own.
+
+    The actor has no task while it is idle. The first event submitted to an idle
+    actor starts a drainer task, which applies the queued events in order and exits
+    once the queue is empty. Events may be submitted from any event loop.
+    """
+
+    def __init__(self) -> None:
+        self._events: deque[SessionEvent] = deque()
+        self._lock = threading.Lock()
+        self._draining = False
+        self._drainer: asyncio.Task[None] | None = None
+
+        self.processed = 0
+        self.failed = 0
+        # When the last event was applied, or the actor created.
+        self.last_event_at = time.monotonic()
+        self.max_queued = 0
+        self.total_processing_time = 0.0
+        self.max_processing_time = 0.0
+        self.max_waiting_time = 0.0
+
+    async def submit(self, kind: str, handler: Callable[[], Awaitable[T]]) -> T:
+        """Queue the event, wait until it is applied and return its result.
+
+        Exceptions of the handler, e.g. HTTPExceptions, are raised to the caller.
+        """
+        loop = asyncio.get_running_loop()
+        event = SessionEvent(kind, handler, loop.create_future(), loop)
+        with self._lock:
+            self._events.append(event)
+            self.max_queued = max(self.max_queued, len(self._events))
+            start_drainer = not self._draining
+            self._draining = True
+        if start_drainer:
+            self._drainer = loop.create_task(self._drain())
+        return await event.future
+
+    def stats(self) -> dict[str, Any]:
+        """Return the queue depth and processing times of the session's events."""
+        mean_processing_time = (
+            self.total_processing_time / self.processed if self.processed else 0.0
+        )
+        return {
+            "queued": len(self._events),
+            "max_queued": self.max_queued,
+            "processed": self.processed,
+            "failed": self.failed,
+            "mean_processing_ms": round(mean_processing_time * 1000, 3),
+            "max_processing_ms": round(self.max_processing_time * 1000, 3),
+            "max_waiting_ms": round(self.max_waiting_time * 1000, 3),
+        }
+
+    async def _drain(self) -> None:
+        event: SessionEvent | None = None
+        try:
+            while True:
+                with self._lock:
+                    if not self._events:
+                        self._draining = False
+                        return
+                    event = self._events.popleft()
+                await self._apply(event)
+                event = None
+        except BaseException:
+            # The loop of the drainer shuts down, don't leave the submitters hanging.
+            with self._lock:
+                pending = ([event] if event else []) + list(self._events)
+                self._events.clear()
+                self._draining = False
+            for stopped in pending:
+                self._resolve(
+                    stopped, exception=RuntimeError("The game session stopped.")
+                )
+            raise
+
+    async def _apply(self, event: SessionEvent) -> None:
+        started_at = time.monotonic()
+        self.max_waiting_time = max(
+            self.max_waiting_time, started_at - event.submitted_at
+        )
+        try:
+            result = await event.handler()
+        except Exception as e:  # noqa: BLE001
+            self.failed += 1
+            self._resolve(event, exception=e)
+        else:
+            self._resolve(event, result=result)
+        finally:
+            self.last_event_at = time.monotonic()
+            processing_time = self.last_event_at - started_at
+            self.processed += 1
+            self.total_processing_time += processing_time
+            self.max_processing_time = max(self.max_processing_time, processing_time)
+
+    @staticmethod
+    def _resolve(
+        event: SessionEvent,
+        result: Any = None,  # noqa: ANN401
+        exception: BaseException | None = None,
+    ) -> None:
+        """Hand the outcome to the submitter, on the submitter's event loop."""
+
+        def set_outcome() -> None:
+            if event.future.done():  # the submitter was cancelled
+                return
+            if exception is not None:
+                event.future.set_exception(exception)
+            else:
+                event.future.set_result(result)
+
+        if running_loop_is(event.loop):
+            set_outcome()
+        elif not event.loop.is_closed():
+            event.loop.call_soon_threadsafe(set_outcome)
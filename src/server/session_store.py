@@ -0,0 +1,237 @@
+"""Contains the interfaces of the session store and pub/sub, with in-memory backends.
+
+Every game session is owned by the worker process it was created on, which keeps its
+game state in memory. The session store tells the workers which worker owns a
+session and which sessions can be joined. Pub/sub carries requests and messages for
+players between the workers, so players can connect to any worker.
+
+With the in-memory backend there is only one worker. Set ``SESSION_BACKEND=sqlite``
+to share sessions between the workers on one machine, see ``sqlite_backend``.
+"""
+
+import asyncio
+import os
+import socket
+import threading
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from collections.abc import AsyncIterator
+from pathlib import Path
+from typing import Any
+
+from server.outbound import running_loop_is
+
+DEFAULT_STORE_PATH = Path("/tmp/track-back/sessions.sqlite3")  # noqa: S108
+DEFAULT_SOCKET_PATH = Path("/tmp/track-back/pubsub.sock")  # noqa: S108
+# Seconds without a heartbeat, after which the sessions of a worker are free again.
+DEFAULT_LEASE_TTL = 30.0
+
+
+def default_worker_id() -> str:
+    """Return the ID of this worker process, unique on the network."""
+    return os.getenv("WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+
+
+class SessionStore(ABC):
+    """Directory of the game sessions of all workers."""
+
+    # Whether other workers share the store, so it lists sessions of other workers.
+    shared = False
+    # Seconds a worker holds its sessions without renewing its lease.
+    lease_ttl = DEFAULT_LEASE_TTL
+
+    @abstractmethod
+    def claim(self, game_id: str, owner: str) -> bool:
+        """Register a new session, return False if the ID is taken."""
+
+    @abstractmethod
+    def release(self, game_id: str, owner: str) -> None:
+        """Remove a session of the owner."""
+
+    @abstractmethod
+    def release_all(self, owner: str) -> None:
+        """Remove all sessions of the owner, e.g. when the worker stops."""
+
+    @abstractmethod
+    def owner_of(self, game_id: str) -> str | None:
+        """Return the worker that owns the session."""
+
+    @abstractmethod
+    def set_joinable(self, game_id: str, joinable: bool, running: bool = False) -> None:
+        """Update whether players can join the session and whether it is running."""
+
+    @abstractmethod
+    def joinable_sessions(self, running: bool | None = None) -> dict[str, str]:
+        """Return the owners of the joinable sessions by session ID.
+
+        If running is given, only the sessions that are (not) running are returned.
+        """
+
+    def heartbeat(self, owner: str) -> None:  # noqa: B027
+        """Renew the lease of the owner on its sessions."""
+
+
+class InMemorySessionStore(SessionStore):
+    """Session store of a single worker."""
+
+    def __init__(self) -> None:
+        self._owners: dict[str, str] = {}
+        self._joinable: dict[str, bool] = {}
+        self._running: dict[str, bool] = {}
+        self._lock = threading.Lock()
+
+    def claim(self, game_id: str, owner: str) -> bool:
+        """Register a new session, return False if the ID is taken."""
+        with self._lock:
+            if game_id in self._owners:
+                return False
+            self._owners[game_id] = owner
+            self._joinable[game_id] = True
+            self._running[game_id] = False
+            return True
+
+    def release(self, game_id: str, owner: str) -> None:
+        """Remove a session of the owner."""
+        with self._lock:
+            if self._owners.get(game_id) == owner:
+                del self._owners[game_id]
+                self._joinable.pop(game_id, None)
+                self._running.pop(game_id, None)
+
+    def release_all(self, owner: str) -> None:
+        """Remove all sessions of the owner, e.g. when the worker stops."""
+        with self._lock:
+            for game_id in [g for g, o in self._owners.items() if o == owner]:
+                del self._owners[game_id]
+                self._joinable.pop(game_id, None)
+                self._running.pop(game_id, None)
+
+    def owner_of(self, game_id: str) -> str | None:
+        """Return the worker that owns the session."""
+        return self._owners.get(game_id)
+
+    def set_joinable(self, game_id: str, joinable: bool, running: bool = False) -> None:
+        """Update whether players can join the session and whether it is running."""
+        with self._lock:
+            if game_id in self._owners:
+                self._joinable[game_id] = joinable
+                self._running[game_id] = running
+
+    def joinable_sessions(self, running: bool | None = None) -> dict[str, str]:
+        """Return the owners of the joinable sessions by session ID.
+
+        If running is given, only the sessions that are (not) running are returned.
+        """
+        with self._lock:
+            return {
+                game_id: self._owners[game_id]
+                for game_id, joinable in self._joinable.items()
+                if joinable and (running is None or self._running[game_id] == running)
+            }
+
+
+class Subscription:
+    """Messages published to a channel, in the order they were published."""
+
+    def __init__(self, pubsub: "PubSub", channel: str) -> None:
+        self.pubsub = pubsub
+        self.channel = channel
+        self._loop = asyncio.get_running_loop()
+        self._messages: asyncio.Queue[dict[str, Any]] = asyncio.Queue()
+
+    def deliver(self, message: dict[str, Any]) -> None:
+        """Hand a message to the subscriber, from any thread."""
+        if running_loop_is(self._loop):
+            self._messages.put_nowait(message)
+        elif not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._messages.put_nowait, message)
+
+    async def get(self) -> dict[str, Any]:
+        """Wait for the next message."""
+        return await self._messages.get()
+
+    async def __aiter__(self) -> AsyncIterator[dict[str, Any]]:
+        """Iterate over the messages until the subscription is cancelled."""
+        while True:
+            yield await self.get()
+
+    def close(self) -> None:
+        """Stop receiving messages."""
+        self.pubsub.unsubscribe(self)
+
+
+class PubSub(ABC):
+    """Publishes JSON messages to the subscribers of a channel, across workers."""
+
+    @abstractmethod
+    async def publish(self, channel: str, message: dict[str, Any]) -> None:
+        """Send the message to all current subscribers of the channel."""
+
+    @abstractmethod
+    async def subscribe(self, channel: str) -> Subscription:
+        """Receive the messages of a channel from now on."""
+
+    @abstractmethod
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Stop receiving the messages of a subscription."""
+
+    async def close(self) -> None:  # noqa: B027
+        """Release the connection to the other workers."""
+
+
+class InMemoryPubSub(PubSub):
+    """Pub/sub within one worker."""
+
+    def __init__(self) -> None:
+        self._subscriptions: defaultdict[str, set[Subscription]] = defaultdict(set)
+
+    async def publish(self, channel: str, message: dict[str, Any]) -> None:
+        """Send the message to all current subscribers of the channel."""
+        for subscription in list(self._subscriptions.get(channel, ())):
+            subscription.deliver(message)
+
+    async def subscribe(self, channel: str) -> Subscription:
+        """Receive the messages of a channel from now on."""
+        subscription = Subscription(self, channel)
+        self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Stop receiving the messages of a subscription."""
+        subscriptions = self._subscriptions.get(subscription.channel, set())
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            self._subscriptions.pop(subscription.channel, None)
+
+
+def create_session_store(backend: str | None = None) -> SessionStore:
+    """Create the session store of the backend, by default set by SESSION_BACKEND.
+
+    Raise a ValueError if the backend is unknown.
+    """
+    backend = backend or os.getenv("SESSION_BACKEND", "memory")
+    if backend == "memory":
+        return InMemorySessionStore()
+    if backend == "sqlite":
+        from server.sqlite_backend import SQLiteSessionStore  # noqa: PLC0415
+
+        return SQLiteSessionStore(
+            os.getenv("SESSION_STORE_PATH") or DEFAULT_STORE_PATH,
+            lease_ttl=float(os.getenv("WORKER_LEASE_TTL", str(DEFAULT_LEASE_TTL))),
+        )
+    raise ValueError(f"Unknown session backend '{backend}', use memory or sqlite.")
+
+
+def create_pubsub(backend: str | None = None) -> PubSub:
+    """Create the pub/sub of the backend, by default set by SESSION_BACKEND.
+
+    Raise a ValueError if the backend is unknown.
+    """
+    backend = backend or os.getenv("SESSION_BACKEND", "memory")
+    if backend == "memory":
+        return InMemoryPubSub()
+    if backend == "sqlite":
+        from server.sqlite_backend import UnixSocketPubSub  # noqa: PLC0415
+
+        return UnixSocketPubSub(os.getenv("PUBSUB_SOCKET_PATH") or DEFAULT_SOCKET_PATH)
+    raise ValueError(f"Unknown session backend '{backend}', use memory or sqlite.")
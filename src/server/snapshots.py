@@ -0,0 +1,207 @@
+"""Contains the SessionSnapshotter class, which saves the game sessions periodically.
+
+After a restart the sessions are restored from the snapshot file, with all players
+inactive, so the players re-join through the usual re-join flow.
+
+The file starts with a header line, followed by one record per session: a 4 byte
+big-endian length and the zlib-compressed JSON snapshot of the session. Only the
+sessions that changed since the last snapshot are encoded again.
+"""
+
+import asyncio
+import logging
+import os
+import struct
+import time
+import zlib
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+from game.game_logic import GameLogic
+from game.serialization import dumps, loads
+from music_service.factory import MusicServiceFactory
+from server.game_sessions import GameSession, GameSessionManager
+
+FORMAT_HEADER = b"track-back-snapshot 1\n"
+RECORD_LENGTH = struct.Struct(">I")
+DEFAULT_INTERVAL = 10.0
+# Sessions copied on the event loop before other tasks get a turn.
+SESSIONS_PER_STEP = 100
+
+
+def session_snapshot(session: GameSession) -> dict[str, Any] | None:
+    """Return the state of the session, or None if its music service can't restore."""
+    music_service = session.game_logic.music_service.snapshot()
+    if music_service is None:
+        return None
+    return {
+        "game_id": session.game_id,
+        "music_service": music_service,
+        "game": session.game_logic.snapshot(),
+    }
+
+
+def restore_session(snapshot: dict[str, Any]) -> GameSession:
+    """Recreate a session from its snapshot."""
+    music_service = MusicServiceFactory.restore_music_service(snapshot["music_service"])
+    game = GameLogic.from_snapshot(snapshot["game"], music_service)
+    return GameSession(snapshot["game_id"], game)
+
+
+class SessionSnapshotter:
+    """Writes snapshots of the sessions of a worker and restores them."""
+
+    def __init__(
+        self,
+        sessions: GameSessionManager,
+        path: str | Path,
+        interval: float = DEFAULT_INTERVAL,
+    ) -> None:
+        self.sessions = sessions
+        self.path = Path(path).expanduser()
+        self.interval = interval
+
+        # Encoded record and revision of every session in the file.
+        self._records: dict[str, bytes] = {}
+        self._revisions: dict[str, tuple[int, int]] = {}
+        self._lock = asyncio.Lock()
+
+        self.snapshots = 0
+        self.encoded_sessions = 0
+        self.last_duration = 0.0
+
+    async def run(self) -> None:
+        """Take a snapshot every interval, until cancelled."""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.snapshot()
+            except OSError as e:
+                logging.warning("Writing the session snapshot failed: %s", e)
+
+    async def snapshot(self) -> None:
+        """Write the sessions that changed since the last snapshot to the file.
+
+        The state is copied on the event loop, in steps of SESSIONS_PER_STEP sessions.
+        Encoding and writing the file run in a thread.
+        """
+        async with self._lock:
+            started_at = time.monotonic()
+            changed: dict[str, dict[str, Any] | None] = {}
+            sessions = list(self.sessions.sessions.items())
+            for game_id, session in sessions:
+                # Every event applied to a session goes through its actor.
+                revision = (id(session), session.actor.processed)
+                if self._revisions.get(game_id) != revision:
+                    changed[game_id] = session_snapshot(session)
+                    self._revisions[game_id] = revision
+                    if len(changed) % SESSIONS_PER_STEP == 0:
+                        # Let other tasks run between the copies.
+                        await asyncio.sleep(0)
+            if changed:
+                self._records.update(await asyncio.to_thread(self._encode, changed))
+            removed = self._records.keys() - self.sessions.sessions.keys()
+            for game_id in removed:
+                self._records.pop(game_id)
+                self._revisions.pop(game_id, None)
+
+            if changed or removed:
+                await asyncio.to_thread(self._write, list(self._records.values()))
+
+            self.snapshots += 1
+            self.encoded_sessions += len(changed)
+            self.last_duration = time.monotonic() - started_at
+
+    async def restore(self) -> list[GameSession]:
+        """Add the sessions of the snapshot file to the session manager.
+
+        The file is read and the sessions are recreated in a thread, they are added
+        on the event loop.
+        """
+        restored = []
+        for session in await asyncio.to_thread(self._load):
+            game_id = session.game_id
+            try:
+                if game_id not in self.sessions.sessions:
+                    # A shared store may still list the session under this worker,
+                    # from before the restart.
+                    await self.sessions.run_store(
+                        self.sessions.store.release, game_id, self.sessions.worker_id
+                    )
+                await self.sessions.add_session_async(session)
+            except Exception:
+                logging.exception("Restoring game session %s failed.", game_id)
+                continue
+            restored.append(session)
+        return restored
+
+    def _load(self) -> list[GameSession]:
+        sessions = []
+        for snapshot in self._read():
+            try:
+                sessions.append(restore_session(snapshot))
+            except Exception:
+                logging.exception(
+                    "Restoring game session %s failed.", snapshot.get("game_id")
+                )
+        return sessions
+
+    def stats(self) -> dict[str, Any]:
+        """Return the number of snapshots and the duration of the last one."""
+        return {
+            "snapshots": self.snapshots,
+            "sessions": len(self._records),
+            "encoded_sessions": self.encoded_sessions,
+            "last_duration_ms": round(self.last_duration * 1000, 3),
+        }
+
+    @staticmethod
+    def _encode(changed: dict[str, dict[str, Any] | None]) -> dict[str, bytes]:
+        records = {}
+        for game_id, snapshot in changed.items():
+            # Sessions that can't be restored are kept out of the file.
+            encoded = zlib.compress(dumps(snapshot).encode(), 1) if snapshot else b""
+            records[game_id] = encoded
+        return records
+
+    def _write(self, records: list[bytes]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.path.with_name(self.path.name + ".tmp")
+        # The snapshot holds the access tokens of the music services.
+        fd = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as file:
+            file.write(FORMAT_HEADER)
+            for record in records:
+                if record:
+                    file.write(RECORD_LENGTH.pack(len(record)))
+                    file.write(record)
+        temporary.replace(self.path)
+
+    def _read(self) -> Iterator[dict[str, Any]]:
+        try:
+            data = self.path.read_bytes()
+        except FileNotFoundError:
+            return
+        if not data.startswith(FORMAT_HEADER):
+            logging.warning("Ignoring %s, it is not a session snapshot.", self.path)
+            return
+        offset = len(FORMAT_HEADER)
+        while offset + RECORD_LENGTH.size <= len(data):
+            (length,) = RECORD_LENGTH.unpack_from(data, offset)
+            offset += RECORD_LENGTH.size
+            record = data[offset : offset + length]
+            offset += length
+            try:
+                yield loads(zlib.decompress(record))
+            except (zlib.error, ValueError) as e:
+                logging.warning("Skipping a damaged session snapshot: %s", e)
+
+
+def create_snapshotter(sessions: GameSessionManager) -> SessionSnapshotter | None:
+    """Create the snapshotter configured by SNAPSHOT_PATH, if it is set."""
+    path = os.getenv("SNAPSHOT_PATH")
+    if not path:
+        return None
+    interval = float(os.getenv("SNAPSHOT_INTERVAL", str(DEFAULT_INTERVAL)))
+    return SessionSnapshotter(sessions, path, interval)
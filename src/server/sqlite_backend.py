@@ -0,0 +1,392 @@
+"""Contains the session backend for several workers on one machine.
+
+The session directory is a SQLite file, which all workers open. Pub/sub goes through
+a small broker, which listens on a Unix socket and forwards the messages published
+to a channel to the workers that subscribed to it. Frames are JSON objects, one per
+line::
+
+    {"op": "subscribe", "channel": "worker:a"}
+    {"op": "unsubscribe", "channel": "worker:a"}
+    {"op": "publish", "channel": "worker:a", "message": {...}}
+
+The broker forwards publish frames as they are.
+"""
+
+import asyncio
+import contextlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any
+
+from game.serialization import dumps, loads
+from server.session_store import (
+    DEFAULT_LEASE_TTL,
+    DEFAULT_SOCKET_PATH,
+    PubSub,
+    SessionStore,
+    Subscription,
+)
+
+# Limit of a frame, which may hold e.g. the song lists of all players.
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+# Bytes the broker buffers for a subscriber before it disconnects it as too slow.
+MAX_SUBSCRIBER_BUFFER = 4 * MAX_FRAME_SIZE
+# Schema changes of the session store file, in order. PRAGMA user_version holds the
+# number of changes applied to a file.
+SCHEMA_MIGRATIONS = (
+    (
+        "CREATE TABLE IF NOT EXISTS sessions "
+        "(game_id TEXT PRIMARY KEY, owner TEXT NOT NULL, joinable INTEGER NOT NULL)"
+    ),
+    "ALTER TABLE sessions ADD COLUMN running INTEGER NOT NULL DEFAULT 0",
+    "CREATE TABLE IF NOT EXISTS workers (owner TEXT PRIMARY KEY, seen_at REAL NOT NULL)",
+)
+# Seconds between the attempts to reconnect to the broker, doubling up to the maximum.
+RECONNECT_DELAY = 0.1
+MAX_RECONNECT_DELAY = 5.0
+
+
+class SQLiteSessionStore(SessionStore):
+    """Session store in a SQLite file shared by the workers.
+
+    Every worker renews its lease in the workers table. The sessions of a worker whose
+    lease ran out, e.g. because it crashed, are neither listed nor forwarded to, and
+    can be claimed again.
+    """
+
+    shared = True
+
+    def __init__(self, path: str | Path, lease_ttl: float = DEFAULT_LEASE_TTL) -> None:
+        self.path = Path(path).expanduser()
+        self.lease_ttl = lease_ttl
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(
+            self.path, timeout=5.0, check_same_thread=False, isolation_level=None
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._migrate()
+        self._lock = threading.Lock()
+
+    def _migrate(self) -> None:
+        """Bring the schema of the file up to date, e.g. after an upgrade."""
+        with self._connection:
+            # Workers starting at the same time migrate one after another.
+            self._connection.execute("BEGIN IMMEDIATE")
+            (version,) = self._connection.execute("PRAGMA user_version").fetchone()
+            for statement in SCHEMA_MIGRATIONS[version:]:
+                try:
+                    self._connection.execute(statement)
+                except sqlite3.OperationalError as e:
+                    # Files from before the versioning may have the column already.
+                    if "duplicate column name" not in str(e):
+                        raise
+            self._connection.execute(f"PRAGMA user_version = {len(SCHEMA_MIGRATIONS)}")
+
+    def claim(self, game_id: str, owner: str) -> bool:
+        """Register a new session, return False if the ID is taken."""
+        with self._lock, self._connection:
+            self._connection.execute("BEGIN IMMEDIATE")
+            self._renew(owner)
+            # The session of a worker whose lease ran out is free again.
+            self._connection.execute(
+                "DELETE FROM sessions WHERE game_id = ? AND owner NOT IN "
+                "(SELECT owner FROM workers WHERE seen_at >= ?)",
+                (game_id, self._expired_before()),
+            )
+            cursor = self._connection.execute(
+                "INSERT OR IGNORE INTO sessions (game_id, owner, joinable) "
+                "VALUES (?, ?, 1)",
+                (game_id, owner),
+            )
+            return cursor.rowcount == 1
+
+    def release(self, game_id: str, owner: str) -> None:
+        """Remove a session of the owner."""
+        with self._lock:
+            self._connection.execute(
+                "DELETE FROM sessions WHERE game_id = ? AND owner = ?", (game_id, owner)
+            )
+
+    def release_all(self, owner: str) -> None:
+        """Remove all sessions of the owner, e.g. when the worker stops."""
+        with self._lock, self._connection:
+            self._connection.execute("BEGIN IMMEDIATE")
+            self._connection.execute("DELETE FROM sessions WHERE owner = ?", (owner,))
+            self._connection.execute("DELETE FROM workers WHERE owner = ?", (owner,))
+
+    def owner_of(self, game_id: str) -> str | None:
+        """Return the worker that owns the session, unless its lease ran out."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT sessions.owner FROM sessions JOIN workers USING (owner) "
+                "WHERE game_id = ? AND seen_at >= ?",
+                (game_id, self._expired_before()),
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_joinable(self, game_id: str, joinable: bool, running: bool = False) -> None:
+        """Update whether players can join the session and whether it is running."""
+        with self._lock:
+            self._connection.execute(
+                "UPDATE sessions SET joinable = ?, running = ? WHERE game_id = ?",
+                (int(joinable), int(running), game_id),
+            )
+
+    def joinable_sessions(self, running: bool | None = None) -> dict[str, str]:
+        """Return the owners of the joinable sessions by session ID.
+
+        If running is given, only the sessions that are (not) running are returned.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT game_id, owner FROM sessions JOIN workers USING (owner) "
+                "WHERE joinable = 1 AND (?1 IS NULL OR running = ?1) AND seen_at >= ?2",
+                (None if running is None else int(running), self._expired_before()),
+            ).fetchall()
+        return dict(rows)
+
+    def heartbeat(self, owner: str) -> None:
+        """Renew the lease of the owner on its sessions."""
+        with self._lock:
+            self._renew(owner)
+
+    def _renew(self, owner: str) -> None:
+        # Wall clock time, the workers are separate processes.
+        self._connection.execute(
+            "INSERT INTO workers (owner, seen_at) VALUES (?, ?) "
+            "ON CONFLICT (owner) DO UPDATE SET seen_at = excluded.seen_at",
+            (owner, time.time()),
+        )
+
+    def _expired_before(self) -> float:
+        return time.time() - self.lease_ttl
+
+    def close(self) -> None:
+        """Close the SQLite file."""
+        with self._lock:
+            self._connection.close()
+
+
+class PubSubBroker:
+    """Forwards the messages published by the workers to the subscribed workers.
+
+    A subscriber that doesn't keep up with its messages is disconnected once more
+    than ``max_buffer_size`` bytes are waiting for it, rather than letting the
+    broker buffer without bound. It reconnects and subscribes again, missing the
+    messages in between.
+    """
+
+    def __init__(
+        self, path: str | Path, max_buffer_size: int = MAX_SUBSCRIBER_BUFFER
+    ) -> None:
+        self.path = Path(path)
+        self.max_buffer_size = max_buffer_size
+        self._subscribers: defaultdict[str, set[asyncio.StreamWriter]] = defaultdict(
+            set
+        )
+        self._server: asyncio.Server | None = None
+
+    async def start(self) -> None:
+        """Listen on the Unix socket, replacing a stale socket file."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.unlink(missing_ok=True)
+        self._server = await asyncio.start_unix_server(
+            self._serve, self.path, limit=MAX_FRAME_SIZE
+        )
+
+    async def close(self) -> None:
+        """Stop listening and disconnect the workers."""
+        if self._server:
+            self._server.close()
+            for writers in self._subscribers.values():
+                for writer in writers:
+                    writer.close()
+            self._subscribers.clear()
+            await self._server.wait_closed()
+            self.path.unlink(missing_ok=True)
+
+    async def _serve(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        channels: set[str] = set()
+        try:
+            while line := await reader.readline():
+                frame = loads(line)
+                channel = frame["channel"]
+                if frame["op"] == "subscribe":
+                    channels.add(channel)
+                    self._subscribers[channel].add(writer)
+                elif frame["op"] == "unsubscribe":
+                    channels.discard(channel)
+                    self._subscribers[channel].discard(writer)
+                elif frame["op"] == "publish":
+                    for subscriber in list(self._subscribers.get(channel, ())):
+                        self._forward(subscriber, line)
+        except (ConnectionError, ValueError, KeyError) as e:
+            logging.warning("Dropping a pub/sub connection: %r", e)
+        finally:
+            for channel in channels:
+                subscribers = self._subscribers.get(channel, set())
+                subscribers.discard(writer)
+                if not subscribers:
+                    self._subscribers.pop(channel, None)
+            writer.close()
+
+    def _forward(self, subscriber: asyncio.StreamWriter, line: bytes) -> None:
+        buffered = subscriber.transport.get_write_buffer_size()
+        if buffered + len(line) <= self.max_buffer_size:
+            subscriber.write(line)
+            return
+        logging.warning("Disconnecting a slow subscriber, %d bytes queued.", buffered)
+        for subscribers in self._subscribers.values():
+            subscribers.discard(subscriber)
+        # Closing would wait for the buffer to be sent, so drop it right away.
+        subscriber.transport.abort()
+
+
+async def serve_broker(path: str | Path) -> None:
+    """Run a broker until cancelled."""
+    broker = PubSubBroker(path)
+    await broker.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await broker.close()
+
+
+def main() -> None:
+    """Run the broker of the workers, listening on PUBSUB_SOCKET_PATH."""
+    logging.basicConfig(level=logging.INFO)
+    path = os.getenv("PUBSUB_SOCKET_PATH") or DEFAULT_SOCKET_PATH
+    logging.info("Pub/sub broker listening on %s", path)
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(serve_broker(path))
+
+
+def start_broker_thread(path: str | Path) -> threading.Thread:
+    """Run a broker on an event loop of its own, for the lifetime of the process."""
+    started = threading.Event()
+
+    async def serve() -> None:
+        broker = PubSubBroker(path)
+        await broker.start()
+        started.set()
+        await asyncio.Event().wait()
+
+    thread = threading.Thread(
+        target=asyncio.run, args=(serve(),), name="pubsub-broker", daemon=True
+    )
+    thread.start()
+    started.wait(timeout=5)
+    return thread
+
+
+class UnixSocketPubSub(PubSub):
+    """Pub/sub through the broker listening on a Unix socket.
+
+    The connection is opened on first use, on the event loop of the worker. If the
+    broker goes away, e.g. to restart, the connection and the subscriptions are
+    restored as soon as it is back.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self._subscriptions: defaultdict[str, set[Subscription]] = defaultdict(set)
+        self._writer: asyncio.StreamWriter | None = None
+        self._reader_task: asyncio.Task[None] | None = None
+        self._connecting = asyncio.Lock()
+        self._closed = False
+
+    async def publish(self, channel: str, message: dict[str, Any]) -> None:
+        """Send the message to all current subscribers of the channel."""
+        await self._send({"op": "publish", "channel": channel, "message": message})
+
+    async def subscribe(self, channel: str) -> Subscription:
+        """Receive the messages of a channel from now on."""
+        subscription = Subscription(self, channel)
+        first = not self._subscriptions[channel]
+        self._subscriptions[channel].add(subscription)
+        if first:
+            await self._send({"op": "subscribe", "channel": channel})
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Stop receiving the messages of a subscription."""
+        subscriptions = self._subscriptions.get(subscription.channel, set())
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            self._subscriptions.pop(subscription.channel, None)
+            if self._writer and not self._writer.is_closing():
+                frame = {"op": "unsubscribe", "channel": subscription.channel}
+                self._writer.write(dumps(frame).encode() + b"\n")
+
+    async def close(self) -> None:
+        """Disconnect from the broker."""
+        self._closed = True
+        if self._reader_task:
+            self._reader_task.cancel()
+        if self._writer:
+            self._writer.close()
+            with contextlib.suppress(ConnectionError):
+                await self._writer.wait_closed()
+        self._writer = None
+
+    async def _send(self, frame: dict[str, Any]) -> None:
+        writer = await self._connect()
+        writer.write(dumps(frame).encode() + b"\n")
+        await writer.drain()
+
+    async def _connect(self) -> asyncio.StreamWriter:
+        async with self._connecting:
+            if self._writer is None or self._writer.is_closing():
+                reader, self._writer = await asyncio.open_unix_connection(
+                    self.path, limit=MAX_FRAME_SIZE
+                )
+                self._reader_task = asyncio.create_task(self._read(reader))
+                # Subscribe again after the broker restarted.
+                for channel in self._subscriptions:
+                    frame = {"op": "subscribe", "channel": channel}
+                    self._writer.write(dumps(frame).encode() + b"\n")
+            return self._writer
+
+    async def _read(self, reader: asyncio.StreamReader) -> None:
+        try:
+            while line := await reader.readline():
+                try:
+                    frame = loads(line)
+                    channel, message = frame["channel"], frame["message"]
+                except (ValueError, KeyError, TypeError) as e:
+                    logging.warning("Dropping an invalid pub/sub frame: %r", e)
+                    continue
+                for subscription in list(self._subscriptions.get(channel, ())):
+                    subscription.deliver(message)
+        except (ConnectionError, ValueError) as e:  # ValueError: frame too large
+            logging.warning("Reading from the pub/sub broker failed: %r", e)
+        logging.warning("The pub/sub broker closed the connection.")
+        if self._writer:
+            self._writer.close()
+        self._writer = None
+        await self._reconnect()
+
+    async def _reconnect(self) -> None:
+        delay = RECONNECT_DELAY
+        # Without subscriptions, the next publish connects again.
+        while self._subscriptions and not self._closed:
+            try:
+                await self._connect()
+            except OSError as e:
+                logging.warning("Reconnecting to the pub/sub broker failed: %r", e)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+            else:
+                logging.info("Reconnected to the pub/sub broker.")
+                return
+
+
+if __name__ == "__main__":
+    main()
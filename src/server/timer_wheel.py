@@ -0,0 +1,92 @@
+"""Contains the TimerWheel class, which expires many timers at little cost."""
+
+import math
+import time
+from collections.abc import Hashable
+
+# Keys beyond the range of a single level would wait in its last slot forever.
+MIN_LEVELS = 2
+
+
+class TimerWheel:
+    """Hierarchical timing wheel, which tells which keys reached their deadline.
+
+    Level 0 has a slot per tick, every higher level a slot per full turn of the level
+    below. Scheduling and cancelling a key are O(1), whatever the number of keys.
+    When a level starts a new turn, the keys of the next slot of the level above are
+    spread over the levels below. Deadlines are rounded up to whole ticks.
+    """
+
+    def __init__(
+        self,
+        tick: float = 1.0,
+        slots: int = 64,
+        levels: int = 4,
+        start: float | None = None,
+    ) -> None:
+        if levels < MIN_LEVELS:
+            raise ValueError(f"A timer wheel needs at least {MIN_LEVELS} levels.")
+        self.tick = tick
+        self.slots = slots
+        # Ticks per slot of each level.
+        self._spans = [slots**level for level in range(levels)]
+        self._wheels: list[list[set[Hashable]]] = [
+            [set() for _ in range(slots)] for _ in range(levels)
+        ]
+        # Deadline in ticks, level and slot of every key.
+        self._positions: dict[Hashable, tuple[int, int, int]] = {}
+        self._now = math.floor((time.monotonic() if start is None else start) / tick)
+
+    def __len__(self) -> int:
+        """Return the number of scheduled keys."""
+        return len(self._positions)
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Return whether the key is scheduled."""
+        return key in self._positions
+
+    def schedule(self, key: Hashable, deadline: float) -> None:
+        """Expire the key at the deadline, a monotonic time, instead of before."""
+        self.cancel(key)
+        self._place(key, max(math.ceil(deadline / self.tick), self._now + 1))
+
+    def cancel(self, key: Hashable) -> None:
+        """Forget the key, if it is scheduled."""
+        if position := self._positions.pop(key, None):
+            _, level, slot = position
+            self._wheels[level][slot].discard(key)
+
+    def advance(self, now: float | None = None) -> list[Hashable]:
+        """Move the wheel to the time, return the keys whose deadline passed."""
+        target = math.floor((time.monotonic() if now is None else now) / self.tick)
+        expired: list[Hashable] = []
+        while self._now < target:
+            self._now += 1
+            for level in range(len(self._wheels) - 1, 0, -1):
+                span = self._spans[level]
+                if self._now % span == 0:
+                    self._cascade(level, (self._now // span) % self.slots)
+            slot = self._wheels[0][self._now % self.slots]
+            for key in slot:
+                del self._positions[key]
+            expired.extend(slot)
+            slot.clear()
+        return expired
+
+    def _place(self, key: Hashable, deadline: int) -> None:
+        delay = deadline - self._now
+        level = 0
+        while level < len(self._wheels) - 1 and delay >= self._spans[level + 1]:
+            level += 1
+        span = self._spans[level]
+        # Keys beyond the last level wait in its last slot and are placed again.
+        slot = (min(deadline, self._now + span * (self.slots - 1)) // span) % self.slots
+        self._wheels[level][slot].add(key)
+        self._positions[key] = (deadline, level, slot)
+
+    def _cascade(self, level: int, slot: int) -> None:
+        keys = self._wheels[level][slot]
+        self._wheels[level][slot] = set()
+        for key in keys:
+            deadline, _, _ = self._positions[key]
+            self._place(key, deadline)
@@ -1,17 +1,35 @@
 """Contains the WebSocket handler for the game server."""
 
-import json
+from typing import Any
 
 from fastapi import HTTPException, WebSocket
 
+from game.delta import ProtocolVersion
 from game.game_logic import GameLogic
+from game.serialization import dumps, extend
 from game.user import User
 from server.connection_manager import ConnectionManager
 
+# Keepalive messages of clients, as sent by the web UI, recognized without decoding.
+PING_MESSAGES = frozenset({'{"type":"ping"}', '{"type": "ping"}'})
 
-async def send_ws_message(ws: WebSocket, msg_type: str, message: str) -> None:
-    """Send a message to the WebSocket client."""
-    await ws.send_text(json.dumps({"type": msg_type, "message": message}))
+
+class YourTurnMessage:
+    """The message that asks players to make a guess, encoded once for all of them.
+
+    Only the name and song list of each player are appended per recipient.
+    """
+
+    def __init__(self, message: str) -> None:
+        self.encoded = dumps({"type": "your_turn", "message": message})
+
+    def for_player(self, player: User, protocol: ProtocolVersion) -> str:
+        """Return the message for the player."""
+        fields: dict[str, Any] = {"next_player": player.name}
+        # Delta clients already know their own song list.
+        if protocol == ProtocolVersion.FULL:
+            fields["song_list"] = player.song_list_json()
+        return extend(self.encoded, fields)
 
 
 class WebSocketGameHandler:
@@ -22,26 +40,29 @@ class WebSocketGameHandler:
             connection_manager  # GameContext with game, users, sockets, etc.
         )
 
-    async def handle_connection(self, websocket: WebSocket, username: str) -> None:
+    async def handle_connection(
+        self,
+        websocket: WebSocket,
+        username: str,
+        protocol: ProtocolVersion = ProtocolVersion.FULL,
+    ) -> None:
         """Handle a new WebSocket connection for a player."""
         if not self.connection_manager.user_is_registered(username):
             self.connection_manager.register_user(username)
-        await send_ws_message(
-            websocket,
-            "welcome",
-            f"Welcome {username}, you're connected.",
-        )
-
         self.connection_manager.set_websocket(username, websocket)
+        self.connection_manager.set_protocol_version(username, protocol)
+        self.connection_manager.send(
+            username,
+            {"type": "welcome", "message": f"Welcome {username}, you're connected."},
+        )
 
-    async def handle_guess(
-        self, websocket: WebSocket, username: str, index: int, game: GameLogic
-    ) -> None:
+    async def handle_guess(self, username: str, index: int, game: GameLogic) -> None:
         """Handle a guess from a player."""
-        payload = game.handle_player_turn(username, index)
+        protocol = self.connection_manager.get_protocol_version(username)
+        payload = await game.handle_player_turn_async(username, index, protocol)
 
         # Send result to the player who guessed
-        await websocket.send_text(json.dumps(payload))
+        self.connection_manager.send_text(username, dumps(payload), payload["type"])
         if payload["type"] == "error":
             return
 
@@ -53,26 +74,27 @@ class WebSocketGameHandler:
             )
 
         players_to_notify = game.strategy.get_players_to_notify_for_next_turn()
+        message = YourTurnMessage("New round! Make your guess!")
         for player in players_to_notify:
-            await self._notify_for_next_turn(player)
+            await self._notify_for_next_turn(player, message)
 
         if payload.get("game_over"):
             winner = payload["winner"]
             await self._broadcast_game_over(winner)
 
-    async def _notify_for_next_turn(self, player: User) -> None:
-        if websocket := self.connection_manager.get_websocket(player.name):
-            await websocket.send_text(
-                json.dumps(
-                    {
-                        "type": "your_turn",
-                        "message": "New round! Make your guess!",
-                        "next_player": player.name,
-                        "song_list": [song.serialize() for song in player.song_list],
-                    }
-                )
-            )
-        else:
+    async def handle_resync(self, username: str, game: GameLogic) -> None:
+        """Send the full song table and song lists to a delta protocol client."""
+        self.connection_manager.send_text(
+            username, dumps(game.sync_payload(username)), "sync"
+        )
+
+    async def _notify_for_next_turn(
+        self, player: User, message: YourTurnMessage
+    ) -> None:
+        protocol = self.connection_manager.get_protocol_version(player.name)
+        if not self.connection_manager.send_text(
+            player.name, message.for_player(player, protocol), "your_turn"
+        ):
             raise HTTPException(
                 status_code=400,
                 detail=f"No WebSocket for player {player.name}!",
@@ -81,28 +103,22 @@ class WebSocketGameHandler:
     async def _broadcast_guess_to_other_players(
         self, current_player: str, message: str, result: dict[str, str]
     ) -> None:
-        for name, websocket in self.connection_manager.user_connections.items():
-            if name != current_player and websocket is not None:
-                await websocket.send_text(
-                    json.dumps(
-                        {
-                            "type": "other_player_guess",
-                            "player": current_player,
-                            "result": result["result"],
-                            "message": message,
-                            "next_player": result.get("next_player"),
-                        }
-                    )
-                )
+        self.connection_manager.broadcast(
+            {
+                "type": "other_player_guess",
+                "player": current_player,
+                "result": result["result"],
+                "message": message,
+                "next_player": result.get("next_player"),
+            },
+            exclude=current_player,
+        )
 
     async def _broadcast_game_over(self, winner: str) -> None:
-        for ws in self.connection_manager.get_all_websockets():
-            await ws.send_text(
-                json.dumps(
-                    {
-                        "type": "game_over",
-                        "winner": winner,
-                        "message": f"{winner} has won the game!",
-                    }
-                )
-            )
+        self.connection_manager.broadcast(
+            {
+                "type": "game_over",
+                "winner": winner,
+                "message": f"{winner} has won the game!",
+            }
+        )
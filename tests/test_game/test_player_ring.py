@@ -0,0 +1,80 @@
+"""Tests for the PlayerRing class and the turn progression using it."""
+
+import pytest
+
+from game.game_logic import GameLogic
+from game.player_ring import PlayerRing
+from game.strategies.factory import GameStrategyEnum
+from game.user import User
+from music_service.mock import DummyMusicService
+
+
+def test_next_active_seat_skips_inactive_players() -> None:
+    users = [User("a"), User("b"), User("c"), User("d")]
+    ring = PlayerRing(users)
+
+    ring.deactivate(users[1])
+    ring.deactivate(users[2])
+
+    assert ring.active_count == 2
+    assert ring.next_active_seat(0) == 3
+    assert ring.next_active_seat(3) == 0
+    assert ring.next_active_seat(1) == 3
+
+    ring.activate(users[2])
+
+    assert ring.next_active_seat(0) == 2
+    assert ring.next_active_seat(2) == 3
+    assert [user.name for user in ring.active_users()] == ["a", "c", "d"]
+
+
+def test_no_active_players() -> None:
+    users = [User("a"), User("b")]
+    ring = PlayerRing(users)
+    ring.deactivate(users[0])
+    ring.deactivate(users[1])
+
+    assert ring.next_active_seat(0) is None
+
+    ring.activate(users[1])
+
+    assert ring.next_active_seat(0) == 1
+    assert ring.next_active_seat(1) == 1
+
+
+@pytest.mark.asyncio
+async def test_sequential_game_skips_disconnected_player() -> None:
+    game = GameLogic(
+        target_song_count=3,
+        music_service=DummyMusicService(),
+        game_strategy_enum=GameStrategyEnum.SEQUENTIAL,
+    )
+    players = [User("player1"), User("player2"), User("player3")]
+    await game.start_game_async(users=players)
+
+    game.deactivate_user("player2")
+    await game.handle_player_turn_async("player1", 0)
+
+    assert (await game.handle_player_turn_async("player3", 0))["type"] == "guess_result"
+
+
+@pytest.mark.asyncio
+async def test_simultaneous_round_ends_without_disconnected_player() -> None:
+    game = GameLogic(
+        target_song_count=3,
+        music_service=DummyMusicService(),
+        game_strategy_enum=GameStrategyEnum.SIMULTANEOUS,
+    )
+    players = [User("player1"), User("player2")]
+    await game.start_game_async(users=players)
+
+    game.deactivate_user("player2")
+    await game.handle_player_turn_async("player1", 0)
+
+    # the round is over, so player1 can guess again
+    assert (await game.handle_player_turn_async("player1", 1))["type"] == "guess_result"
+    assert game.strategy.pending_guessers == 1
+
+    game.activate_user("player2")
+
+    assert game.strategy.pending_guessers == 2
@@ -0,0 +1,76 @@
+"""Tests for the pre-encoded JSON payloads."""
+
+import json
+
+import pytest
+
+from game.serialization import RawJSON, create_codec, dumps, extend
+from game.song import Song
+from game.user import User
+
+song_70s = Song("Bohemian Rhapsody", "Queen", 1975)
+song_80s = Song("Hier kommt Alex", "Die Toten Hosen", 1988)
+
+
+def test_dumps_embeds_raw_fragments() -> None:
+    payload = {"type": "test", "songs": [RawJSON('{"a":1}'), 2], "nested": {"b": None}}
+
+    assert json.loads(dumps(payload)) == {
+        "type": "test",
+        "songs": [{"a": 1}, 2],
+        "nested": {"b": None},
+    }
+
+
+def test_song_json_matches_serialize() -> None:
+    assert json.loads(song_70s.to_json().text) == song_70s.serialize()
+    assert song_70s.to_json() is song_70s.to_json()
+
+
+def test_user_json_is_invalidated_by_add_song() -> None:
+    user = User("testuser")
+    user.add_song(0, song_80s)
+    cached = user.to_json()
+    assert user.to_json() is cached
+
+    user.add_song(0, song_70s)
+
+    assert user.to_json() is not cached
+    assert json.loads(user.to_json().text) == user.serialize()
+    assert json.loads(user.song_list_json().text) == [
+        song_70s.serialize(),
+        song_80s.serialize(),
+    ]
+
+
+@pytest.mark.parametrize("name", ["json", "orjson"])
+def test_codecs_encode_compactly(name: str) -> None:
+    if name == "orjson":
+        pytest.importorskip("orjson")
+    codec = create_codec(name)
+    payload = {"title": "Hier kommt Alex", "year": 1988, "tags": [None, True, 1.5]}
+
+    assert codec.name == name
+    assert json.loads(codec.dumps(payload)) == payload
+    assert " " not in codec.dumps([1, 2])
+    assert codec.loads('{"a": [1]}') == {"a": [1]}
+
+
+def test_unknown_codec_is_rejected() -> None:
+    with pytest.raises(ValueError, match="Unknown JSON codec"):
+        create_codec("yaml")
+
+
+def test_extend_appends_fields_to_encoded_object() -> None:
+    encoded = dumps({"type": "your_turn", "message": "Guess!"})
+
+    extended = extend(encoded, {"next_player": "a", "song_list": RawJSON("[]")})
+
+    assert json.loads(extended) == {
+        "type": "your_turn",
+        "message": "Guess!",
+        "next_player": "a",
+        "song_list": [],
+    }
+    assert extend(encoded, {}) is encoded
+    assert json.loads(extend("{}", {"a": 1})) == {"a": 1}
@@ -0,0 +1,63 @@
+import pytest
+
+from game.game_logic import GameLogic
+from game.serialization import dumps, loads
+from game.strategies.factory import GameStrategyEnum
+from game.user import User
+from music_service.mock import DummyMusicService
+
+
+def restored(game: GameLogic) -> GameLogic:
+    # snapshots are stored as JSON
+    snapshot = loads(dumps(game.snapshot()))
+    return GameLogic.from_snapshot(snapshot, DummyMusicService())
+
+
+@pytest.mark.asyncio
+async def test_simultaneous_game_is_restored_with_inactive_players():
+    game = GameLogic(target_song_count=3, music_service=DummyMusicService())
+    await game.start_game_async(users=[User("player1"), User("player2")])
+    await game.handle_player_turn_async("player1", 0)
+    await game.handle_player_turn_async("player2", 0)
+    await game.handle_player_turn_async("player2", 1)
+
+    restored_game = restored(game)
+
+    assert restored_game.running is True
+    assert restored_game.round_number == game.round_number
+    assert [user.name for user in restored_game.users] == ["player1", "player2"]
+    assert not any(user.is_active for user in restored_game.users)
+    for user in game.users:
+        restored_user = restored_game.get_user(user.name)
+        assert restored_user.song_list == user.song_list
+        assert restored_user.release_years == user.release_years
+    assert restored_game.delta_log.events == game.delta_log.events
+
+    # player2 already guessed the song of the round, player1 still has to
+    restored_game.activate_user("player1")
+    restored_game.activate_user("player2")
+    restored_game.music_service.playlist_index = game.music_service.playlist_index
+    payload = await restored_game.handle_player_turn_async("player2", 0)
+    assert payload["type"] == "error"
+    payload = await restored_game.handle_player_turn_async("player1", 1)
+    assert payload["result"] == "correct"
+    assert restored_game.strategy.users_already_guessed == set()
+
+
+@pytest.mark.asyncio
+async def test_sequential_game_is_restored_with_the_current_player():
+    game = GameLogic(
+        target_song_count=3,
+        music_service=DummyMusicService(),
+        game_strategy_enum=GameStrategyEnum.SEQUENTIAL,
+    )
+    await game.start_game_async(users=[User("player1"), User("player2")])
+    await game.handle_player_turn_async("player1", 0)
+
+    restored_game = restored(game)
+    restored_game.activate_user("player1")
+    restored_game.activate_user("player2")
+
+    assert restored_game.strategy.current_player_index == 1
+    payload = await restored_game.handle_player_turn_async("player1", 0)
+    assert payload["type"] == "error"
@@ -0,0 +1,66 @@
+"""Tests for the SongCatalog class."""
+
+import gc
+
+from game.song import Song
+from game.song_catalog import SongCatalog
+
+
+def test_intern_returns_shared_instance() -> None:
+    catalog = SongCatalog()
+    first = catalog.intern(Song("Yesterday", "The Beatles", 1965, track_id="t:1"))
+    second = catalog.intern(Song("Yesterday", "The Beatles", 1965, track_id="t:1"))
+
+    assert first is second
+    assert len(catalog) == 1
+
+
+def test_songs_without_track_id_are_keyed_by_metadata() -> None:
+    catalog = SongCatalog()
+    first = catalog.intern(Song("Bad Guy", "Billie Eilish", 2019))
+    second = catalog.intern(Song("Bad Guy", "Billie Eilish", 2019))
+    other = catalog.intern(Song("Bad Guy", "Billie Eilish", 2020))
+
+    assert first is second
+    assert first is not other
+    assert len(catalog) == 2
+
+
+def test_songs_are_hashable() -> None:
+    catalog = SongCatalog()
+    song = catalog.intern(Song("Yesterday", "The Beatles", 1965, track_id="t:1"))
+
+    already_played = {song}
+
+    assert Song("Yesterday", "The Beatles", 1965, track_id="t:1") in already_played
+
+
+def test_interned_songs_are_not_replaced() -> None:
+    catalog = SongCatalog()
+    first = catalog.intern(Song("Bad Guy", "Billie Eilish", 2019, track_id="t:1"))
+    second = catalog.intern(Song("Bad Guy", "Billie Eilish", 2020, track_id="t:1"))
+
+    # the song of a round stays equal to the song of the next poll
+    assert second is first
+
+
+def test_songs_with_unknown_year_are_not_interned() -> None:
+    catalog = SongCatalog()
+    unknown = catalog.intern(Song("Bad Guy", "Billie Eilish", 0, track_id="t:1"))
+    known = catalog.intern(Song("Bad Guy", "Billie Eilish", 2019, track_id="t:1"))
+
+    assert catalog.intern(unknown) is not known
+    assert (
+        catalog.intern(Song("Bad Guy", "Billie Eilish", 2019, track_id="t:1")) is known
+    )
+
+
+def test_songs_no_game_refers_to_are_dropped() -> None:
+    catalog = SongCatalog()
+    song = catalog.intern(Song("Yesterday", "The Beatles", 1965, track_id="t:1"))
+    assert len(catalog) == 1
+
+    del song
+    gc.collect()
+
+    assert len(catalog) == 0
@@ -1,10 +1,12 @@
+import pytest
 from game.user import User
 from music_service.mock import DummyMusicService
 from game.game_logic import GameLogic
 from game.strategies.factory import GameStrategyEnum
 
 
-def test_two_players_sequential_game():
+@pytest.mark.asyncio
+async def test_two_players_sequential_game():
     game = GameLogic(
         target_song_count=2,
         music_service=DummyMusicService(),
@@ -15,40 +17,40 @@ def test_two_players_sequential_game():
     player1 = User("player1")
     player2 = User("player2")
 
-    game.start_game(users=[player1, player2])
+    await game.start_game_async(users=[player1, player2])
     assert game.is_game_over() is False
     assert len(player1.song_list) == 0 
     assert len(player2.song_list) == 0
 
 
     # Player1: Send the first guess
-    game.handle_player_turn(player1.name, 0)
+    await game.handle_player_turn_async(player1.name, 0)
     assert len(player1.song_list) == 1
     assert len(player2.song_list) == 0
     assert game.is_game_over() is False
     
     # Player1: Make another guess --> not his turn
-    game.handle_player_turn(player1.name, 1)
+    await game.handle_player_turn_async(player1.name, 1)
     assert len(player1.song_list) == 1
     assert len(player2.song_list) == 0
     assert game.is_game_over() is False
     
     # Player2: Send his first guess
-    game.handle_player_turn(player2.name, 0)
+    await game.handle_player_turn_async(player2.name, 0)
     assert len(player1.song_list) == 1
     assert len(player2.song_list) == 1
     assert game.is_game_over() is False
 
     
     # Player2: Make another guess --> not his turn
-    game.handle_player_turn(player2.name, 0)
+    await game.handle_player_turn_async(player2.name, 0)
     assert len(player1.song_list) == 1
     assert len(player2.song_list) == 1
     assert game.is_game_over() is False
 
     
     # Player1: Make incorrect guess
-    game.handle_player_turn(player1.name, 0)
+    await game.handle_player_turn_async(player1.name, 0)
     assert len(player1.song_list) == 1
     assert len(player2.song_list) == 1
     assert game.is_game_over() is False
@@ -56,7 +58,7 @@ def test_two_players_sequential_game():
 
     
     # Player2: Make correct guess
-    game.handle_player_turn(player2.name, 1)
+    await game.handle_player_turn_async(player2.name, 1)
     assert len(player1.song_list) == 1
     assert len(player2.song_list) == 2
     assert game.is_game_over() is True
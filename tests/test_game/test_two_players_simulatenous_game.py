@@ -1,10 +1,12 @@
+import pytest
 from game.user import User
 from music_service.mock import DummyMusicService
 from game.game_logic import GameLogic
 from game.strategies.factory import GameStrategyEnum
 
 
-def test_two_players_simulteneous_game():
+@pytest.mark.asyncio
+async def test_two_players_simulteneous_game():
     game = GameLogic(
         target_song_count=3,
         music_service=DummyMusicService(),
@@ -15,25 +17,25 @@ def test_two_players_simulteneous_game():
     player1 = User("player1")
     player2 = User("player2")
 
-    game.start_game(users=[player1, player2])
+    await game.start_game_async(users=[player1, player2])
     assert game.is_game_over() is False
     assert len(player1.song_list) == 0
     assert len(player2.song_list) == 0
 
     # Player1: Send the first guess
-    game.handle_player_turn(player1.name, 0)
+    await game.handle_player_turn_async(player1.name, 0)
     assert len(player1.song_list) == 1
     assert len(player2.song_list) == 0
     assert game.is_game_over() is False
 
     # Player1: Make another guess --> not his turn
-    game.handle_player_turn(player1.name, 1)
+    await game.handle_player_turn_async(player1.name, 1)
     assert len(player1.song_list) == 1
     assert len(player2.song_list) == 0
     assert game.is_game_over() is False
 
     # Player2: Send his first guess
-    game.handle_player_turn(player2.name, 0)
+    await game.handle_player_turn_async(player2.name, 0)
     assert len(player1.song_list) == 1
     assert len(player2.song_list) == 1
     assert game.is_game_over() is False
@@ -41,13 +43,13 @@ def test_two_players_simulteneous_game():
     # new round
 
     # Player2: Make another, correct guess
-    game.handle_player_turn(player2.name, 1)
+    await game.handle_player_turn_async(player2.name, 1)
     assert len(player1.song_list) == 1
     assert len(player2.song_list) == 2
     assert game.is_game_over() is False
 
     # Player1: Make correct guess
-    game.handle_player_turn(player1.name, 1)
+    await game.handle_player_turn_async(player1.name, 1)
     assert len(player1.song_list) == 2
     assert len(player2.song_list) == 2
     assert game.is_game_over() is False
@@ -56,15 +58,44 @@ def test_two_players_simulteneous_game():
     # new round
 
     # Player1: Make wrong guess
-    game.handle_player_turn(player1.name, 0)
+    await game.handle_player_turn_async(player1.name, 0)
     assert len(player1.song_list) == 2
     assert len(player2.song_list) == 2
     assert game.is_game_over() is False
     assert game.winner == None
 
     # Player2: Make correct guess
-    game.handle_player_turn(player2.name, 2)
+    await game.handle_player_turn_async(player2.name, 2)
     assert len(player1.song_list) == 2
     assert len(player2.song_list) == 3
     assert game.is_game_over() is True
     assert game.winner == player2
+
+
+class CountingMusicService(DummyMusicService):
+    def __init__(self):
+        super().__init__()
+        self.current_song_calls = 0
+
+    def current_song(self):
+        self.current_song_calls += 1
+        return super().current_song()
+
+
+@pytest.mark.asyncio
+async def test_current_song_is_fetched_once_per_round():
+    music_service = CountingMusicService()
+    game = GameLogic(
+        target_song_count=3,
+        music_service=music_service,
+        game_strategy_enum=GameStrategyEnum.SIMULTANEOUS,
+    )
+    players = [User("player1"), User("player2"), User("player3")]
+    await game.start_game_async(users=players)
+
+    for player in players:
+        await game.handle_player_turn_async(player.name, 0)
+    assert music_service.current_song_calls == 1
+
+    await game.handle_player_turn_async("player1", 1)
+    assert music_service.current_song_calls == 2
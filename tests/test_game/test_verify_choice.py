@@ -91,3 +91,36 @@ def test_verify_choice(
     result = GameLogic.verify_choice(song_list, index, selected_song)
 
     assert result == expected_result
+
+
+@pytest.mark.parametrize("index", [-1, 3])
+def test_verify_choice_index_out_of_range(index: int) -> None:
+    """Indices outside of the song list are never correct."""
+    assert GameLogic.verify_choice([song_70s, song_90s], index, song_80s) is False
+
+
+@pytest.mark.parametrize(
+    ("songs", "selected_song", "expected_range"),
+    [
+        ([], song_80s, range(0, 1)),
+        ([song_70s, song_90s], song_80s, range(1, 2)),
+        ([song_80s, song_90s], song_70s, range(0, 1)),
+        ([song_70s, song_80s], song_90s, range(2, 3)),
+        ([song_70s, song_80s, song_80s, song_90s], song_80s, range(1, 4)),
+    ],
+)
+def test_valid_insertion_range(
+    songs: list[Song], selected_song: Song, expected_range: range
+) -> None:
+    """Test that the insertion range covers exactly the correct indices."""
+    user = User("testuser")
+    for index, song in enumerate(songs):
+        user.add_song(index, song)
+
+    result = GameLogic.valid_insertion_range(user, selected_song)
+
+    assert result == expected_range
+    for index in range(len(songs) + 1):
+        assert (index in result) == GameLogic.verify_choice(
+            user.song_list, index, selected_song
+        )
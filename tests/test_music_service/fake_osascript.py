@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Fake osascript, which emulates the Music app for tests and benchmarks on Linux.
+
+Supports one-shot scripts (``osascript -e <script>``) and the co-process mode of the
+Apple Music adapter (``osascript -l JavaScript -e <runner>``). The player state is
+kept in the JSON file given by FAKE_OSASCRIPT_STATE, so it survives across
+processes. FAKE_OSASCRIPT_STARTUP_DELAY (seconds) emulates the process startup
+time of the real osascript.
+"""
+
+import json
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+SEPARATOR = "TrackBackSeparator"
+LINE_SEPARATOR = "TrackBackLineSeparator"
+
+PLAYLIST = [
+    ("Yesterday", "The Beatles", "1965"),
+    ("Bohemian Rhapsody", "Queen", "1975"),
+    ("Smells Like Teen Spirit", "Nirvana", "1991"),
+    ("Rolling in the Deep", "Adele", "2010"),
+    ("Bad Guy", "Billie Eilish", ""),
+]
+
+STATE_PATH = Path(os.getenv("FAKE_OSASCRIPT_STATE", "/tmp/fake_osascript.json"))  # noqa: S108
+
+
+def load_state() -> dict:
+    if STATE_PATH.exists():
+        return json.loads(STATE_PATH.read_text())
+    return {"playing": False, "index": 0, "spawns": 0, "scripts": 0}
+
+
+def save_state(state: dict) -> None:
+    STATE_PATH.write_text(json.dumps(state))
+
+
+def track(index: int) -> str:
+    title, artist, year = PLAYLIST[index % len(PLAYLIST)]
+    return SEPARATOR.join([title, artist, year, f"ID{index % len(PLAYLIST):04d}"])
+
+
+def run_script(script: str) -> str:
+    state = load_state()
+    state["scripts"] += 1
+    result = ""
+    if delay := re.search(r"^\s*delay (\d+)\s*$", script, re.MULTILINE):
+        time.sleep(int(delay.group(1)))
+    elif "name of processes" in script:
+        result = "true"
+    elif "repeat with" in script:
+        count = int(re.search(r"to \(currentIndex \+ (\d+)\)", script).group(1))
+        last = min(state["index"] + count, len(PLAYLIST) - 1)
+        result = "".join(
+            track(index) + LINE_SEPARATOR
+            for index in range(state["index"] + 1, last + 1)
+        )
+    elif "persistent ID of current track" in script:
+        if "then play" in script:
+            state["playing"] = True
+        result = (
+            track(state["index"])
+            if state["playing"]
+            else "No song is currently playing"
+        )
+    elif "next track" in script:
+        state["index"] = (state["index"] + 1) % len(PLAYLIST)
+    elif "player state is playing" in script:
+        result = str(state["playing"]).lower()
+    elif re.search(r"^\s*play\s*$", script, re.MULTILINE):
+        state["playing"] = True
+    save_state(state)
+    return result
+
+
+def serve() -> None:
+    for line in sys.stdin:
+        reply = {"ok": True, "result": run_script(json.loads(line))}
+        sys.stdout.write(json.dumps(reply) + "\n")
+        sys.stdout.flush()
+
+
+def main() -> None:
+    time.sleep(float(os.getenv("FAKE_OSASCRIPT_STARTUP_DELAY", "0")))
+    state = load_state()
+    state["spawns"] += 1
+    save_state(state)
+
+    args = sys.argv[1:]
+    if args[:2] == ["-l", "JavaScript"]:
+        serve()
+    else:
+        print(run_script(args[args.index("-e") + 1]))
+
+
+if __name__ == "__main__":
+    main()
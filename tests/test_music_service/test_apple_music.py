@@ -12,7 +12,8 @@ from music_service.apple_music import AppleMusicAdapter
     not AppleMusicAdapter.music_app_is_running(),
     reason="Apple Music is not running",
 )
-def test_full_game_one_round() -> None:
+@pytest.mark.asyncio
+async def test_full_game_one_round() -> None:
     """Test a full game with one round."""
     user_1 = User("Elton")
     user_2 = User("John")
@@ -22,10 +23,10 @@ def test_full_game_one_round() -> None:
         target_song_count=1,
         music_service=music_service,
     )
-    game.start_game(users=[user_1, user_2])
+    await game.start_game_async(users=[user_1, user_2])
     # Simulate one user input: "0" to insert at start
 
-    game.handle_player_turn("Elton", 0)
+    await game.handle_player_turn_async("Elton", 0)
 
     assert game.is_game_over() == True
 
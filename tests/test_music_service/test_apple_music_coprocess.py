@@ -0,0 +1,151 @@
+"""Tests for the Apple Music adapter against a fake osascript (runs on Linux)."""
+
+import json
+import threading
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from game.song_catalog import SongCatalog
+from music_service import apple_music
+from music_service.apple_music import AppleMusicAdapter
+from music_service.error import MusicServiceError
+from music_service.metadata_cache import MetadataCache, song_key
+
+FAKE_OSASCRIPT = Path(__file__).parent / "fake_osascript.py"
+
+
+@pytest.fixture
+def state_path(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Run the scripts with the fake osascript and return the path of its state."""
+    path = tmp_path / "state.json"
+    monkeypatch.setenv("FAKE_OSASCRIPT_STATE", str(path))
+    monkeypatch.setattr(apple_music, "OSA_SCRIPT_PATH", str(FAKE_OSASCRIPT))
+    monkeypatch.setattr(apple_music, "metadata_cache", MetadataCache())
+    monkeypatch.setattr(apple_music, "song_catalog", SongCatalog())
+    monkeypatch.setattr(
+        AppleMusicAdapter, "running_on_macos", staticmethod(lambda: True)
+    )
+    return path
+
+
+@pytest.fixture
+def adapter(state_path: Path) -> Iterator[AppleMusicAdapter]:  # noqa: ARG001
+    """Return an adapter, which is closed after the test."""
+    adapter = AppleMusicAdapter()
+    yield adapter
+    adapter.close()
+
+
+def test_scripts_run_in_one_coprocess(
+    adapter: AppleMusicAdapter, state_path: Path
+) -> None:
+    """All scripts of an adapter run in the same osascript process."""
+    song = adapter.current_song()
+    assert song.title == "Yesterday"
+    assert song.release_year == 1965
+    assert song.track_id == "applemusic:ID0000"
+
+    adapter.next_track()
+    assert adapter.current_song().title == "Bohemian Rhapsody"
+
+    # one process to check the music app, one co-process for all scripts
+    assert json.loads(state_path.read_text())["spawns"] == 2
+
+
+def test_current_song_starts_playback_in_the_same_script(
+    adapter: AppleMusicAdapter, state_path: Path
+) -> None:
+    """Starting the playback and reading the song take one script."""
+    adapter.current_song()
+
+    state = json.loads(state_path.read_text())
+    assert state["playing"] is True
+    assert state["scripts"] == 2
+
+
+def test_upcoming_songs_and_missing_year(adapter: AppleMusicAdapter) -> None:
+    """The queue stops at the end of the playlist, a missing year is 0."""
+    upcoming = adapter.upcoming_songs(10)
+
+    assert [song.title for song in upcoming] == [
+        "Bohemian Rhapsody",
+        "Smells Like Teen Spirit",
+        "Rolling in the Deep",
+        "Bad Guy",
+    ]
+    assert upcoming[-1].release_year == 0
+
+
+def test_coprocess_is_restarted_after_close(
+    adapter: AppleMusicAdapter, state_path: Path
+) -> None:
+    """A closed adapter starts a new co-process for the next script."""
+    adapter.current_song()
+    adapter.close()
+    adapter.next_track()
+
+    assert json.loads(state_path.read_text())["spawns"] == 3
+
+
+def test_missing_year_is_taken_from_the_metadata_cache(
+    adapter: AppleMusicAdapter,
+) -> None:
+    """Tracks without a year get the cached year of the same song."""
+    apple_music.metadata_cache.put_year([song_key("Billie Eilish", "Bad Guy")], 2019)
+
+    assert adapter.upcoming_songs(10)[-1].release_year == 2019
+
+
+def test_hanging_script_times_out_and_restarts_the_coprocess(
+    adapter: AppleMusicAdapter, state_path: Path
+) -> None:
+    """A script running past the timeout fails, the next one gets a new co-process."""
+    adapter.script_runner.timeout = 0.5
+    started_at = time.monotonic()
+    with pytest.raises(MusicServiceError, match="did not finish"):
+        adapter.script_runner.run("delay 60")
+    assert time.monotonic() - started_at < 5
+
+    assert adapter.current_song().title == "Yesterday"
+    assert json.loads(state_path.read_text())["spawns"] == 3
+
+
+def test_close_aborts_a_running_script(adapter: AppleMusicAdapter) -> None:
+    """Closing the adapter fails the script that is running."""
+    errors = []
+
+    def run() -> None:
+        """Run a script that never finishes."""
+        try:
+            adapter.script_runner.run("delay 60")
+        except MusicServiceError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    time.sleep(0.5)  # the script is running
+    adapter.close()
+    thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert len(errors) == 1
+
+
+def test_known_years_are_stored_once(
+    adapter: AppleMusicAdapter, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """The year of a song is written to the metadata cache only once."""
+    cache = apple_music.metadata_cache
+    puts = []
+    put_year = cache.put_year
+    monkeypatch.setattr(
+        cache, "put_year", lambda keys, year: puts.append(year) or put_year(keys, year)
+    )
+
+    adapter.current_song()
+    adapter.current_song()
+
+    assert puts == [1965]
@@ -0,0 +1,69 @@
+"""Tests for the executor-backed async music service adapter."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from music_service.async_adapter import ExecutorMusicServiceAdapter, as_async_adapter
+from music_service.mock import DummyMusicService
+
+
+class SlowMusicService(DummyMusicService):
+    """Mock music service whose calls block like a slow network round trip."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls_in_flight = 0
+        self.max_calls_in_flight = 0
+        self._lock = threading.Lock()
+
+    def next_track(self) -> None:
+        with self._lock:
+            self.calls_in_flight += 1
+            self.max_calls_in_flight = max(
+                self.max_calls_in_flight, self.calls_in_flight
+            )
+        time.sleep(0.05)
+        with self._lock:
+            self.calls_in_flight -= 1
+        super().next_track()
+
+
+def test_sync_adapters_are_wrapped() -> None:
+    adapter = as_async_adapter(DummyMusicService())
+
+    assert isinstance(adapter, ExecutorMusicServiceAdapter)
+    assert as_async_adapter(adapter) is adapter
+
+
+@pytest.mark.asyncio
+async def test_calls_are_serialized_per_adapter_but_not_across_adapters() -> None:
+    slow_service = SlowMusicService()
+    other_service = SlowMusicService()
+    adapter = as_async_adapter(slow_service)
+    other_adapter = as_async_adapter(other_service)
+
+    ticks = 0
+
+    async def ticker() -> None:
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.005)
+
+    ticker_task = asyncio.create_task(ticker())
+    await asyncio.gather(
+        adapter.next_track(),
+        adapter.next_track(),
+        other_adapter.next_track(),
+        other_adapter.next_track(),
+    )
+    ticker_task.cancel()
+
+    assert slow_service.playlist_index == 2
+    assert slow_service.max_calls_in_flight == 1
+    assert other_service.max_calls_in_flight == 1
+    # the event loop kept running while the services were blocking
+    assert ticks > 5
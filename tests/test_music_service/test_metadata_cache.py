@@ -0,0 +1,42 @@
+"""Tests for the MetadataCache class."""
+
+from music_service.metadata_cache import MetadataCache, song_key
+
+
+def test_years_survive_a_restart_through_sqlite(tmp_path) -> None:
+    path = tmp_path / "metadata.sqlite3"
+    cache = MetadataCache(path, flush_batch_size=2)
+
+    cache.put_year(["spotify:track:1", song_key("Queen", "Bohemian Rhapsody")], 1975)
+    assert path.exists()  # the batch of two keys was written
+    cache.put_year(["spotify:track:2"], 1991)
+    cache.close()
+
+    restarted = MetadataCache(path)
+    assert (
+        restarted.get_year(["applemusic:X", song_key(" queen", "BOHEMIAN RHAPSODY")])
+        == 1975
+    )
+    assert restarted.get_year(["spotify:track:2"]) == 1991
+    assert restarted.get_year(["spotify:track:3"]) is None
+    assert restarted.stats()["hits"] == 2
+    assert restarted.stats()["misses"] == 1
+
+
+def test_least_recently_used_years_are_evicted() -> None:
+    cache = MetadataCache(max_entries=2)
+    cache.put_year(["a"], 2001)
+    cache.put_year(["b"], 2002)
+    cache.get_year(["a"])
+    cache.put_year(["c"], 2003)
+
+    assert cache.get_year(["b"]) is None
+    assert cache.get_year(["a"]) == 2001
+    assert cache.get_year(["c"]) == 2003
+
+
+def test_unknown_years_are_not_cached() -> None:
+    cache = MetadataCache()
+    cache.put_year(["applemusic:X"], 0)
+
+    assert cache.get_year(["applemusic:X"]) is None
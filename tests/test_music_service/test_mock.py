@@ -0,0 +1,82 @@
+"""Tests for the configurable mock music service."""
+
+import random
+import statistics
+import time
+
+import pytest
+
+from game.game_logic import GameLogic
+from game.user import User
+from music_service.error import MusicServiceError
+from music_service.factory import MusicServiceFactory
+from music_service.mock import DummyMusicService, Latency, synthetic_playlist
+
+
+def test_default_playlist_is_unchanged() -> None:
+    service = MusicServiceFactory.create_music_service("mock")
+
+    assert isinstance(service, DummyMusicService)
+    assert [song.release_year for song in service.playlist] == [
+        1965,
+        1975,
+        1991,
+        2010,
+        2019,
+        2021,
+    ]
+
+
+def test_synthetic_playlist_is_seeded() -> None:
+    playlist = synthetic_playlist(1000, seed=7)
+
+    assert playlist == synthetic_playlist(1000, seed=7)
+    assert playlist != synthetic_playlist(1000, seed=8)
+    years = [song.release_year for song in playlist]
+    assert min(years) >= 1950
+    assert max(years) <= 2024
+    # more recent songs than oldies, like in real playlists
+    assert statistics.median(years) > 1990
+
+
+def test_latency_follows_the_percentiles() -> None:
+    rng = random.Random(0)
+    samples = sorted(Latency(p50_ms=50, p99_ms=500).sample(rng) for _ in range(5000))
+
+    assert samples[2500] == pytest.approx(0.05, rel=0.1)
+    assert samples[4950] == pytest.approx(0.5, rel=0.25)
+
+
+def test_options_inject_latency_and_errors() -> None:
+    service = MusicServiceFactory.create_music_service(
+        "mock",
+        {
+            "song_count": 50,
+            "seed": 1,
+            "latency": {"current_song": {"p50_ms": 20, "p99_ms": 20}},
+            "error_rate": 1.0,
+        },
+    )
+
+    start = time.monotonic()
+    with pytest.raises(MusicServiceError):
+        service.current_song()
+    assert time.monotonic() - start >= 0.015
+
+
+def test_invalid_options_are_rejected() -> None:
+    with pytest.raises(ValueError, match="Invalid mock"):
+        MusicServiceFactory.create_music_service("mock", {"songs": 10})
+
+
+@pytest.mark.asyncio
+async def test_failing_music_service_lets_the_player_guess_again() -> None:
+    game = GameLogic(
+        target_song_count=3, music_service=DummyMusicService(error_rate=1.0)
+    )
+    game._start([User("player")])  # noqa: SLF001 - start_playback fails as well
+
+    payload = await game.handle_player_turn_async("player", 0)
+
+    assert payload["type"] == "error"
+    assert game.get_user("player").song_list == []
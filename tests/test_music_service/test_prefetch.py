@@ -0,0 +1,91 @@
+"""Tests for the TrackPrefetcher class."""
+
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import pytest
+
+from game.game_logic import GameLogic
+from game.song import Song
+from game.user import User
+from music_service.mock import DummyMusicService
+from music_service.prefetch import TrackPrefetcher
+from server.now_playing import NowPlayingWatcher
+
+
+@pytest.mark.asyncio
+async def test_round_transition_is_served_from_prefetched_songs() -> None:
+    music_service = DummyMusicService()
+    game = GameLogic(target_song_count=5, music_service=music_service)
+    game.prefetcher = TrackPrefetcher(lookahead=2)
+    await game.start_game_async([User("player1")])
+    # the watcher fills the prefetcher with the upcoming songs of the queue
+    await NowPlayingWatcher(game, _collect([])).poll()
+
+    await game.next_track_async()
+    # a poll of the music service confirms the predicted song
+    changed = game.observe_current_song(music_service.current_song(), game.round_number)
+    assert changed is False
+    assert game.prefetcher.hits == 1
+    assert game.prefetcher.hit_rate == 1.0
+    assert await game.current_round_song_async() == music_service.playlist[1]
+
+
+@pytest.mark.asyncio
+async def test_misprediction_is_corrected_before_the_first_guess() -> None:
+    music_service = DummyMusicService()
+    game = GameLogic(target_song_count=5, music_service=music_service)
+    game.prefetcher = TrackPrefetcher(lookahead=2)
+    await game.start_game_async([User("player1")])
+    await NowPlayingWatcher(game, _collect([])).poll()
+
+    music_service.next_track()  # the queue changes outside of the game
+    await game.next_track_async()
+    # no poll confirmed the prediction, so the guess asks the music service
+    await game.handle_player_turn_async("player1", 0)
+
+    assert game.users[0].song_list[0] == music_service.playlist[2]
+    assert game.prefetcher.misses == 1
+    assert game.prefetcher.needs_refill()
+
+
+@pytest.mark.asyncio
+async def test_upcoming_songs_fetched_before_a_skip_are_dropped() -> None:
+    music_service = DummyMusicService()
+    game = GameLogic(target_song_count=5, music_service=music_service)
+    game.prefetcher = TrackPrefetcher(lookahead=2)
+    await game.start_game_async([User("player1")])
+    upcoming_songs = game.async_music_service.upcoming_songs
+    messages: list[dict[str, Any]] = []
+
+    async def skip_while_fetching(count: int) -> list[Song]:
+        songs = await upcoming_songs(count)
+        await game.next_track_async()
+        return songs
+
+    game.async_music_service.upcoming_songs = skip_while_fetching  # type: ignore[method-assign]
+    await NowPlayingWatcher(game, _collect(messages)).poll()
+
+    # the songs were fetched for the previous round and start with the current one
+    assert game.prefetcher.needs_refill()
+    assert messages == []
+
+
+def _collect(
+    messages: list[dict[str, Any]],
+) -> Callable[[dict[str, Any]], Awaitable[None]]:
+    async def broadcast(message: dict[str, Any]) -> None:
+        messages.append(message)
+
+    return broadcast
+
+
+def test_upcoming_songs_of_mock_wrap_around() -> None:
+    music_service = DummyMusicService()
+    music_service.playlist_index = 4
+
+    assert music_service.upcoming_songs(3) == [
+        music_service.playlist[5],
+        music_service.playlist[0],
+        music_service.playlist[1],
+    ]
@@ -0,0 +1,250 @@
+"""Tests for the track preload of the SpotifyAdapter."""
+
+import asyncio
+import json
+import threading
+import time
+from typing import Any
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from music_service import error, spotify
+from music_service.factory import MusicServiceError, MusicServiceFactory
+from music_service.metadata_cache import MetadataCache
+from music_service.spotify import SpotifyAdapter
+from music_service.spotify_scheduler import Priority
+from server.game_sessions import GameSession, GameSessionManager
+from server.session_store import InMemorySessionStore
+
+
+def track(number: int, release_date: str = "1999-01-01") -> dict[str, Any]:
+    """Return a playlist item of the Spotify API for the track."""
+    return {
+        "uri": f"spotify:track:{number}",
+        "type": "track",
+        "name": f"Song {number}",
+        "artists": [{"name": "Artist"}],
+        "album": {"release_date": release_date, "images": [{"url": "cover.jpg"}]},
+    }
+
+
+class FakeSpotify:
+    """Answers the Spotify API calls of the adapter with a two page playlist."""
+
+    def __init__(self) -> None:
+        self.pages = [
+            {"items": [{"track": track(1)}, {"track": None}], "next": "page-2"},
+            {"items": [{"track": track(2, "2005")}], "next": None},
+        ]
+        self.parsed_playbacks = 0
+
+    def current_playback(self) -> dict[str, Any]:
+        """Play a playlist."""
+        return {"context": {"type": "playlist", "uri": "spotify:playlist:x"}}
+
+    def playlist_items(self, playlist_uri: str, **_: Any) -> dict[str, Any]:  # noqa: ANN401
+        """Return the first page of the playlist."""
+        assert playlist_uri == "spotify:playlist:x"
+        return self.pages[0]
+
+    def next(self, page: dict[str, Any]) -> dict[str, Any]:
+        """Return the second page of the playlist."""
+        assert page["next"] == "page-2"
+        return self.pages[1]
+
+    def currently_playing(self) -> dict[str, Any]:
+        """Play the second track."""
+        # Preloaded songs are looked up by their URI, the rest of it is ignored.
+        return {
+            "is_playing": True,
+            "progress_ms": 1000,
+            "item": {"uri": "spotify:track:2", "duration_ms": 180000},
+        }
+
+
+@pytest.fixture(autouse=True)
+def metadata_cache(monkeypatch: pytest.MonkeyPatch) -> MetadataCache:
+    """Give every test an empty metadata cache."""
+    cache = MetadataCache()
+    monkeypatch.setattr(spotify, "metadata_cache", cache)
+    return cache
+
+
+def test_songs_are_preloaded_and_looked_up_by_uri(
+    metadata_cache: MetadataCache,
+) -> None:
+    """The tracks of the playlist are loaded once and then served by their URI."""
+    adapter = SpotifyAdapter(session_id="preload")
+    adapter.session = FakeSpotify()  # type: ignore[assignment]
+
+    adapter.preload_tracks()
+
+    assert set(adapter.tracks) == {"spotify:track:1", "spotify:track:2"}
+    state = adapter.playback_state()
+    assert state.song is adapter.tracks["spotify:track:2"]
+    assert state.song.release_year == 2005
+    assert state.song.album_cover_url == "cover.jpg"
+    assert state.remaining_ms == 179000
+    assert adapter.stats()["api_usage"]["requests"] == 4
+    assert metadata_cache.stats()["misses"] == 2
+
+
+EPISODE = {"uri": "spotify:episode:1", "type": "episode", "name": "Podcast"}
+
+
+class FakeQueue:
+    """Plays an episode, with tracks and episodes in the queue."""
+
+    def currently_playing(self) -> dict[str, Any]:
+        """Play a podcast episode."""
+        return {"is_playing": True, "item": EPISODE}
+
+    def queue(self) -> dict[str, Any]:
+        """Return two tracks, a local file and an episode."""
+        local_file = track(4) | {"album": {"release_date": None, "images": []}}
+        return {"queue": [track(3), local_file, EPISODE, track(5)]}
+
+
+def test_items_without_a_song_are_not_played() -> None:
+    """Episodes and local files neither start a round nor are predicted."""
+    adapter = SpotifyAdapter(session_id="episodes")
+    adapter.session = FakeQueue()  # type: ignore[assignment]
+
+    with pytest.raises(error.MusicServiceError, match="episode"):
+        adapter.playback_state()
+    # the predictions stop at the first item without a song
+    assert [song.title for song in adapter.upcoming_songs(4)] == ["Song 3"]
+
+
+class FakeHTTPSession:
+    """Records whether the connections of the client were closed."""
+
+    def __init__(self) -> None:
+        self.closed = False
+
+    def close(self) -> None:
+        """Close the connections."""
+        self.closed = True
+
+
+def test_connections_are_closed_after_the_calls_in_flight() -> None:
+    """Closing the adapter waits for the running API call."""
+    adapter = SpotifyAdapter(session_id="close")
+    client = FakeSpotify()
+    client._session = FakeHTTPSession()  # type: ignore[attr-defined]
+    adapter.session = client  # type: ignore[assignment]
+    calling, closed = threading.Event(), threading.Event()
+
+    def slow_call() -> None:
+        """Block until the adapter was closed."""
+        calling.set()
+        closed.wait(5)
+
+    thread = threading.Thread(target=adapter._call, args=(slow_call, Priority.NORMAL))
+    thread.start()
+    calling.wait(5)
+    adapter.close()
+    assert not client._session.closed
+    closed.set()
+    thread.join(5)
+
+    assert client._session.closed
+    assert adapter.session is None
+
+
+class FakeOAuth:
+    """Hands out a new access token for the refresh token."""
+
+    def __init__(self) -> None:
+        self.refreshed: list[str] = []
+
+    def refresh_access_token(self, refresh_token: str) -> dict[str, Any]:
+        """Return a token valid for an hour."""
+        self.refreshed.append(refresh_token)
+        return {"access_token": "new-token", "expires_at": time.time() + 3600}
+
+
+def test_access_token_is_refreshed_before_it_expires(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """A token close to its expiry is refreshed once, and snapshots keep the new one."""
+    oauth = FakeOAuth()
+    monkeypatch.setattr(spotify, "get_spotify_oauth", lambda: oauth)
+    adapter = SpotifyAdapter(session_id="refresh")
+    adapter.authenticate("old-token", "refresh-token", time.time() + 30)
+
+    adapter._client()
+    adapter._client()
+
+    assert oauth.refreshed == ["refresh-token"]
+    snapshot = adapter.snapshot()
+    assert snapshot is not None
+    assert snapshot["access_token"] == "new-token"  # noqa: S105
+    assert snapshot["refresh_token"] == "refresh-token"  # noqa: S105
+
+
+def test_sessions_with_an_expired_token_are_not_restored() -> None:
+    """Only sessions that can refresh their expired token are restored."""
+    snapshot = {
+        "provider": "spotify",
+        "session_id": "expired",
+        "access_token": "old-token",
+        "refresh_token": None,
+        "expires_at": time.time() - 1,
+    }
+
+    with pytest.raises(MusicServiceError, match="expired"):
+        MusicServiceFactory.restore_music_service(snapshot)
+
+    snapshot["refresh_token"] = "refresh-token"  # noqa: S105
+    assert MusicServiceFactory.restore_music_service(snapshot).snapshot() == snapshot
+
+
+class FakeLoginOAuth:
+    """Exchanges the code of the callback for tokens."""
+
+    def get_access_token(self, code: str) -> dict[str, Any]:
+        """Return a token that does not expire."""
+        assert code == "code"
+        return {"access_token": "token", "refresh_token": None, "expires_at": None}
+
+
+class FakeLoginSpotify(FakeSpotify):
+    """Knows the user who logged in."""
+
+    def current_user(self) -> dict[str, Any]:
+        """Return the profile of the host."""
+        return {"id": "host"}
+
+
+def test_callback_adds_the_session_on_the_event_loop(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """The expiry wheel and the lobby are not changed from a worker thread."""
+    sessions = GameSessionManager(InMemorySessionStore(), "worker")
+    loops = []
+    schedule_expiry = sessions.schedule_expiry
+
+    def record_loop(session: GameSession) -> None:
+        """Record the loop the session is added on."""
+        loops.append(asyncio.get_running_loop())
+        schedule_expiry(session)
+
+    monkeypatch.setattr(sessions, "schedule_expiry", record_loop)
+    monkeypatch.setattr(spotify, "game_session_manager", sessions)
+    monkeypatch.setattr(spotify, "get_spotify_oauth", FakeLoginOAuth)
+    monkeypatch.setattr(spotify, "create_spotify_client", lambda _: FakeLoginSpotify())
+    app = FastAPI()
+    app.include_router(spotify.router)
+
+    state = json.dumps({"game_id": "login", "target_song_count": 3})
+    with TestClient(app) as client:
+        response = client.get(
+            "/spotify-callback", params={"code": "code", "state": state}
+        )
+
+    assert response.status_code == 200
+    assert len(loops) == 1
+    assert sessions.lobby.query() == ["login"]
@@ -0,0 +1,55 @@
+"""Tests for the SpotifyRequestScheduler class."""
+
+import threading
+import time
+
+import pytest
+from spotipy.exceptions import SpotifyException
+
+from music_service.error import MusicServiceError
+from music_service.spotify_scheduler import Priority, SpotifyRequestScheduler
+
+
+def test_critical_calls_overtake_cosmetic_calls() -> None:
+    scheduler = SpotifyRequestScheduler(rate=20, burst=1)
+    scheduler.call(lambda: None)  # empty the bucket
+    order: list[str] = []
+
+    def call(name: str, priority: Priority) -> None:
+        scheduler.call(order.append, name, priority=priority)
+
+    cosmetic = threading.Thread(target=call, args=("queue", Priority.COSMETIC))
+    cosmetic.start()
+    time.sleep(0.01)
+    critical = threading.Thread(target=call, args=("playback", Priority.CRITICAL))
+    critical.start()
+    cosmetic.join()
+    critical.join()
+
+    assert order == ["playback", "queue"]
+
+
+def test_rate_limited_calls_are_retried_after_retry_after() -> None:
+    scheduler = SpotifyRequestScheduler()
+    responses = [SpotifyException(429, -1, "", headers={"Retry-After": "0.1"})]
+
+    def current_playback() -> str:
+        if responses:
+            raise responses.pop()
+        return "playback"
+
+    start = time.monotonic()
+    assert scheduler.call(current_playback, session_id="game") == "playback"
+
+    assert time.monotonic() - start >= 0.1
+    assert scheduler.usage_of("game") == {"requests": 2, "throttled": 1, "shed": 0}
+
+
+def test_cosmetic_calls_are_shed_when_waiting_too_long() -> None:
+    scheduler = SpotifyRequestScheduler(rate=0.5, burst=1, cosmetic_max_wait=0.05)
+    scheduler.call(lambda: None, session_id="game")
+
+    with pytest.raises(MusicServiceError):
+        scheduler.call(lambda: None, priority=Priority.COSMETIC, session_id="game")
+
+    assert scheduler.usage_of("game") == {"requests": 1, "throttled": 0, "shed": 1}
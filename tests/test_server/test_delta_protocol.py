@@ -0,0 +1,75 @@
+"""Tests for the delta protocol, which sends song insertions instead of lists."""
+
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from server.server import Server
+
+
+@pytest.fixture
+def client() -> TestClient:
+    """Fixture to create a fresh TestClient instance."""
+    server = Server()
+    return TestClient(server.app)
+
+
+def test_delta_protocol(client: TestClient) -> None:
+    game_id = "session-test-delta-protocol"
+    client.post(
+        "/create",
+        json={"game_id": game_id, "target_song_count": 3, "music_service_type": "mock"},
+    )
+    client.post("/join", json={"game_id": game_id, "user_name": "testuser1"})
+    client.post("/join", json={"game_id": game_id, "user_name": "testuser2"})
+
+    with (
+        client.websocket_connect(f"/ws/{game_id}/testuser1?protocol=2") as ws1,
+        client.websocket_connect(f"/ws/{game_id}/testuser2") as ws2,
+    ):
+        assert json.loads(ws1.receive_text())["type"] == "welcome"
+        assert json.loads(ws2.receive_text())["type"] == "welcome"
+
+        client.post("/start", json={"game_id": game_id})
+
+        # delta clients don't get their song list resent
+        response = json.loads(ws1.receive_text())
+        assert response["type"] == "your_turn"
+        assert "song_list" not in response
+        response = json.loads(ws2.receive_text())
+        assert response["type"] == "your_turn"
+        assert response["song_list"] == []
+
+        ws1.send_json({"type": "guess", "index": 0})
+        response = json.loads(ws1.receive_text())
+        assert response["type"] == "guess_result"
+        assert response["result"] == "correct"
+        assert "song_list" not in response
+        assert "other_players" not in response
+        assert response["last_song_id"] == 0
+        assert response["events"] == [["testuser1", 0, 0]]
+        assert response["songs"]["0"]["title"] == "Yesterday"
+
+        assert json.loads(ws2.receive_text())["type"] == "other_player_guess"
+        ws2.send_json({"type": "guess", "index": 0})
+        response = json.loads(ws2.receive_text())
+        assert response["type"] == "guess_result"
+        assert len(response["song_list"]) == 1
+
+        assert json.loads(ws1.receive_text())["type"] == "other_player_guess"
+        assert json.loads(ws1.receive_text())["type"] == "your_turn"
+        assert json.loads(ws2.receive_text())["type"] == "your_turn"
+
+        # only the insertions since the last update and unknown songs are sent
+        ws1.send_json({"type": "guess", "index": 1})
+        response = json.loads(ws1.receive_text())
+        assert response["result"] == "correct"
+        assert response["events"] == [["testuser2", 0, 0], ["testuser1", 1, 1]]
+        assert list(response["songs"]) == ["1"]
+
+        ws1.send_json({"type": "resync"})
+        response = json.loads(ws1.receive_text())
+        assert response["type"] == "sync"
+        assert response["players"] == {"testuser1": [0, 1], "testuser2": [0]}
+        assert sorted(response["songs"]) == ["0", "1"]
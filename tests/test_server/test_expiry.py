@@ -0,0 +1,148 @@
+"""Tests for the timer wheel and the expiry of idle game sessions."""
+
+import random
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from game.game_logic import GameLogic
+from music_service.mock import DummyMusicService
+from server.game_sessions import GameSession, GameSessionManager
+from server.server import Server
+from server.session_store import InMemorySessionStore
+from server.timer_wheel import TimerWheel
+
+
+def test_timer_wheel_expires_keys_at_their_deadline() -> None:
+    wheel = TimerWheel(tick=1.0, slots=4, levels=2, start=0.0)
+    wheel.schedule("soon", 2.5)
+    wheel.schedule("later", 10.0)
+    wheel.schedule("far", 100.0)  # beyond the range of both levels
+    wheel.schedule("cancelled", 3.0)
+    wheel.cancel("cancelled")
+
+    assert wheel.advance(2.0) == []
+    assert wheel.advance(3.0) == ["soon"]
+    assert wheel.advance(9.9) == []
+    assert wheel.advance(10.0) == ["later"]
+    assert wheel.advance(99.0) == []
+    assert wheel.advance(100.0) == ["far"]
+    assert len(wheel) == 0
+
+
+def test_timer_wheel_matches_sorted_deadlines() -> None:
+    rng = random.Random(7)  # noqa: S311
+    wheel = TimerWheel(tick=1.0, slots=8, levels=3, start=0.0)
+    deadlines = {key: rng.uniform(0, 2000) for key in range(500)}
+    for key, deadline in deadlines.items():
+        wheel.schedule(key, deadline)
+    for key in range(0, 500, 5):
+        wheel.schedule(key, deadlines[key] + 50)
+        deadlines[key] += 50
+
+    now = 0.0
+    while now < 2100:
+        now += rng.uniform(0, 30)
+        expired = wheel.advance(now)
+        assert sorted(expired) == sorted(
+            key for key, deadline in deadlines.items() if deadline <= int(now)
+        )
+        for key in expired:
+            del deadlines[key]
+    assert not deadlines
+
+
+def test_timer_wheel_needs_a_level_to_cascade_from() -> None:
+    with pytest.raises(ValueError, match="at least 2 levels"):
+        TimerWheel(levels=1)
+
+
+def manager() -> GameSessionManager:
+    return GameSessionManager(
+        InMemorySessionStore(), "worker", idle_ttl=100.0, empty_ttl=10.0
+    )
+
+
+@pytest.mark.asyncio
+async def test_sessions_expire_after_their_last_event() -> None:
+    sessions = manager()
+    sessions.add_game("game-1", GameLogic(2, DummyMusicService()))
+    sessions.add_game("game-2", GameLogic(2, DummyMusicService()))
+    session = sessions.get_game_session("game-2")
+    now = time.monotonic()
+
+    assert sessions.expired_sessions(now + 5) == []
+    await session.actor.submit("join", _no_event)
+    session.actor.last_event_at = now + 8  # as if the event came later
+    expired = sessions.expired_sessions(now + 11)
+    assert [session.game_id for session in expired] == ["game-1"]
+
+    # the timer of game-2 was set again, to ten seconds after its event
+    assert sessions.expired_sessions(now + 17) == []
+    assert sessions.expired_sessions(now + 19) == [session]
+
+
+async def _no_event() -> None:
+    return None
+
+
+def test_server_removes_expired_sessions() -> None:
+    sessions = GameSessionManager(
+        InMemorySessionStore(), "worker", idle_ttl=60.0, empty_ttl=0.0
+    )
+    sessions.expiry = TimerWheel(tick=0.01)
+    server = Server(watch_now_playing=False, session_manager=sessions)
+
+    with TestClient(server.app) as client:
+        response = client.post(
+            "/create",
+            json={
+                "game_id": "abandoned",
+                "target_song_count": 2,
+                "music_service_type": "mock",
+            },
+        )
+        assert response.status_code == 201
+        deadline = time.monotonic() + 5
+        while sessions.sessions and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert client.get("/list-sessions").json() == {"sessions": []}
+        assert client.get("/stats").json()["expired_sessions"] == 1
+
+
+def test_reaper_survives_a_failing_tick(monkeypatch: pytest.MonkeyPatch) -> None:
+    """A tick that raises doesn't stop the later ticks from expiring sessions."""
+    sessions = GameSessionManager(
+        InMemorySessionStore(), "worker", idle_ttl=60.0, empty_ttl=0.0
+    )
+    sessions.expiry = TimerWheel(tick=0.01)
+    expired_sessions = sessions.expired_sessions
+    calls = []
+
+    def fail_once() -> list[GameSession]:
+        calls.append(None)
+        if len(calls) == 1:
+            raise RuntimeError("Set changed size during iteration")
+        return expired_sessions()
+
+    monkeypatch.setattr(sessions, "expired_sessions", fail_once)
+    server = Server(watch_now_playing=False, session_manager=sessions)
+
+    with TestClient(server.app) as client:
+        response = client.post(
+            "/create",
+            json={
+                "game_id": "late",
+                "target_song_count": 2,
+                "music_service_type": "mock",
+            },
+        )
+        assert response.status_code == 201
+        deadline = time.monotonic() + 5
+        while sessions.sessions and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert len(calls) > 1
+        assert client.get("/stats").json()["expired_sessions"] == 1
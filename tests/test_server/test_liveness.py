@@ -0,0 +1,74 @@
+"""Tests for detecting dead and idle WebSocket connections."""
+
+import json
+
+import pytest
+import uvicorn
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from server import server as server_module
+from server.game_sessions import GameSessionManager
+from server.outbound import CLOSE_GOING_AWAY
+from server.server import Server
+from server.session_store import InMemorySessionStore
+
+
+def test_serve_configures_protocol_pings(monkeypatch) -> None:
+    calls = []
+    monkeypatch.setattr(uvicorn, "run", lambda app, **kwargs: calls.append(kwargs))
+    monkeypatch.setenv("WS_PING_INTERVAL", "5")
+    monkeypatch.setenv("WS_PING_TIMEOUT", "2.5")
+
+    server_module.serve(FastAPI(), port=4200, use_ssl=False)
+
+    assert calls[0]["ws_ping_interval"] == 5.0
+    assert calls[0]["ws_ping_timeout"] == 2.5
+
+
+def create_game(client: TestClient, game_id: str, user_name: str) -> None:
+    response = client.post(
+        "/create",
+        json={"game_id": game_id, "target_song_count": 2, "music_service_type": "mock"},
+    )
+    assert response.status_code == 201
+    response = client.post("/join", json={"game_id": game_id, "user_name": user_name})
+    assert response.status_code == 200
+
+
+def test_pings_are_answered_without_decoding(monkeypatch) -> None:
+    sessions = GameSessionManager(InMemorySessionStore(), "worker")
+    server = Server(watch_now_playing=False, session_manager=sessions)
+    decoded = []
+    loads = server_module.loads
+    monkeypatch.setattr(
+        server_module, "loads", lambda data: decoded.append(data) or loads(data)
+    )
+
+    with TestClient(server.app) as client:
+        create_game(client, "game", "alice")
+        with client.websocket_connect("/ws/game/alice") as ws:
+            assert json.loads(ws.receive_text())["type"] == "welcome"
+            ws.send_text(json.dumps({"type": "ping"}, separators=(",", ":")))
+            ws.send_text(json.dumps({"type": "hello"}))
+            # the ping got no reply, the next message did
+            assert ws.receive_text() == "Unknown message type."
+
+    assert decoded == ['{"type": "hello"}']
+
+
+def test_idle_connections_are_closed() -> None:
+    sessions = GameSessionManager(InMemorySessionStore(), "worker")
+    server = Server(watch_now_playing=False, session_manager=sessions, idle_timeout=0.2)
+
+    with TestClient(server.app) as client:
+        create_game(client, "game", "alice")
+        with client.websocket_connect("/ws/game/alice") as ws:
+            assert json.loads(ws.receive_text())["type"] == "welcome"
+            with pytest.raises(WebSocketDisconnect) as closed:
+                ws.receive_text()
+            assert closed.value.code == CLOSE_GOING_AWAY
+
+        # the only player left, so the session was removed
+        assert sessions.get_game_session("game") is None
@@ -0,0 +1,87 @@
+"""Tests for the load generator, which runs against a real server."""
+
+import socket
+import threading
+import time
+from typing import Any
+
+import pytest
+import uvicorn
+from fastapi.testclient import TestClient
+
+from server.loadgen import LoadGenConfig, percentile, run_load_test
+from server.server import Server
+
+
+def test_percentile_uses_the_nearest_rank() -> None:
+    samples = [float(i) for i in range(1, 101)]
+
+    assert percentile(samples, 50) == 50.0
+    assert percentile(samples, 99) == 99.0
+    assert percentile([], 99) == 0.0
+
+
+@pytest.fixture
+def server_url():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(
+        uvicorn.Config(Server().app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    yield f"http://127.0.0.1:{port}"
+    server.should_exit = True
+    thread.join(timeout=5)
+
+
+@pytest.mark.asyncio
+async def test_load_test_plays_games_and_reports_latencies(server_url) -> None:
+    config = LoadGenConfig(
+        url=server_url,
+        sessions=3,
+        players=3,
+        duration=1.5,
+        ramp_up=0.1,
+        think_time=0.01,
+        churn_rate=0.1,
+        rejoin_delay=0.05,
+    )
+
+    summary = (await run_load_test(config)).summary()
+
+    assert summary["counters"]["sessions"] == 3
+    assert "failed_sessions" not in summary["counters"]
+    assert summary["guess_to_result_ms"]["count"] > 10
+    assert summary["last_guess_to_your_turn_ms"]["count"] > 0
+    assert summary["guesses_per_s"] > 0
+
+
+def create_mock_game(client: TestClient, options: dict[str, Any]) -> int:
+    response = client.post(
+        "/create",
+        json={
+            "game_id": f"game-{len(str(options))}-{time.monotonic_ns()}",
+            "target_song_count": 2,
+            "music_service_type": "mock",
+            "music_service_options": options,
+        },
+    )
+    return response.status_code
+
+
+def test_mock_options_are_gated_and_bounded(monkeypatch) -> None:
+    options = {"song_count": 50, "latency": {"default": {"p50_ms": 1, "p99_ms": 2}}}
+    assert create_mock_game(TestClient(Server().app), options) == 403
+
+    monkeypatch.setenv("ENABLE_MOCK_OPTIONS", "1")
+    client = TestClient(Server().app)
+    assert create_mock_game(client, options) == 201
+    assert create_mock_game(client, {}) == 201
+    assert create_mock_game(client, {"song_count": 10**8}) == 422
+    assert create_mock_game(client, {"timeout_ms": 60_000}) == 422
+    assert create_mock_game(client, {"latency": {"default": {"p50_ms": "p50"}}}) == 422
+    assert create_mock_game(client, {"unknown": 1}) == 422
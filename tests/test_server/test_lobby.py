@@ -0,0 +1,134 @@
+"""Tests for the lobby index, the session list and the lobby WebSocket."""
+
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from game.game_logic import GameLogic
+from game.user import User
+from music_service.mock import DummyMusicService
+from server.game_sessions import GameSessionManager
+from server.lobby import LobbyIndex
+from server.server import Server
+from server.session_store import InMemorySessionStore
+
+
+def manager() -> GameSessionManager:
+    return GameSessionManager(InMemorySessionStore(), "worker")
+
+
+def test_lobby_index_reports_changes() -> None:
+    lobby = LobbyIndex()
+    updates = []
+    unsubscribe = lobby.subscribe(updates.append)
+
+    assert lobby.update("game-1", joinable=True, running=False)
+    assert not lobby.update("game-1", joinable=True, running=False)
+    assert lobby.update("game-2", joinable=True, running=True)
+    assert lobby.update("game-1", joinable=False, running=True)
+    assert not lobby.update("game-3", joinable=False, running=False)
+
+    assert lobby.query() == ["game-2"]
+    assert updates == [
+        {"type": "lobby_update", "added": ["game-1"], "removed": []},
+        {"type": "lobby_update", "added": ["game-2"], "removed": []},
+        {"type": "lobby_update", "added": [], "removed": ["game-1"]},
+    ]
+    unsubscribe()
+    lobby.discard("game-2")
+    assert len(updates) == 3
+
+
+@pytest.mark.asyncio
+async def test_manager_keeps_the_lobby_as_games_start_and_players_leave() -> None:
+    sessions = manager()
+    for game_id in ("room-1", "room-2", "other"):
+        sessions.add_game(game_id, GameLogic(2, DummyMusicService()))
+    session = sessions.get_game_session("room-1")
+    game = session.game_logic
+    await game.start_game_async([User("alice"), User("bob")])
+    sessions.sync(session)
+
+    assert await sessions.joinable_sessions() == ["room-2", "other"]
+    assert sessions.store.joinable_sessions() == {"room-2": "worker", "other": "worker"}
+
+    game.deactivate_user("bob")
+    sessions.sync(session)
+    assert await sessions.joinable_sessions(prefix="room") == ["room-2", "room-1"]
+    assert await sessions.joinable_sessions(running=True) == ["room-1"]
+    assert sessions.store.joinable_sessions(running=True) == {"room-1": "worker"}
+
+    sessions.remove_game_session("room-2")
+    assert await sessions.joinable_sessions(running=False) == ["other"]
+
+
+def test_session_list_is_paged_and_cached() -> None:
+    sessions = manager()
+    for index in range(5):
+        sessions.add_game(f"game-{index}", GameLogic(2, DummyMusicService()))
+    server = Server(watch_now_playing=False, session_manager=sessions)
+
+    with TestClient(server.app) as client:
+        response = client.get("/list-sessions", params={"offset": 1, "limit": 2})
+        assert response.json() == {"sessions": ["game-1", "game-2"]}
+        assert response.headers["X-Total-Count"] == "5"
+        etag = response.headers["ETag"]
+
+        response = client.get(
+            "/list-sessions",
+            params={"offset": 1, "limit": 2},
+            headers={"If-None-Match": etag},
+        )
+        assert response.status_code == 304
+
+        sessions.remove_game_session("game-4")
+        response = client.get(
+            "/list-sessions",
+            params={"offset": 1, "limit": 2},
+            headers={"If-None-Match": etag},
+        )
+        assert response.status_code == 200
+        assert response.headers["X-Total-Count"] == "4"
+
+        assert client.get("/list-sessions").json() == {
+            "sessions": ["game-0", "game-1", "game-2", "game-3"]
+        }
+        assert client.get("/list-sessions", params={"limit": 0}).status_code == 422
+
+
+def test_lobby_websocket_pushes_changes() -> None:
+    sessions = manager()
+    sessions.add_game("game-1", GameLogic(2, DummyMusicService()))
+    server = Server(watch_now_playing=False, session_manager=sessions)
+
+    with TestClient(server.app) as client, client.websocket_connect("/ws/lobby") as ws:
+        assert json.loads(ws.receive_text()) == {
+            "type": "lobby",
+            "sessions": ["game-1"],
+        }
+
+        response = client.post(
+            "/create",
+            json={
+                "game_id": "game-2",
+                "target_song_count": 2,
+                "music_service_type": "mock",
+            },
+        )
+        assert response.status_code == 201
+        assert json.loads(ws.receive_text()) == {
+            "type": "lobby_update",
+            "added": ["game-2"],
+            "removed": [],
+        }
+
+        client.post("/join", json={"game_id": "game-1", "user_name": "alice"})
+        with client.websocket_connect("/ws/game-1/alice") as player:
+            assert json.loads(player.receive_text())["type"] == "welcome"
+            assert client.post("/start", json={"game_id": "game-1"}).status_code == 200
+            assert json.loads(ws.receive_text()) == {
+                "type": "lobby_update",
+                "added": [],
+                "removed": ["game-1"],
+            }
@@ -0,0 +1,111 @@
+"""Tests for the NowPlayingWatcher class."""
+
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import pytest
+
+from game.game_logic import GameLogic
+from game.song import Song
+from game.user import User
+from music_service.abstract_adapter import PlaybackState
+from music_service.mock import DummyMusicService
+from server.now_playing import NowPlayingWatcher
+
+
+def collect(
+    messages: list[dict[str, Any]],
+) -> Callable[[dict[str, Any]], Awaitable[None]]:
+    async def broadcast(message: dict[str, Any]) -> None:
+        messages.append(message)
+
+    return broadcast
+
+
+class LaggingMusicService(DummyMusicService):
+    """Reports the previous track for a while after a skip, like Spotify does."""
+
+    skip_settle_time = 0.05
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._skipped_at = 0.0
+
+    def current_song(self) -> Song:
+        if time.monotonic() < self._skipped_at + self.skip_settle_time:
+            return self.playlist[self.playlist_index - 1]
+        return super().current_song()
+
+    def next_track(self) -> None:
+        super().next_track()
+        self._skipped_at = time.monotonic()
+
+
+@pytest.mark.asyncio
+async def test_watcher_detects_tracks_changed_outside_of_the_game() -> None:
+    music_service = DummyMusicService()
+    game = GameLogic(target_song_count=2, music_service=music_service)
+    await game.start_game_async([User("player1")])
+    messages: list[dict[str, Any]] = []
+    watcher = NowPlayingWatcher(game, collect(messages))
+
+    await watcher.poll()
+    assert messages == []
+    assert await game.current_round_song_async() == music_service.playlist[0]
+
+    # the game skips the track itself -> no message
+    await game.next_track_async()
+    await watcher.poll()
+    assert messages == []
+    assert await game.current_round_song_async() == music_service.playlist[1]
+
+    # the host skips the track on the device
+    music_service.next_track()
+    await watcher.poll()
+    assert [message["type"] for message in messages] == ["track_changed"]
+    assert await game.current_round_song_async() == music_service.playlist[2]
+
+
+@pytest.mark.asyncio
+async def test_watcher_waits_for_the_skipped_track_to_settle() -> None:
+    music_service = LaggingMusicService()
+    game = GameLogic(target_song_count=2, music_service=music_service)
+    await game.start_game_async([User("player1")])
+    messages: list[dict[str, Any]] = []
+    watcher = NowPlayingWatcher(game, collect(messages))
+    await watcher.poll()
+
+    await game.next_track_async()
+    # right after the skip, the service still reports the previous track
+    assert music_service.current_song() == music_service.playlist[0]
+    await watcher.poll()
+
+    assert messages == []
+    assert await game.current_round_song_async() == music_service.playlist[1]
+
+
+def test_a_learned_release_year_is_no_track_change() -> None:
+    """The same track with a release year replaces the one without it silently."""
+    game = GameLogic(target_song_count=2, music_service=DummyMusicService())
+    unknown = Song("Bad Guy", "Billie Eilish", 0, track_id="t:1")
+    known = Song("Bad Guy", "Billie Eilish", 2019, track_id="t:1")
+
+    assert game.observe_current_song(unknown, game.round_number) is False
+    assert game.observe_current_song(known, game.round_number) is False
+    other = Song("Yesterday", "The Beatles", 1965, track_id="t:2")
+    assert game.observe_current_song(other, game.round_number) is True
+
+
+def test_poll_interval_adapts_to_track_progress() -> None:
+    game = GameLogic(target_song_count=2, music_service=DummyMusicService())
+    watcher = NowPlayingWatcher(
+        game, collect([]), max_interval=15, min_interval=1, track_end_window=10
+    )
+    song = Song("Yesterday", "The Beatles", 1965)
+
+    assert watcher.next_interval(None) == watcher.default_interval
+    assert watcher.next_interval(PlaybackState(song)) == watcher.default_interval
+    assert watcher.next_interval(PlaybackState(song, 0, 180_000)) == 15
+    assert watcher.next_interval(PlaybackState(song, 165_000, 180_000)) == 5
+    assert watcher.next_interval(PlaybackState(song, 175_000, 180_000)) == 1
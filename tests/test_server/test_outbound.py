@@ -0,0 +1,174 @@
+"""Tests for the outbound queues, which send the messages of each WebSocket."""
+
+import asyncio
+import json
+import threading
+
+import pytest
+from starlette.websockets import WebSocketState
+
+from server.connection_manager import ConnectionManager
+from server.outbound import CLOSE_TRY_AGAIN_LATER, OutboundQueue, OverflowPolicy
+
+
+class SlowWebSocket:
+    """Fake WebSocket, which only sends once it is unblocked."""
+
+    def __init__(self) -> None:
+        self.sent: list[str] = []
+        self.unblocked = asyncio.Event()
+        self.closed_with: int | None = None
+        self.application_state = WebSocketState.CONNECTED
+
+    async def send_text(self, text: str) -> None:
+        await self.unblocked.wait()
+        self.sent.append(text)
+
+    async def close(self, code: int) -> None:
+        self.closed_with = code
+        self.application_state = WebSocketState.DISCONNECTED
+
+
+class FailingWebSocket(SlowWebSocket):
+    """Fake WebSocket of a client that is gone."""
+
+    async def send_text(self, text: str) -> None:  # noqa: ARG002
+        raise ConnectionResetError
+
+
+def message(message_type: str, number: int = 0) -> str:
+    return json.dumps({"type": message_type, "number": number})
+
+
+async def fill(queue: OutboundQueue, messages: list[tuple[str, int]]) -> None:
+    for position, (message_type, number) in enumerate(messages):
+        queue.send(message(message_type, number), message_type)
+        if position == 0:
+            # let the writer take the first message, it blocks while sending it
+            await asyncio.sleep(0)
+
+
+async def drain(websocket: SlowWebSocket) -> list[tuple[str, int]]:
+    websocket.unblocked.set()
+    for _ in range(10):
+        await asyncio.sleep(0)
+    return [(m["type"], m["number"]) for m in map(json.loads, websocket.sent)]
+
+
+@pytest.mark.asyncio
+async def test_drop_stale_drops_the_oldest_informational_message() -> None:
+    websocket = SlowWebSocket()
+    queue = OutboundQueue(websocket, max_size=2)
+
+    await fill(
+        queue,
+        [("sending", 0), ("player_joined", 1), ("your_turn", 2), ("player_joined", 3)],
+    )
+
+    assert await drain(websocket) == [
+        ("sending", 0),
+        ("your_turn", 2),
+        ("player_joined", 3),
+    ]
+    assert queue.stats()["dropped"] == 1
+
+
+@pytest.mark.asyncio
+async def test_critical_messages_are_never_dropped() -> None:
+    websocket = SlowWebSocket()
+    queue = OutboundQueue(websocket, max_size=1)
+
+    await fill(
+        queue,
+        [("sending", 0), ("your_turn", 1), ("track_changed", 2), ("game_over", 3)],
+    )
+
+    assert await drain(websocket) == [
+        ("sending", 0),
+        ("your_turn", 1),
+        ("game_over", 3),
+    ]
+    assert queue.stats()["dropped"] == 1
+
+
+@pytest.mark.asyncio
+async def test_coalesce_keeps_the_latest_message_of_a_type() -> None:
+    websocket = SlowWebSocket()
+    queue = OutboundQueue(websocket, max_size=2, policy=OverflowPolicy.COALESCE)
+
+    await fill(
+        queue,
+        [
+            ("sending", 0),
+            ("track_changed", 1),
+            ("player_joined", 2),
+            ("track_changed", 3),
+        ],
+    )
+
+    # the latest message takes the place of the replaced one
+    assert await drain(websocket) == [
+        ("sending", 0),
+        ("track_changed", 3),
+        ("player_joined", 2),
+    ]
+    assert queue.stats()["coalesced"] == 1
+
+
+@pytest.mark.asyncio
+async def test_disconnect_closes_a_client_that_falls_behind() -> None:
+    websocket = SlowWebSocket()
+    queue = OutboundQueue(websocket, max_size=1, policy=OverflowPolicy.DISCONNECT)
+
+    await fill(queue, [("sending", 0), ("your_turn", 1), ("your_turn", 2)])
+    await asyncio.sleep(0)
+
+    assert queue.closed
+    assert websocket.closed_with == CLOSE_TRY_AGAIN_LATER
+    assert websocket.sent == []
+
+
+@pytest.mark.asyncio
+async def test_messages_from_other_threads_are_sent_in_order() -> None:
+    websocket = SlowWebSocket()
+    websocket.unblocked.set()
+    queue = OutboundQueue(websocket)
+
+    sender = threading.Thread(
+        target=lambda: [queue.send(message("info", i), "info") for i in range(5)]
+    )
+    sender.start()
+    sender.join()
+
+    assert await drain(websocket) == [("info", i) for i in range(5)]
+
+
+@pytest.mark.asyncio
+async def test_too_many_critical_messages_disconnect_the_client() -> None:
+    websocket = SlowWebSocket()
+    closed = []
+    queue = OutboundQueue(websocket, max_size=1, max_critical=2, on_close=closed.append)
+
+    await fill(
+        queue,
+        [("sending", 0), ("your_turn", 1), ("guess_result", 2), ("your_turn", 3)],
+    )
+    await asyncio.sleep(0)
+
+    assert queue.closed
+    assert closed == [queue]
+    assert websocket.closed_with == CLOSE_TRY_AGAIN_LATER
+
+
+@pytest.mark.asyncio
+async def test_connection_manager_forgets_queues_that_failed() -> None:
+    websocket = FailingWebSocket()
+    connection_manager = ConnectionManager()
+    connection_manager.register_user("alice")
+    connection_manager.set_websocket("alice", websocket)
+
+    assert connection_manager.send("alice", {"type": "your_turn"})
+    await asyncio.sleep(0)
+
+    assert connection_manager.outbound == {}
+    assert not connection_manager.send("alice", {"type": "your_turn"})
@@ -0,0 +1,209 @@
+"""Tests for the front router, which spreads the sessions over workers."""
+
+import asyncio
+import json
+import socket
+import threading
+import time
+from collections import Counter
+from collections.abc import Iterator
+
+import pytest
+import uvicorn
+from fastapi.testclient import TestClient
+
+from server.game_sessions import GameSessionManager
+from server.router import HashRing, Router
+from server.server import Server
+from server.session_store import InMemorySessionStore
+
+KEYS = [f"game-{i}" for i in range(2000)]
+
+
+def test_hash_ring_spreads_keys_over_all_nodes() -> None:
+    """Every node gets about the same share of the keys."""
+    ring = HashRing(["a", "b", "c", "d"])
+
+    counts = Counter(ring.node_for(key) for key in KEYS)
+
+    assert set(counts) == {"a", "b", "c", "d"}
+    assert min(counts.values()) > len(KEYS) / 4 * 0.7
+
+
+def test_hash_ring_moves_few_keys_when_nodes_change() -> None:
+    """Adding or removing a node only moves the keys of that node."""
+    ring = HashRing(["a", "b", "c"])
+    before = {key: ring.node_for(key) for key in KEYS}
+
+    ring.add("d")
+    after_add = {key: ring.node_for(key) for key in KEYS}
+    moved = [key for key in KEYS if before[key] != after_add[key]]
+    # only keys taken over by the new node move, about a quarter of them
+    assert {after_add[key] for key in moved} == {"d"}
+    assert len(moved) < len(KEYS) / 4 * 1.3
+
+    ring.remove("d")
+    assert {key: ring.node_for(key) for key in KEYS} == before
+
+
+def test_hash_ring_without_nodes_raises() -> None:
+    """An empty ring has no node for a key."""
+    with pytest.raises(LookupError):
+        HashRing().node_for("game-1")
+
+
+def run_worker(worker_id: str) -> tuple[str, uvicorn.Server]:
+    """Serve a worker on a free port in a thread and return its URL."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = Server(
+        session_manager=GameSessionManager(InMemorySessionStore(), worker_id)
+    )
+    worker = uvicorn.Server(
+        uvicorn.Config(server.app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    threading.Thread(target=worker.run, daemon=True).start()
+    while not worker.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}", worker
+
+
+@pytest.fixture
+def router() -> Iterator[tuple[Router, TestClient]]:
+    """Run a router in front of two workers."""
+    running = [run_worker(worker_id) for worker_id in ("a", "b")]
+    router = Router([url for url, _ in running])
+    with TestClient(router.app) as client:
+        yield router, client
+    for _, worker in running:
+        worker.should_exit = True
+
+
+def test_router_sends_all_traffic_of_a_session_to_one_worker(
+    router: tuple[Router, TestClient],
+) -> None:
+    """Requests and WebSockets of a session reach the worker that owns it."""
+    router, client = router
+    game_ids = [f"game-{i}" for i in range(6)]
+    for game_id in game_ids:
+        response = client.post(
+            "/create",
+            json={
+                "game_id": game_id,
+                "target_song_count": 2,
+                "music_service_type": "mock",
+            },
+        )
+        assert response.status_code == 201
+
+    assert set(client.get("/list-sessions").json()["sessions"]) == set(game_ids)
+    workers = client.get("/stats").json()["workers"]
+    assert sum(worker["sessions"] for worker in workers.values()) == len(game_ids)
+    for url, worker in workers.items():
+        expected = sum(router.worker_for(game_id) == url for game_id in game_ids)
+        assert worker["sessions"] == expected
+
+    # a new worker doesn't take over sessions created before
+    owner = router.worker_for("game-0")
+    router.add_worker("http://127.0.0.1:1")
+    assert router.worker_for("game-0") == owner
+
+    game_id = "game-0"
+    response = client.post("/join", json={"game_id": game_id, "user_name": "alice"})
+    assert response.status_code == 200
+    with client.websocket_connect(f"/ws/{game_id}/alice") as ws:
+        assert json.loads(ws.receive_text())["type"] == "welcome"
+        response = client.post("/start", json={"game_id": game_id})
+        assert response.status_code == 200
+        assert json.loads(ws.receive_text())["type"] == "your_turn"
+
+        ws.send_text(json.dumps({"type": "guess", "index": 0}))
+        assert json.loads(ws.receive_text())["type"] == "guess_result"
+
+    load = client.get("/stats").json()["workers"][owner]
+    assert load["websockets"] == 1
+    assert load["requests"] >= 3
+
+
+def test_router_forgets_sessions_removed_by_their_worker(
+    router: tuple[Router, TestClient],
+) -> None:
+    """Pins of sessions no worker lists anymore are pruned."""
+    router, client = router
+    for game_id in ("kept", "left"):
+        response = client.post(
+            "/create",
+            json={
+                "game_id": game_id,
+                "target_song_count": 2,
+                "music_service_type": "mock",
+            },
+        )
+        assert response.status_code == 201
+        client.post("/join", json={"game_id": game_id, "user_name": "alice"})
+    with client.websocket_connect("/ws/kept/alice") as kept:
+        assert json.loads(kept.receive_text())["type"] == "welcome"
+        with client.websocket_connect("/ws/left/alice") as left:
+            assert json.loads(left.receive_text())["type"] == "welcome"
+        # the only player left, so the worker removed the session
+        deadline = time.monotonic() + 5
+        while "left" in client.get("/list-sessions").json()["sessions"]:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+
+        client.portal.call(router.prune_pins)
+
+        assert set(router._pinned) == {"kept"}
+
+
+def test_router_removes_workers_on_its_event_loop(
+    router: tuple[Router, TestClient],
+) -> None:
+    """Workers removed from another thread leave the ring on the loop of the router."""
+    router, client = router
+    worker = router.ring.nodes[0]
+
+    thread = threading.Thread(target=router.remove_worker_threadsafe, args=(worker,))
+    thread.start()
+    thread.join()
+    # the loop of the router takes it off the ring with its next iteration
+    client.portal.call(asyncio.sleep, 0)
+
+    assert worker not in router.ring.nodes
+    assert worker not in router.load
+
+
+def test_router_merges_the_lobbies_of_the_workers(
+    router: tuple[Router, TestClient],
+) -> None:
+    """The session list and the lobby updates cover the sessions of all workers."""
+    _, client = router
+    for game_id in ("game-0", "game-1"):
+        client.post(
+            "/create",
+            json={
+                "game_id": game_id,
+                "target_song_count": 2,
+                "music_service_type": "mock",
+            },
+        )
+
+    response = client.get("/list-sessions", params={"limit": 1, "prefix": "game"})
+    assert len(response.json()["sessions"]) == 1
+    assert response.headers["X-Total-Count"] == "2"
+
+    with client.websocket_connect("/ws/lobby") as ws:
+        lobby = json.loads(ws.receive_text())
+        assert lobby["type"] == "lobby"
+        assert set(lobby["sessions"]) == {"game-0", "game-1"}
+
+        client.post("/join", json={"game_id": "game-1", "user_name": "alice"})
+        with client.websocket_connect("/ws/game-1/alice") as player:
+            assert json.loads(player.receive_text())["type"] == "welcome"
+            assert client.post("/start", json={"game_id": "game-1"}).status_code == 200
+            assert json.loads(ws.receive_text()) == {
+                "type": "lobby_update",
+                "added": [],
+                "removed": ["game-1"],
+            }
@@ -0,0 +1,80 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from server.session_actor import SessionActor
+
+
+@pytest.mark.asyncio
+async def test_events_are_applied_one_after_another():
+    actor = SessionActor()
+    log = []
+
+    async def event(name: str) -> str:
+        log.append(f"{name} started")
+        await asyncio.sleep(0.01)
+        log.append(f"{name} finished")
+        return name
+
+    results = await asyncio.gather(
+        actor.submit("guess", lambda: event("a")),
+        actor.submit("guess", lambda: event("b")),
+    )
+
+    assert results == ["a", "b"]
+    assert log == ["a started", "a finished", "b started", "b finished"]
+    assert actor.stats()["processed"] == 2
+    assert actor.stats()["max_queued"] == 2
+
+
+@pytest.mark.asyncio
+async def test_errors_reach_the_submitter_and_the_actor_goes_on():
+    actor = SessionActor()
+
+    async def failing() -> None:
+        raise HTTPException(status_code=409, detail="conflict")
+
+    async def succeeding() -> str:
+        return "ok"
+
+    with pytest.raises(HTTPException):
+        await actor.submit("join", failing)
+    assert await actor.submit("join", succeeding) == "ok"
+    assert actor.stats()["failed"] == 1
+    assert actor.stats()["queued"] == 0
+
+
+@pytest.mark.asyncio
+async def test_events_can_be_submitted_from_other_event_loops():
+    actor = SessionActor()
+    release = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    log = []
+
+    async def blocking() -> None:
+        log.append("blocking")
+        await release.wait()
+
+    async def other() -> str:
+        log.append("other")
+        return "done"
+
+    first = asyncio.create_task(actor.submit("start", blocking))
+    await asyncio.sleep(0)
+    results = []
+    thread = threading.Thread(
+        target=lambda: results.append(asyncio.run(actor.submit("guess", other)))
+    )
+    thread.start()
+    await asyncio.sleep(0.05)
+    # the event of the other loop waits for the running event
+    assert log == ["blocking"]
+
+    loop.call_soon(release.set)
+    await first
+    await asyncio.to_thread(thread.join)
+
+    assert results == ["done"]
+    assert log == ["blocking", "other"]
@@ -0,0 +1,305 @@
+"""Tests for the session stores, the pub/sub broker and sessions shared by workers."""
+
+import asyncio
+import json
+import socket
+import sqlite3
+import threading
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+import httpx
+import pytest
+import uvicorn
+from websockets.asyncio.client import ClientConnection, connect
+
+from server.game_sessions import GameSessionManager
+from server.server import Server
+from server.session_store import InMemorySessionStore, SessionStore
+from server.sqlite_backend import (
+    PubSubBroker,
+    SQLiteSessionStore,
+    UnixSocketPubSub,
+    start_broker_thread,
+)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request: pytest.FixtureRequest, tmp_path: Path) -> SessionStore:
+    """Return an empty store of each kind."""
+    if request.param == "memory":
+        return InMemorySessionStore()
+    return SQLiteSessionStore(tmp_path / "sessions.sqlite3")
+
+
+def test_store_tracks_owners_and_joinable_sessions(store: SessionStore) -> None:
+    """Sessions belong to the worker that claimed them first until it releases them."""
+    assert store.claim("game-1", "a")
+    assert not store.claim("game-1", "b")
+    assert store.claim("game-2", "b")
+
+    store.set_joinable("game-2", False)
+
+    assert store.owner_of("game-1") == "a"
+    assert store.joinable_sessions() == {"game-1": "a"}
+    store.set_joinable("game-1", True, running=True)
+    assert store.joinable_sessions(running=True) == {"game-1": "a"}
+    assert store.joinable_sessions(running=False) == {}
+
+    store.release("game-1", "b")  # only the owner releases a session
+    assert store.owner_of("game-1") == "a"
+    store.release_all("a")
+    assert store.owner_of("game-1") is None
+    assert store.owner_of("game-2") == "b"
+
+
+def test_sqlite_store_is_shared_between_connections(tmp_path: Path) -> None:
+    """Stores opened on the same file see the claims of each other."""
+    first = SQLiteSessionStore(tmp_path / "sessions.sqlite3")
+    second = SQLiteSessionStore(tmp_path / "sessions.sqlite3")
+
+    assert first.claim("game-1", "a")
+
+    assert not second.claim("game-1", "b")
+    assert second.joinable_sessions() == {"game-1": "a"}
+
+
+def test_sessions_of_workers_without_lease_are_free(tmp_path: Path) -> None:
+    """Sessions of a worker that stopped renewing its lease can be claimed again."""
+    first = SQLiteSessionStore(tmp_path / "sessions.sqlite3", lease_ttl=0.05)
+    second = SQLiteSessionStore(tmp_path / "sessions.sqlite3", lease_ttl=0.05)
+    assert first.claim("game-1", "a")
+    assert second.owner_of("game-1") == "a"
+
+    # worker a stops renewing its lease, e.g. because it crashed
+    time.sleep(0.1)
+    second.heartbeat("b")
+    assert second.owner_of("game-1") is None
+    assert second.joinable_sessions() == {}
+    assert second.claim("game-1", "b")
+    assert first.owner_of("game-1") == "b"
+
+
+def test_sqlite_store_migrates_files_of_older_versions(tmp_path: Path) -> None:
+    """Files of older schema versions are upgraded when they are opened."""
+    path = tmp_path / "sessions.sqlite3"
+    with sqlite3.connect(path) as connection:
+        connection.execute(
+            "CREATE TABLE sessions "
+            "(game_id TEXT PRIMARY KEY, owner TEXT NOT NULL, joinable INTEGER NOT NULL)"
+        )
+        connection.execute("INSERT INTO sessions VALUES ('game-1', 'a', 1)")
+    connection.close()
+
+    store = SQLiteSessionStore(path)
+    store.heartbeat("a")
+    assert store.joinable_sessions(running=False) == {"game-1": "a"}
+    store.set_joinable("game-1", True, running=True)
+    assert store.joinable_sessions(running=True) == {"game-1": "a"}
+    store.close()
+
+    # opening a file of the current version changes nothing
+    store = SQLiteSessionStore(path)
+    assert store.owner_of("game-1") == "a"
+    store.close()
+
+
+@pytest.mark.asyncio
+async def test_broker_forwards_messages_to_subscribers(tmp_path: Path) -> None:
+    """Published messages reach the subscribers of their channel only."""
+    path = tmp_path / "ps.sock"
+    start_broker_thread(path)
+    publisher = UnixSocketPubSub(path)
+    subscriber = UnixSocketPubSub(path)
+
+    subscription = await subscriber.subscribe("worker:a")
+    other = await subscriber.subscribe("worker:b")
+    # a frame without a message is dropped, the following ones still arrive
+    await publisher._send({"op": "publish", "channel": "worker:a"})
+    await publisher.publish("worker:a", {"op": "send", "text": "1"})
+    await publisher.publish("worker:a", {"op": "send", "text": "2"})
+
+    assert await asyncio.wait_for(subscription.get(), 5) == {"op": "send", "text": "1"}
+    assert await asyncio.wait_for(subscription.get(), 5) == {"op": "send", "text": "2"}
+    assert other._messages.empty()
+
+    await publisher.close()
+    await subscriber.close()
+
+
+@pytest.mark.asyncio
+async def test_subscribers_reconnect_after_the_broker_restarted(
+    tmp_path: Path,
+) -> None:
+    """Subscriptions survive a restart of the broker."""
+    path = tmp_path / "ps.sock"
+    broker = PubSubBroker(path)
+    await broker.start()
+    publisher = UnixSocketPubSub(path)
+    subscriber = UnixSocketPubSub(path)
+    subscription = await subscriber.subscribe("worker:a")
+    await wait_for_subscribers(broker)
+
+    await broker.close()
+    broker = PubSubBroker(path)
+    await broker.start()
+    # the subscriber subscribes again once it reconnected
+    await wait_for_subscribers(broker)
+    await publisher.publish("worker:a", {"op": "send", "text": "1"})
+
+    assert await asyncio.wait_for(subscription.get(), 5) == {"op": "send", "text": "1"}
+    await publisher.close()
+    await subscriber.close()
+    await broker.close()
+
+
+@pytest.mark.asyncio
+async def test_broker_disconnects_subscribers_that_fall_behind(tmp_path: Path) -> None:
+    """A subscriber that doesn't read its messages doesn't hold up the others."""
+    path = tmp_path / "ps.sock"
+    broker = PubSubBroker(path, max_buffer_size=1024 * 1024)
+    await broker.start()
+    publisher = UnixSocketPubSub(path)
+    subscriber = UnixSocketPubSub(path)
+    subscription = await subscriber.subscribe("worker:a")
+    # a subscriber that never reads its connection
+    slow_reader, slow_writer = await asyncio.open_unix_connection(path)
+    slow_writer.write(b'{"op": "subscribe", "channel": "worker:a"}\n')
+    await slow_writer.drain()
+    deadline = time.monotonic() + 5
+    while len(broker._subscribers["worker:a"]) < 2:
+        assert time.monotonic() < deadline
+        await asyncio.sleep(0.01)
+
+    message = {"op": "send", "text": "x" * 64 * 1024}
+    published = 0
+    while len(broker._subscribers["worker:a"]) == 2:
+        assert published < 1000
+        await publisher.publish("worker:a", message)
+        assert await asyncio.wait_for(subscription.get(), 5) == message
+        published += 1
+
+    # the broker closed the connection of the slow subscriber
+    assert len(await asyncio.wait_for(slow_reader.read(), 5)) < published * 64 * 1024
+    await publisher.publish("worker:a", {"op": "send", "text": "1"})
+    assert await asyncio.wait_for(subscription.get(), 5) == {"op": "send", "text": "1"}
+    slow_writer.close()
+    await publisher.close()
+    await subscriber.close()
+    await broker.close()
+
+
+async def wait_for_subscribers(broker: PubSubBroker) -> None:
+    """Wait until a subscriber connected to the broker."""
+    deadline = time.monotonic() + 5
+    while not broker._subscribers and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+
+
+def run_worker(server: Server) -> tuple[str, uvicorn.Server]:
+    """Serve the app on a free port in a thread and return its address."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    worker = uvicorn.Server(
+        uvicorn.Config(server.app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    threading.Thread(target=worker.run, daemon=True).start()
+    while not worker.started:
+        time.sleep(0.01)
+    return f"127.0.0.1:{port}", worker
+
+
+@pytest.fixture
+def workers(tmp_path: Path) -> Iterator[list[str]]:
+    """Run two workers sharing a session store and a broker."""
+    socket_path = tmp_path / "ps.sock"
+    start_broker_thread(socket_path)
+    store = SQLiteSessionStore(tmp_path / "sessions.sqlite3")
+    running = [
+        run_worker(
+            Server(
+                session_manager=GameSessionManager(store, worker_id),
+                pubsub=UnixSocketPubSub(socket_path),
+            )
+        )
+        for worker_id in ("a", "b")
+    ]
+    yield [address for address, _ in running]
+    for _, worker in running:
+        worker.should_exit = True
+
+
+async def receive(ws: ClientConnection) -> dict:
+    """Return the next message received on the WebSocket."""
+    return json.loads(await asyncio.wait_for(ws.recv(), 5))
+
+
+@pytest.mark.asyncio
+async def test_players_play_a_session_owned_by_another_worker(
+    workers: list[str],
+) -> None:
+    """Players connected to different workers play the same session."""
+    worker_a, worker_b = workers
+    game_id = "shared-game"
+
+    async with httpx.AsyncClient() as client:
+        response = await client.post(
+            f"http://{worker_a}/create",
+            json={
+                "game_id": game_id,
+                "target_song_count": 2,
+                "music_service_type": "mock",
+            },
+        )
+        assert response.status_code == 201
+        response = await client.post(
+            f"http://{worker_b}/create",
+            json={
+                "game_id": game_id,
+                "target_song_count": 2,
+                "music_service_type": "mock",
+            },
+        )
+        assert response.status_code == 409
+
+        response = await client.get(f"http://{worker_b}/list-sessions")
+        assert response.json() == {"sessions": [game_id]}
+
+        for worker, user in ((worker_a, "alice"), (worker_b, "bob")):
+            response = await client.post(
+                f"http://{worker}/join", json={"game_id": game_id, "user_name": user}
+            )
+            assert response.status_code == 200
+        response = await client.post(
+            f"http://{worker_b}/join", json={"game_id": game_id, "user_name": "bob"}
+        )
+        assert response.status_code == 409
+
+        async with (
+            connect(f"ws://{worker_a}/ws/{game_id}/alice") as alice,
+            connect(f"ws://{worker_b}/ws/{game_id}/bob") as bob,
+        ):
+            assert (await receive(alice))["type"] == "welcome"
+            assert (await receive(bob))["type"] == "welcome"
+
+            response = await client.post(
+                f"http://{worker_b}/start", json={"game_id": game_id}
+            )
+            assert response.status_code == 200
+            assert response.json()["type"] == "game_start"
+            assert (await receive(alice))["type"] == "your_turn"
+            assert (await receive(bob))["type"] == "your_turn"
+
+            await bob.send(json.dumps({"type": "guess", "index": 0}))
+            result = await receive(bob)
+            assert result["type"] == "guess_result"
+            assert result["result"] == "correct"
+            assert (await receive(alice))["type"] == "other_player_guess"
+
+            await alice.send(json.dumps({"type": "guess", "index": 0}))
+            assert (await receive(alice))["type"] == "guess_result"
+            assert (await receive(bob))["type"] == "other_player_guess"
+            assert (await receive(alice))["type"] == "your_turn"
+            assert (await receive(bob))["type"] == "your_turn"
@@ -0,0 +1,112 @@
+"""Tests for the session snapshots, which survive a restart of the server."""
+
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from game.game_logic import GameLogic
+from music_service.abstract_adapter import AbstractMusicServiceAdapter
+from music_service.mock import DummyMusicService
+from server.game_sessions import GameSessionManager
+from server.server import Server
+from server.session_store import InMemorySessionStore
+from server.snapshots import SessionSnapshotter
+
+
+class UnrestorableMusicService(DummyMusicService):
+    def snapshot(self) -> None:
+        return None
+
+
+def manager() -> GameSessionManager:
+    return GameSessionManager(InMemorySessionStore(), "worker")
+
+
+@pytest.mark.asyncio
+async def test_only_changed_sessions_are_encoded_again(tmp_path) -> None:
+    sessions = manager()
+    sessions.add_game("game-1", GameLogic(2, DummyMusicService(song_count=50)))
+    sessions.add_game("game-2", GameLogic(2, DummyMusicService()))
+    sessions.add_game("game-3", GameLogic(2, UnrestorableMusicService()))
+    snapshotter = SessionSnapshotter(sessions, tmp_path / "sessions.snapshot")
+
+    await snapshotter.snapshot()
+    assert snapshotter.encoded_sessions == 3
+    await snapshotter.snapshot()
+    assert snapshotter.encoded_sessions == 3
+
+    session = sessions.get_game_session("game-1")
+    await session.actor.submit("join", lambda: _register(session, "alice"))
+    sessions.remove_game_session("game-2")
+    await snapshotter.snapshot()
+    assert snapshotter.encoded_sessions == 4
+
+    restored = await SessionSnapshotter(manager(), snapshotter.path).restore()
+    assert [session.game_id for session in restored] == ["game-1"]
+    music_service: AbstractMusicServiceAdapter = restored[0].game_logic.music_service
+    assert len(music_service.playlist) == 50
+
+
+@pytest.mark.asyncio
+async def test_sessions_still_listed_under_this_worker_are_restored(tmp_path) -> None:
+    sessions = manager()
+    sessions.add_game("game-1", GameLogic(2, DummyMusicService()))
+    snapshotter = SessionSnapshotter(sessions, tmp_path / "sessions.snapshot")
+    await snapshotter.snapshot()
+
+    # the worker restarted with the same ID, the store still has its session
+    store = InMemorySessionStore()
+    store.claim("game-1", "worker")
+    restarted = GameSessionManager(store, "worker")
+    restored = await SessionSnapshotter(restarted, snapshotter.path).restore()
+
+    assert [session.game_id for session in restored] == ["game-1"]
+    assert store.owner_of("game-1") == "worker"
+
+
+async def _register(session, user_name: str) -> None:
+    session.connection_manager.register_user(user_name)
+
+
+def test_players_rejoin_a_game_after_a_restart(tmp_path) -> None:
+    def server() -> Server:
+        sessions = manager()
+        return Server(
+            watch_now_playing=False,
+            session_manager=sessions,
+            snapshotter=SessionSnapshotter(sessions, tmp_path / "sessions.snapshot"),
+        )
+
+    game_id = "restarted-game"
+    with TestClient(server().app) as client:
+        client.post(
+            "/create",
+            json={
+                "game_id": game_id,
+                "target_song_count": 3,
+                "music_service_type": "mock",
+            },
+        )
+        client.post("/join", json={"game_id": game_id, "user_name": "alice"})
+        with client.websocket_connect(f"/ws/{game_id}/alice") as ws:
+            assert json.loads(ws.receive_text())["type"] == "welcome"
+            client.post("/start", json={"game_id": game_id})
+            assert json.loads(ws.receive_text())["type"] == "your_turn"
+            ws.send_text(json.dumps({"type": "guess", "index": 0}))
+            assert json.loads(ws.receive_text())["result"] == "correct"
+            assert json.loads(ws.receive_text())["type"] == "your_turn"
+            # the server shuts down
+            ws.close(code=1012)
+
+    with TestClient(server().app) as client:
+        assert client.get("/list-sessions").json() == {"sessions": [game_id]}
+        response = client.post("/join", json={"game_id": game_id, "user_name": "alice"})
+        assert response.json() == {"message": f"User alice re-joined game {game_id}."}
+        with client.websocket_connect(f"/ws/{game_id}/alice") as ws:
+            assert json.loads(ws.receive_text())["type"] == "welcome"
+            your_turn = json.loads(ws.receive_text())
+            assert your_turn["type"] == "your_turn"
+            assert len(your_turn["song_list"]) == 1
+            ws.send_text(json.dumps({"type": "guess", "index": 1}))
+            assert json.loads(ws.receive_text())["result"] == "correct"
@@ -10,6 +10,12 @@ let reconnectTimeout = null
 let reconnectAttempts = 0
 const MAX_RECONNECT_ATTEMPTS = 10
 
+// Delta protocol: the server sends every song once (song table) and afterwards
+// only the insertions into the players' song lists.
+const PROTOCOL_VERSION = 2
+let songTable = {}
+let songLists = {}
+
 function loadScript (url, onSuccess, onError) {
   const script = document.createElement('script')
   script.src = url
@@ -114,6 +120,33 @@ const buildSongListHtml = (list, newSong) => {
   return newEntry + entries.join('')
 }
 
+function requestResync () {
+  if (socket && socket.readyState === WebSocket.OPEN) {
+    socket.send(JSON.stringify({ type: 'resync' }))
+  }
+}
+
+function applySync (data) {
+  songTable = { ...data.songs }
+  songLists = data.players || {}
+}
+
+function applyDelta (data) {
+  Object.assign(songTable, data.songs || {})
+  for (const [player, songId, index] of data.events || []) {
+    if (!(songId in songTable)) {
+      requestResync()
+      return
+    }
+    if (!songLists[player]) {
+      songLists[player] = []
+    }
+    songLists[player].splice(index, 0, songId)
+  }
+}
+
+const ownSongList = () => (songLists[username] || []).map(id => songTable[id])
+
 function handleYourTurn (data) {
   if (pauseAfterGuess) {
     queuedTurn = data
@@ -129,7 +162,7 @@ function handleYourTurn (data) {
   document.getElementById('songCount').style.display = 'block'
   document.getElementById('controls-waiting-for-start').hidden = true
 
-  const list = data.song_list || []
+  const list = data.song_list || ownSongList()
   const dummyCovers = [
     'dummy-cover/cover1.png',
     'dummy-cover/cover2.png',
@@ -154,7 +187,7 @@ function handleYourTurn (data) {
 
   document.getElementById(
     'songCount'
-  ).textContent = `Song count: ${data.song_list.length}`
+  ).textContent = `Song count: ${list.length}`
 
   document.getElementById('songTimeline').innerHTML = list
     .map(s => buildSongEntry(s))
@@ -164,6 +197,12 @@ function handleYourTurn (data) {
 }
 
 function handleGuessResult (data) {
+  if (data.protocol === PROTOCOL_VERSION) {
+    applyDelta(data)
+    data.song_list = ownSongList()
+    data.last_song = songTable[data.last_song_id]
+  }
+
   if (data.result === 'correct') {
     log(`✅ Guess was correct: ${data.message}`)
     document.getElementById(
@@ -235,7 +274,7 @@ function handleGuessResult (data) {
 function connectWebSocket () {
   let urlObj = new URL(serverUrl)
   const wsProtocol = urlObj.protocol === 'https:' ? 'wss:' : 'ws:'
-  const wsUrl = `${wsProtocol}//${urlObj.host}/ws/${gameId}/${username}`
+  const wsUrl = `${wsProtocol}//${urlObj.host}/ws/${gameId}/${username}?protocol=${PROTOCOL_VERSION}`
 
   socket = new WebSocket(wsUrl)
 
@@ -245,12 +284,13 @@ function connectWebSocket () {
 
     reconnectAttempts = 0 // Reset attempt counter
 
-    // Start keepalive ping
+    // The server pings the connection itself, this only tells it the player is
+    // still there, before its idle timeout (WS_IDLE_TIMEOUT) closes the connection.
     pingInterval = setInterval(() => {
       if (socket.readyState === WebSocket.OPEN) {
         socket.send(JSON.stringify({ type: 'ping' }))
       }
-    }, 10000)
+    }, 120000)
   }
   socket.onerror = e => {
     console.error('🚨 WebSocket error:', e)
@@ -266,6 +306,8 @@ function connectWebSocket () {
         handleYourTurn(data)
       } else if (type === 'guess_result' && data.player === username) {
         handleGuessResult(data)
+      } else if (type === 'sync') {
+        applySync(data)
       } else if (type === 'welcome') {
         log(`👋🏻 ${data.message}`)
       } else if (type === 'player_joined') {
@@ -290,6 +332,8 @@ function connectWebSocket () {
           : `Game over.<br />${data.winner} won the game.`
 
         winnerHeader.style.display = 'block'
+      } else if (type === 'track_changed') {
+        log(`🎵 ${data.message}`)
       } else if (type === 'user_disconnected') {
         log(`❌ ${data.message}`)
       } else {
@@ -324,59 +368,86 @@ window.addEventListener('online', () => {
     connectWebSocket()
   }
 })
-async function listAndChooseGameSessions () {
-  try {
-    document.getElementById('joinGameConfigBox').hidden = false
+let lobbySocket = null
 
-    const res = await fetch(`${serverUrl}/list-sessions`)
-    const data = await res.json()
-    if (!res.ok) {
-      const errorMsg = data.detail?.error || data.detail || 'Unknown error'
-      const stack = data.detail?.stacktrace || ''
-      log(`❌ Server-Exception: ${errorMsg}`)
-      if (stack) {
-        log('Stacktrace:\n', stack)
+function fillSessionDropdown (sessions) {
+  const dropdown = document.getElementById('sessionDropdown')
+  const selected = dropdown.value
+
+  // Clear previous options
+  dropdown.innerHTML = ''
+
+  // Fill the dropdown
+  sessions.forEach((sessionId, index) => {
+    const option = document.createElement('option')
+    option.value = sessionId
+    option.textContent = `${index + 1}. ${sessionId}`
+    dropdown.appendChild(option)
+  })
+  if (sessions.includes(selected)) {
+    dropdown.value = selected
+  }
+}
+
+function closeLobby () {
+  if (lobbySocket) {
+    lobbySocket.onclose = null
+    lobbySocket.close()
+    lobbySocket = null
+  }
+}
+
+// The server pushes the sessions that become joinable or stop being joinable,
+// so the list stays current without fetching it again.
+function watchLobby () {
+  closeLobby()
+  const urlObj = new URL(serverUrl)
+  const wsProtocol = urlObj.protocol === 'https:' ? 'wss:' : 'ws:'
+  const sessions = new Set()
+
+  lobbySocket = new WebSocket(`${wsProtocol}//${urlObj.host}/ws/lobby`)
+  lobbySocket.onmessage = event => {
+    const data = JSON.parse(event.data)
+    if (data.type === 'lobby') {
+      sessions.clear()
+      data.sessions.forEach(sessionId => sessions.add(sessionId))
+      if (sessions.size === 0) {
+        log('⏳ No available game sessions yet, waiting for new ones...')
       }
-      return
+    } else if (data.type === 'lobby_update') {
+      data.added.forEach(sessionId => sessions.add(sessionId))
+      data.removed.forEach(sessionId => sessions.delete(sessionId))
+    }
+    fillSessionDropdown([...sessions])
+  }
+  lobbySocket.onclose = () => {
+    // The server closes slow clients, the list is sent again on reconnect.
+    lobbySocket = null
+    if (!document.getElementById('joinGameConfigBox').hidden) {
+      setTimeout(watchLobby, 1000)
     }
+  }
+}
 
-    const sessions = data.sessions || []
-    const dropdown = document.getElementById('sessionDropdown')
-    const joinButton = document.getElementById('joinSelectedSessionBtn')
+async function listAndChooseGameSessions () {
+  document.getElementById('joinGameConfigBox').hidden = false
+  const dropdown = document.getElementById('sessionDropdown')
+  const joinButton = document.getElementById('joinSelectedSessionBtn')
 
-    // Clear previous options
-    dropdown.innerHTML = ''
+  watchLobby()
 
-    if (sessions.length === 0) {
-      alert('❌ No available game sessions.')
+  joinButton.onclick = async () => {
+    const selectedGameId = dropdown.value
+    if (!selectedGameId) {
+      alert('❌ Please select a session.')
       return
     }
-
-    // Fill the dropdown
-    sessions.forEach((sessionId, index) => {
-      const option = document.createElement('option')
-      option.value = sessionId
-      option.textContent = `${index + 1}. ${sessionId}`
-      dropdown.appendChild(option)
-    })
-
-    joinButton.onclick = async () => {
-      const selectedGameId = dropdown.value
-      if (!selectedGameId) {
-        alert('❌ Please select a session.')
-        return
-      }
-      if (!userHostingSpotifySession) {
-      }
-      gameId = selectedGameId
-      sucess = await joinGame()
-      if (sucess) {
-        document.getElementById('controls-waiting-for-start').hidden = false
-      }
+    gameId = selectedGameId
+    sucess = await joinGame()
+    if (sucess) {
+      closeLobby()
+      document.getElementById('controls-waiting-for-start').hidden = false
     }
-  } catch (err) {
-    console.error('❌ Failed to fetch sessions:', err)
-    alert('⚠️ Failed to fetch game sessions.')
   }
 }
 
@@ -528,7 +599,8 @@ document.getElementById('joinGameBtn').onclick = async () => {
     return
   }
 
-  const res = await fetch(`${serverUrl}/list-sessions`)
+  // One session is enough to know whether there is anything to join.
+  const res = await fetch(`${serverUrl}/list-sessions?limit=1`)
   const data = await res.json()
 
   if (!res.ok) {